@@ -0,0 +1,6 @@
+"""
+Campus benchmarks.
+
+    python benchmarks/bench_render.py   # per-page render cost
+    python benchmarks/bench_build.py    # build scenarios on a synthetic course tree
+"""
@@ -0,0 +1,135 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Build benchmarks, run on a synthetic course tree.
+
+Scenarios (each one runs the `campus` command in a subprocess):
+    - cold build: first `campus make`,
+    - no-op rebuild: `campus make` without any change,
+    - page edit: `campus make` after editing one `index.md` file,
+    - file edit: `campus make` after editing one linked file,
+    - check: `campus check` (links checking, without building),
+    - indexall: `campus indexall --create` on a tree without `index.md` files,
+    - startup: `campus --help` (command line startup time).
+
+Results are appended (as a JSON line) to the file given by `--output`, so
+that they can be compared across commits using `--compare`.
+
+Usage:
+    python benchmarks/bench_build.py --depth 3 --fanout 6 --output results.jsonl
+    python benchmarks/bench_build.py --depth 3 --fanout 6 --compare results.jsonl
+"""
+
+from argparse import ArgumentParser
+import json
+from pathlib import Path
+import platform
+import subprocess
+import sys
+from tempfile import TemporaryDirectory
+import time
+from typing import Dict, List, Optional
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+
+from benchmarks.synthetic import generate_course  # noqa: E402
+
+LAUNCHER = ROOT / 'campus.py'
+SHAPE = ('depth', 'fanout', 'files', 'file_size', 'link_density', 'jobs')
+
+
+def campus(*args: str, cwd: Path, check: bool = True) -> float:
+    """Run a campus command in `cwd`, and return its duration (in seconds).
+
+    If `check` is False, a non-zero exit status is not an error.
+    """
+    start = time.perf_counter()
+    result = subprocess.run([sys.executable, str(LAUNCHER), *args], cwd=cwd,
+                            capture_output=True, text=True)
+    duration = time.perf_counter() - start
+    if check and result.returncode:
+        raise RuntimeError(f'`campus {" ".join(args)}` failed:\n{result.stderr}')
+    return duration
+
+
+def commit() -> str:
+    "Return current campus commit (or '' if unknown)."
+    result = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=ROOT,
+                            capture_output=True, text=True)
+    return result.stdout.strip()
+
+
+def run_benchmarks(shape: Dict[str, float], tmp: Path) -> Dict[str, float]:
+    "Run all scenarios on a course tree of given shape, and return their durations."
+    jobs = str(shape['jobs'])
+    tree = {key: shape[key] for key in SHAPE if key != 'jobs'}
+    results = {}
+    root = tmp / 'course'
+    generate_course(root, **tree)
+    subprocess.run(['git', 'init', '-q'], cwd=root, check=True)
+    campus('init', cwd=root)
+    results['cold build'] = campus('make', '-j', jobs, cwd=root)
+    results['no-op rebuild'] = campus('make', '-j', jobs, cwd=root)
+    # Edit the deepest page, and the first linked file.
+    page = max(root.rglob('index.md'), key=lambda path: len(path.parts))
+    page.write_text(page.read_text(encoding='utf8') + '\nOne more line.\n', encoding='utf8')
+    results['page edit'] = campus('make', '-j', jobs, cwd=root)
+    document = root / 'doc_0.pdf'
+    if document.is_file():
+        document.write_bytes(document.read_bytes() + b'\n')
+        results['file edit'] = campus('make', '-j', jobs, cwd=root)
+    results['check'] = campus('check', '-j', jobs, cwd=root, check=False)
+    unindexed = tmp / 'unindexed'
+    generate_course(unindexed, index=False, **tree)
+    results['indexall'] = campus('indexall', '--create', cwd=unindexed)
+    results['startup'] = campus('--help', cwd=tmp)
+    return results
+
+
+def compare(results: Dict[str, float], shape: dict, path: Path) -> List[str]:
+    "Compare results with the last record of the same shape found in `path`."
+    previous: Optional[dict] = None
+    with open(path, encoding='utf8') as file:
+        for line in file:
+            record = json.loads(line)
+            if record['shape'] == shape:
+                previous = record
+    if previous is None:
+        return [f'No previous result with the same shape in "{path}".']
+    lines = [f"Compared with commit {previous['commit'] or '?'} ({previous['date']}):"]
+    for name, duration in results.items():
+        old = previous['results'].get(name)
+        if old:
+            lines.append(f'{name:>15}: {old:8.3f}s -> {duration:8.3f}s  (x{duration / old:.2f})')
+    return lines
+
+
+def main() -> None:
+    parser = ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--depth', type=int, default=3)
+    parser.add_argument('--fanout', type=int, default=4)
+    parser.add_argument('--files', type=int, default=5, help='Files per directory.')
+    parser.add_argument('--file-size', type=int, default=1024, help='File size (bytes).')
+    parser.add_argument('--link-density', type=float, default=1.,
+                        help='Fraction of files linked from index.md.')
+    parser.add_argument('-j', '--jobs', type=int, default=1)
+    parser.add_argument('--output', type=Path, help='Append results to this file (JSON lines).')
+    parser.add_argument('--compare', type=Path, help='Compare with results stored in this file.')
+    args = parser.parse_args()
+    shape = {key: getattr(args, key) for key in SHAPE}
+    with TemporaryDirectory() as tmp:
+        results = run_benchmarks(shape, Path(tmp))
+    for name, duration in results.items():
+        print(f'{name:>15}: {duration:8.3f}s')
+    if args.compare:
+        print('\n'.join(compare(results, shape, args.compare)))
+    if args.output:
+        record = {'commit': commit(), 'date': time.strftime('%Y-%m-%d %H:%M:%S'),
+                  'python': platform.python_version(), 'shape': shape, 'results': results}
+        with open(args.output, 'a', encoding='utf8') as file:
+            file.write(json.dumps(record) + '\n')
+
+
+if __name__ == '__main__':
+    main()
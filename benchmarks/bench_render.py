@@ -0,0 +1,88 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Micro-benchmark: per-page render cost.
+
+Compare the legacy page assembly (template read for every page, module-level
+`mistune.markdown()` call, and a chain of `str.replace()` calls) with the
+compiled template and the shared Markdown renderer.
+
+Usage:
+    python benchmarks/bench_render.py [--pages 5000] [--links 20]
+"""
+
+from argparse import ArgumentParser
+from pathlib import Path
+import sys
+import time
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from mistune import markdown  # type: ignore  # noqa: E402
+
+from campus.paths import INDEX_TEMPLATE_PATH  # noqa: E402
+from campus.template import load_template, markdown_renderer  # noqa: E402
+
+
+def page_source(number: int, links: int) -> str:
+    "Return the Markdown source of a synthetic page."
+    lines = [f'# Session {number}', '', 'Some *notes* about this session.', '']
+    for i in range(links):
+        lines.extend([f'[Document {i}](<doc_{i}.pdf>)', ''])
+    return '\n'.join(lines)
+
+
+def legacy_template(main: str, data: dict) -> str:
+    "Assemble a page the way campus did before compiled templates."
+    with open(INDEX_TEMPLATE_PATH, encoding='utf8') as file:
+        html = file.read()
+    data = dict(data, main=main)
+    for key in data:
+        html = html.replace(f'[${key.upper()}]', str(data[key]))
+    return html
+
+
+def compiled_template(main: str, data: dict) -> str:
+    "Assemble a page using the compiled template."
+    return load_template(INDEX_TEMPLATE_PATH).render(dict(data, main=main))
+
+
+def legacy_markdown(source: str) -> str:
+    "Render Markdown the way campus did before (module-level function)."
+    return markdown(source, escape=False)
+
+
+def shared_markdown(source: str) -> str:
+    "Render Markdown using the shared renderer."
+    return markdown_renderer()(source)
+
+
+def timeit(function, items) -> float:
+    "Return mean time (in µs) of `function` call for each item of `items`."
+    start = time.perf_counter()
+    for item in items:
+        function(*item)
+    return 1e6 * (time.perf_counter() - start) / len(items)
+
+
+def main() -> None:
+    parser = ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--pages', type=int, default=5000)
+    parser.add_argument('--links', type=int, default=20, help='Links per page.')
+    args = parser.parse_args()
+    sources = [page_source(i, args.links) for i in range(args.pages)]
+    data = {'common_stylesheet': '../css/all.css', 'stylesheet': '../css/1.css',
+            'nav': '<ol></ol>', 'title': 'Title'}
+    htmls = [shared_markdown(source) for source in sources]
+    results = {
+        'markdown (legacy)': timeit(legacy_markdown, [(source,) for source in sources]),
+        'markdown (shared)': timeit(shared_markdown, [(source,) for source in sources]),
+        'template (legacy)': timeit(legacy_template, [(html, data) for html in htmls]),
+        'template (compiled)': timeit(compiled_template, [(html, data) for html in htmls]),
+    }
+    print(f'{args.pages} pages, {args.links} links per page:')
+    for name, duration in results.items():
+        print(f'{name:>20}: {duration:8.1f} µs/page')
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,53 @@
+# -*- coding: utf-8 -*-
+"""
+Synthetic course tree generator, used by benchmarks.
+
+The shape of the tree is configurable: depth, fan-out (number of
+subdirectories per directory), number and size of files per directory,
+and link density (fraction of files linked from `index.md`).
+"""
+
+from collections import Counter
+from pathlib import Path
+import random
+
+
+def generate_course(root: Path, depth: int = 3, fanout: int = 4, files: int = 5,
+                    file_size: int = 1024, link_density: float = 1.,
+                    index: bool = True, seed: int = 0) -> Counter:
+    """Generate a synthetic course tree in `root` (which must not exist).
+
+    If `index` is False, no `index.md` file is generated (see `campus indexall`).
+
+    Return a counter with the number of directories, files, links and bytes
+    generated.
+    """
+    rng = random.Random(seed)
+    stats: Counter = Counter()
+
+    def generate(directory: Path, level: int) -> None:
+        directory.mkdir()
+        stats['directories'] += 1
+        lines = [f'# {directory.name.replace("_", " ")}', '',
+                 f'Notes about *{directory.name}*.', '']
+        for i in range(files):
+            name = f'doc_{i}.pdf'
+            # Each file has a distinct content (like real documents).
+            header = f'{directory / name}\n'.encode('utf8')
+            (directory / name).write_bytes(header + bytes(max(file_size - len(header), 0)))
+            stats['files'] += 1
+            stats['bytes'] += max(file_size, len(header))
+            if rng.random() < link_density:
+                lines.extend([f'[Document {i}](<{name}>)', ''])
+                stats['links'] += 1
+        if level < depth:
+            for i in range(fanout):
+                name = f'session_{i}'
+                lines.extend([f'[Session {i}]({name})', ''])
+                stats['links'] += 1
+                generate(directory / name, level + 1)
+        if index:
+            (directory / 'index.md').write_text('\n'.join(lines), encoding='utf8')
+
+    generate(root, 0)
+    return stats
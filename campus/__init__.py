@@ -1,6 +1,20 @@
 """
 Campus package.
 
+The site model (see `campus.site`) may be used from Python:
+
+    >>> from campus import Site
+
+It is imported on first use, so that `campus` command starts fast.
 """
 
 from .version import __version__
+
+_SITE_MODEL = ('Site', 'Page', 'Link')
+
+
+def __getattr__(name: str):
+    if name in _SITE_MODEL:
+        from . import site  # pylint: disable=import-outside-toplevel
+        return getattr(site, name)
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
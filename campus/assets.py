@@ -0,0 +1,93 @@
+# -*- coding: utf-8 -*-
+"""
+Publish style assets (stylesheets and pictures) in output directory.
+
+With fingerprinting enabled (see `FINGERPRINT_ASSETS` in `campus/param.py`),
+every asset is published under a content-hashed name (`css/all.css` becomes
+`css/all.0123456789.css`), so that it may be cached forever by browsers:
+    - pictures references in stylesheets are rewritten,
+    - pages reference the hashed stylesheets (see `campus.generate_website`),
+    - `assets.json` maps original names to hashed ones,
+    - `_headers` tells static hosts (Netlify, Cloudflare Pages...) to serve
+      hashed assets with immutable caching.
+
+An unchanged asset keeps the same hashed name from one build to another.
+"""
+
+import json
+from hashlib import sha256
+import posixpath
+import re
+from pathlib import Path
+from typing import Dict, Optional
+
+from .manifest import BuildManifest, file_hash
+from .publish import publish_file, write_if_changed
+
+# Number of hex digits of the content hash inserted in asset names.
+HASH_LENGTH = 10
+
+ASSETS_MANIFEST = 'assets.json'
+HEADERS_FILE = '_headers'
+CACHE_CONTROL = 'public, max-age=31536000, immutable'
+
+_CSS_URL = re.compile(r'''url\((['"]?)([^'")]+)\1\)''')
+
+
+def fingerprinted(rel: str, digest: str) -> str:
+    "Return the hashed name of asset `rel` ('css/all.css' -> 'css/all.0123456789.css')."
+    path = Path(rel)
+    return path.with_name(f'{path.stem}.{digest[:HASH_LENGTH]}{path.suffix}').as_posix()
+
+
+def rewrite_css(css: str, rel: str, assets: Dict[str, str]) -> str:
+    "Replace `url()` references of stylesheet `rel` with hashed names found in `assets`."
+    directory = posixpath.dirname(rel)
+
+    def replace(match: re.Match) -> str:
+        quote, url = match.groups()
+        target = posixpath.normpath(posixpath.join(directory, url))
+        if '://' in url or target not in assets:
+            return match.group(0)
+        return f'url({quote}{posixpath.relpath(assets[target], directory)}{quote})'
+
+    return _CSS_URL.sub(replace, css)
+
+
+def publish_styles(config: Path, dst: Path, manifest: Optional[BuildManifest] = None,
+                   fingerprint: bool = False) -> Optional[Dict[str, str]]:
+    """Publish `css` and `pic` directories of `config` in `dst`.
+
+    If `fingerprint` is True, return the published names, as a
+    `{'css/all.css': 'css/all.0123456789.css'}` dict, else return None.
+    """
+    sources = {name: sorted(path for path in (config / name).rglob('*') if path.is_file())
+               for name in ('pic', 'css')}
+    if not fingerprint:
+        for paths in sources.values():
+            for path in paths:
+                publish_file(path, dst / path.relative_to(config), manifest)
+        return None
+    assets: Dict[str, str] = {}
+    # Pictures first, since stylesheets reference them.
+    for path in sources['pic']:
+        rel = path.relative_to(config).as_posix()
+        assets[rel] = fingerprinted(rel, file_hash(path))
+        publish_file(path, dst / assets[rel], manifest)
+    for path in sources['css']:
+        rel = path.relative_to(config).as_posix()
+        css = rewrite_css(path.read_text(encoding='utf8'), rel, assets).encode('utf8')
+        assets[rel] = fingerprinted(rel, sha256(css).hexdigest())
+        _write(dst / assets[rel], css, manifest)
+    _write(dst / ASSETS_MANIFEST,
+           json.dumps(assets, indent=2, sort_keys=True).encode('utf8'), manifest)
+    headers = ''.join(f'/{name}\n  Cache-Control: {CACHE_CONTROL}\n'
+                      for name in sorted(assets.values()))
+    _write(dst / HEADERS_FILE, headers.encode('utf8'), manifest)
+    return assets
+
+
+def _write(path: Path, content: bytes, manifest: Optional[BuildManifest]) -> None:
+    written = write_if_changed(path, content)
+    if manifest is not None:
+        manifest.add_generated(path, written)
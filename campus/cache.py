@@ -0,0 +1,151 @@
+# -*- coding: utf-8 -*-
+"""
+Content-addressed build cache.
+
+The cache may be shared between several source repositories, branches or
+machines (set `CACHE_DIR` in `campus/param.py`):
+    - rendered pages are stored under a key computed from `index.md` content,
+      navigation menu, title, stylesheets, depth and style version,
+    - published files are stored under their content hash.
+
+Layout:
+    {cache}/pages/ab/abcdef....html  (the page itself)
+    {cache}/pages/ab/abcdef....json  (its title, links and links targets kinds)
+    {cache}/assets/ab/abcdef...      (a published file)
+
+The cache size is bounded: least recently used entries are removed
+when the cache exceeds its maximal size (see `BuildCache.prune()`).
+"""
+
+import json
+import os
+from pathlib import Path
+from shutil import copyfile
+import time
+from typing import List, Optional, Tuple
+
+from .fscache import directory_cache
+from .manifest import data_hash
+from .publish import publish, write_chunks_if_changed
+
+# Minimal delay (in seconds) between two updates of an entry access time.
+TOUCH_DELAY = 24 * 3600
+
+
+class BuildCache:
+    """A content-addressed cache directory, whose size is bounded by `max_size` (in bytes).
+
+    `style` is the style version (see `campus.manifest.style_version()`).
+    """
+
+    def __init__(self, path: Path, max_size: int, style: str = ''):
+        self.path = path
+        self.max_size = max_size
+        self.style = style
+
+    def _entry(self, kind: str, key: str) -> Path:
+        return self.path / kind / key[:2] / key
+
+    @staticmethod
+    def _store(path: Path, write) -> None:
+        "Create `path` atomically, using `write(tmp_path)`."
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = path.with_name(f'.{path.name}.{os.getpid()}.tmp')
+        try:
+            write(tmp)
+            os.replace(tmp, path)
+        finally:
+            if tmp.exists():
+                tmp.unlink()
+
+    @staticmethod
+    def _touch(*paths: Path) -> None:
+        """Mark entries as recently used.
+
+        Entries are only touched once a day, since published files may be
+        hard links to them (and their mtime should remain stable).
+        """
+        now = time.time()
+        for path in paths:
+            try:
+                if now - path.stat().st_mtime > TOUCH_DELAY:
+                    os.utime(path)
+            except OSError:
+                pass
+
+    def page_key(self, source_hash: str, context_key: str) -> str:
+        """Return the cache key of a page.
+
+        `source_hash` is the hash of `index.md` content, and `context_key`
+        identifies page title, navigation menu and stylesheets
+        (see `campus.generate_website.generate_website()`).
+        """
+        return data_hash('page', source_hash, context_key, self.style)
+
+    def get_page(self, key: str, directory: Path, output_file: Path
+                 ) -> Optional[Tuple[str, dict, bool]]:
+        """Copy cached page to `output_file`, and return its `(title, links, written)`.
+
+        `written` is False if `output_file` was already up to date.
+        Return None if page is not cached, or if its links targets changed.
+        """
+        html = self._entry('pages', key + '.html')
+        meta = self._entry('pages', key + '.json')
+        try:
+            with open(meta, encoding='utf8') as file:
+                data = json.load(file)
+        except (OSError, ValueError):
+            return None
+        cache = directory_cache()
+        if any(cache.kind(directory / link) != kind for link, kind in data['targets'].items()):
+            return None
+        try:
+            with open(html, 'rb') as file:
+                written = write_chunks_if_changed(output_file, iter(lambda: file.read(2**16), b''))
+        except OSError:
+            return None
+        self._touch(html, meta)
+        return data['title'], data['links'], written
+
+    def put_page(self, key: str, output_file: Path, title: str, links: dict,
+                 targets: dict) -> None:
+        "Store a generated page."
+        self._store(self._entry('pages', key + '.html'), lambda tmp: copyfile(output_file, tmp))
+
+        def write(tmp: Path) -> None:
+            with open(tmp, 'w', encoding='utf8') as file:
+                json.dump({'title': title, 'links': links, 'targets': targets}, file)
+        self._store(self._entry('pages', key + '.json'), write)
+
+    def publish_asset(self, src_file: Path, dst_file: Path, digest: str) -> None:
+        "Publish `src_file` (whose content hash is `digest`) as `dst_file`, through the cache."
+        entry = self._entry('assets', digest)
+        if entry.is_file():
+            self._touch(entry)
+        else:
+            # Never hard link a source file in the cache, since it may be
+            # modified in place later.
+            self._store(entry, lambda tmp: publish(src_file, tmp, 'reflink'))
+        publish(entry, dst_file)
+
+    def prune(self) -> List[Path]:
+        "Remove least recently used entries, until cache size is below `max_size`."
+        entries = []
+        for path in self.path.glob('*/*/*'):
+            try:
+                stat = path.stat()
+            except OSError:
+                continue
+            entries.append((stat.st_mtime, stat.st_size, path))
+        total = sum(size for _, size, _ in entries)
+        removed = []
+        for _, size, path in sorted(entries):
+            if total <= self.max_size:
+                break
+            try:
+                path.unlink()
+            except OSError:
+                continue
+            total -= size
+            removed.append(path)
+        return removed
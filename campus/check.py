@@ -0,0 +1,89 @@
+# -*- coding: utf-8 -*-
+"""
+Check course links, without building the website (`campus check`).
+
+The pages are parsed in parallel (see `campus.site.Site.load()`), links
+are resolved from cached directory listings (see `campus.fscache`),
+and the tree is listed once to find unindexed files and orphaned directories.
+
+Reported problems:
+    - broken links (in pages reachable from the root page),
+    - unindexed files: files of a reachable page (or of a directory of linked
+      files) which no page links to,
+    - orphaned directories: directories which no reachable page links to,
+      and which contain no linked file (only the topmost one is reported).
+"""
+
+from pathlib import Path
+from typing import Dict, List, Set
+
+from .fscache import directory_cache
+from .site import Site
+
+KINDS = ('broken', 'unindexed', 'orphaned')
+
+
+def check(root: Path, jobs: int = 1) -> Dict[str, list]:
+    "Check links of the course in `root` directory, using `jobs` processes (see `problems()`)."
+    return problems(Site(root).load(jobs))
+
+
+def problems(site: Site) -> Dict[str, list]:
+    """Check links of a loaded (or built) `site`.
+
+    Return a `{'broken': [...], 'unindexed': [...], 'orphaned': [...]}` dict,
+    where broken links are given as `{'page': 'path/to/index.md', 'link': 'link'}`.
+    Hidden files and directories are ignored.
+    """
+    root = site.src
+    cache = directory_cache()
+    directories = [root]
+    files: List[Path] = []
+    for directory in directories:
+        for name, kind in sorted(cache.listing(str(directory)).items()):
+            if name[0] == '.' or name == 'index.md':
+                continue
+            if kind == 'd':
+                directories.append(directory / name)
+            elif kind == 'f':
+                files.append(directory / name)
+
+    def rel(path: Path) -> str:
+        return path.relative_to(root).as_posix()
+
+    reachable: Set[Path] = set(site.pages)
+    broken = [{'page': rel(page.directory / 'index.md'), 'link': link.href}
+              for page in site for link in page.broken]
+    linked = set(site.files())
+    # Directories without a page are reachable through their linked files.
+    for path in linked:
+        for parent in path.parents:
+            if parent in reachable or root not in parent.parents:
+                break
+            reachable.add(parent)
+    orphaned: List[Path] = []
+    unreachable: Set[Path] = set()
+    # Parents are listed before their subdirectories.
+    for directory in directories:
+        if directory not in reachable:
+            if directory.parent not in unreachable:
+                orphaned.append(directory)
+            unreachable.add(directory)
+    unindexed = [path for path in files if path not in linked and path.parent in reachable]
+    return {'broken': broken,
+            'unindexed': [rel(path) for path in unindexed],
+            'orphaned': [rel(path) + '/' for path in orphaned]}
+
+
+def report(problems: Dict[str, list]) -> str:
+    "Return a human readable report."
+    titles = {'broken': 'Broken links', 'unindexed': 'Unindexed files',
+              'orphaned': 'Orphaned directories'}
+    lines = []
+    for kind in KINDS:
+        if problems[kind]:
+            lines.append(f'{titles[kind]}:')
+            lines.extend(f"    {item['page']}: {item['link']}" if kind == 'broken'
+                         else f'    {item}' for item in problems[kind])
+    lines.append(f'{sum(len(problems[kind]) for kind in KINDS)} problem(s) found.')
+    return '\n'.join(lines)
@@ -0,0 +1,78 @@
+# -*- coding: utf-8 -*-
+"""
+Pre-compressed outputs.
+
+Static hosts may serve `page.html.gz` instead of `page.html` to browsers
+accepting gzip encoding, which saves compressing every request.
+Only text formats are compressed (see `COMPRESS_SUFFIXES` in `campus/param.py`):
+formats like PDF, PNG or MP4 are already compressed.
+
+Compressed files are deterministic (no timestamp is stored), so that
+unchanged outputs don't generate git changes.
+"""
+
+from collections import Counter
+from concurrent.futures import Executor, ProcessPoolExecutor
+from contextlib import nullcontext
+import gzip
+import os
+from pathlib import Path
+from typing import Iterable, Optional, Tuple
+
+from .generate_website import SerialExecutor
+from .manifest import BuildManifest
+from .param import COMPRESS_SUFFIXES
+from .publish import write_if_changed
+
+
+def compressed_path(path: Path) -> Path:
+    "Return the path of the compressed copy of `path`."
+    return path.with_name(path.name + '.gz')
+
+
+def compress_file(path: Path) -> Tuple[bool, int, int]:
+    """Write the compressed copy of `path`.
+
+    Return `(written, size, compressed size)`.
+    """
+    data = path.read_bytes()
+    compressed = gzip.compress(data, compresslevel=9, mtime=0)
+    return write_if_changed(compressed_path(path), compressed), len(data), len(compressed)
+
+
+def _executor(jobs: int) -> Executor:
+    "Return a process pool of `jobs` workers (see `campus.generate_website.executors()`)."
+    if jobs == 1:
+        return SerialExecutor()
+    return ProcessPoolExecutor(max_workers=jobs or os.cpu_count() or 1)
+
+
+def compress_outputs(manifest: BuildManifest, jobs: int = 1,
+                     suffixes: Iterable[str] = COMPRESS_SUFFIXES,
+                     executor: Optional[Executor] = None) -> Counter:
+    """Write compressed copies of current build outputs, using `jobs` processes.
+
+    An `executor` may be given instead, to share workers between several builds
+    (it is not shut down).
+
+    Compressed copies already up to date with their source are skipped.
+    Return statistics (files compressed or skipped, bytes before and after compression).
+    """
+    suffixes = tuple(suffixes)
+    stats: Counter = Counter()
+    paths = [manifest.dst / rel for rel in sorted(manifest.outputs) if rel.endswith(suffixes)]
+    with (_executor(jobs) if executor is None else nullcontext(executor)) as executor:
+        futures = []
+        for path in paths:
+            if manifest.compressed_changed(path, compressed_path(path)):
+                futures.append((path, executor.submit(compress_file, path)))
+            else:
+                stats['compression skipped'] += 1
+        for path, future in futures:
+            written, size, compressed_size = future.result()
+            if written:
+                manifest.mark_changed(compressed_path(path))
+            stats['files compressed'] += 1
+            stats['bytes before compression'] += size
+            stats['bytes after compression'] += compressed_size
+    return stats
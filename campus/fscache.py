@@ -0,0 +1,92 @@
+# -*- coding: utf-8 -*-
+"""
+Per-build cache of directory listings.
+
+Each directory is listed only once, using `os.scandir()`, and every later
+question (is this link a file, a directory, or is it broken ?) is answered
+from memory.
+
+Each process has its own cache, which must be reset at the beginning of
+every build (see `reset_directory_cache()`).
+"""
+
+from collections import Counter
+import os
+from pathlib import Path
+from typing import Dict, Optional
+
+
+def normalize(path: Path) -> Path:
+    "Remove '..' and '.' components from path, without resolving symlinks."
+    return Path(os.path.normpath(path))
+
+
+class DirectoryCache:
+    """Cache of directory listings.
+
+    `stats['hits']` counts questions answered from memory, and
+    `stats['scandir']` the number of directories listed.
+    """
+
+    def __init__(self):
+        # {directory: {name: kind}}, where kind is 'd' for a directory,
+        # 'f' for a file and '' for anything else.
+        self._listings: Dict[str, Dict[str, str]] = {}
+        self.stats: Counter = Counter()
+
+    def listing(self, directory: str) -> Dict[str, str]:
+        "Return directory content, as a {name: kind} dict."
+        listing = self._listings.get(directory)
+        if listing is not None:
+            self.stats['hits'] += 1
+            return listing
+        self.stats['scandir'] += 1
+        listing = {}
+        try:
+            with os.scandir(directory) as entries:
+                for entry in entries:
+                    # Symbolic links are followed, like `Path.is_dir()` does.
+                    if entry.is_dir():
+                        listing[entry.name] = 'd'
+                    elif entry.is_file():
+                        listing[entry.name] = 'f'
+                    else:
+                        listing[entry.name] = ''
+        except OSError:
+            # Directory doesn't exist (or isn't a directory).
+            pass
+        self._listings[directory] = listing
+        return listing
+
+    def kind(self, path: Path) -> str:
+        "Return 'd' for a directory, 'f' for a file and '' if path doesn't exist."
+        directory, name = os.path.split(os.path.normpath(path))
+        if not name or name == '..':
+            # Root directory, or a path above current directory.
+            return 'd' if os.path.isdir(path) else ''
+        return self.listing(directory or os.curdir).get(name, '')
+
+    def is_dir(self, path: Path) -> bool:
+        "Test if path is a directory (like `Path.is_dir()`)."
+        return self.kind(path) == 'd'
+
+    def is_file(self, path: Path) -> bool:
+        "Test if path is a file (like `Path.is_file()`)."
+        return self.kind(path) == 'f'
+
+
+_cache: Optional[DirectoryCache] = None
+
+
+def directory_cache() -> DirectoryCache:
+    "Return the directory cache of current process."
+    global _cache  # pylint: disable=global-statement
+    if _cache is None:
+        _cache = DirectoryCache()
+    return _cache
+
+
+def reset_directory_cache() -> None:
+    "Empty the directory cache of current process (called at the beginning of a build)."
+    global _cache  # pylint: disable=global-statement
+    _cache = DirectoryCache()
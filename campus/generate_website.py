@@ -1,196 +1,551 @@
-# -*- coding: utf-8 -*-
-"""
-Campus
-
-Created on Thu Sep 26 10:26:48 2019
-
-@author: Nicolas Pourcelot
-
-Balises spéciales :
-    [$MAIN]
-    [$NAV]
-    [$NEXT]
-    [$PREVIOUS]
-
-
-Algorithme :
-On part de la racine du dossier local.
-On lit tous les fichiers index.md -> index.html
-Tous les fichiers indexés sont copiés dans le dossier html,
-en respectant l'arborescence.
-
-Difficulté :
-tous les fichiers index.html doivent avoir une barre de navigation
-automatiquement incorporée.
-pour cela, il suffit de chercher les dossiers frères, et de garder uniquement
-ceux qui sont indexés.
-
-On peut commencer par générer un dictionnaire :
-{path_to_an_index_md_file: [(href_in_the_file, title)]}
-
-
-"""
-from re import sub, search, Match
-from shutil import copy
-from typing import Tuple, Dict, Optional
-
-from mistune import markdown # type: ignore
-
-from .paths import INDEX_TEMPLATE_PATH, Path
-
-
-MARKDOWN_LINK = '\\s*\\[[^]]+\\]\\(\\<?([^<>)]+)\\>?\\)'
-
-def assert_relative_to(path: Path, src: Path):
-    "Raise a `ValueError` if path is not relative to `src`."
-    try:
-        path.relative_to(src)
-    except ValueError:
-        raise ValueError(f'"{path}" should be a subdirectory of "{src}".')
-
-
-def translate_path(path: Path, src: Path, dst: Path) -> Path:
-    "Transform {src}/subpath into {dst}/subpath."
-    assert_relative_to(path, src)
-    return dst / path.relative_to(src)
-
-
-def relative_depth(path: Path, src: Path) -> int:
-    "Return the depth of the given path relatively to src."
-    assert_relative_to(path, src)
-    return len(path.parents) - len(src.parents)
-
-
-def extract_links(path: Path, html: str) -> Tuple[Dict[str, Dict[str, str]], str]:
-    """Extract all links from html code, and add a <span> tag before them.
-
-    The class of the <span> tag will specify the type of link, and may be used
-    by the stylesheet later.
-
-    Return a tuple with the following format:
-    ({'directories': {'name': 'path'}, 'files': {'name': 'path'}}, 'HTML code')
-    """
-    directories = {}
-    files = {}
-
-    def classify(match: Match) -> str:
-        "Classify links (is it directory or a file ?)."
-        # This is an internet link, pass...
-        string = match.group(0)
-        if '://' in string:
-            return string
-        link, title = match.groups()
-        _link = path / link
-        # Store links that point to directories.
-        if _link.is_dir():
-            directories[link] = title
-            css_class = '"before directory"'
-        # Store links that point to files.
-        elif _link.is_file():
-            files[link] = title
-            css_class = f'"before file {_link.suffix[1:]}"'
-        # Neither directory nor file: this is a broken link !
-        else:
-            print(f"WARNING: '{_link!s}' link seems to be broken !")
-            css_class = '"before broken-link"'
-        return f"<span class={css_class}></span>{string}"
-
-    html = sub(r'<a href="([^"]+)">([^<]+)</a>', classify, html)
-
-    return {'directories': directories, 'files': files}, html
-
-
-def find_title(html: str) -> Optional[str]:
-    "Return <h1> title content."
-    match = search('<h1>([^<]+)</h1>', html)
-    return match.group(1) if match else None
-
-
-def generate_nav(links: dict, directory: Path, parent=True) -> str:
-    """Generate the navigation menu content.
-
-    `links` dict format is {'href': 'title'}"""
-    content = ['<ol>']
-    if parent:
-        content.append('<li><a href="..">..</a></li>')
-    for link, title in links.items():
-        href = f'../{link}'
-        # The `current` css class is used to indicate that the link is actually
-        # pointing to the current page.
-        css_class = 'current' if (directory / href).resolve() == directory else ''
-        content.append(f'<li><a href="{href}" class="{css_class}">{title}</a></li>')
-    content.append('</ol>')
-    return '\n'.join(content)
-
-
-def read_index_md_as_html(directory: Path) -> str:
-    "Read index.md file and return corresponding HTML."
-    # Convert Markdown to HTML
-    index_file = directory / 'index.md'
-    if not index_file.is_file():
-        print(f'WARNING: "{directory}" has no "index.md" file.')
-        main = ''
-    else:
-        with open(index_file, encoding='utf8') as file:
-            main = markdown(file.read(), escape=False)
-    return main
-
-
-def generate_website(directory: Path, src: Path, dst: Path, siblings: dict, title=''):
-    """Recursively generate website :
-        - generate `index.html` files from the `index.md` files.
-        - copy index.html files and all tracked files to output directory.
-    """
-    assert all(isinstance(d, Path) for d in (directory, src, dst))
-    main = read_index_md_as_html(directory)
-
-    # Extract page title (it will be reinjected later).
-    main_title = find_title(main)
-    if main_title is not None:
-        title = main_title
-        # Avoid the <h1> title to appear twice !
-        # (It will be automatically generated in <header>.)
-        main = main.replace(f'<h1>{title}</h1>', '')
-
-    links, main = extract_links(directory, main)
-
-    # Add stylesheet
-    depth = relative_depth(directory, src=src)
-    css_relative_path = Path(*(depth*['..'])) / 'css'
-    css_name = f'{depth}.css'
-    if not (dst / 'css' / css_name).is_file():
-        css_name = 'default.css'
-
-
-    data = {'common_stylesheet': css_relative_path / 'all.css',
-            'stylesheet': css_relative_path / css_name,
-            'nav': generate_nav(siblings, directory, parent=(directory != src)),
-            'main': main,
-            'title': title,
-            }
-    with open(INDEX_TEMPLATE_PATH, encoding='utf8') as file:
-        html = file.read()
-    for key in data:
-        html = html.replace(f'[${key.upper()}]', str(data[key]))
-
-    output_dir = translate_path(directory, src, dst)
-    output_dir.mkdir(parents=True, exist_ok=True)
-    with open(output_dir / 'index.html', 'w', encoding='utf8') as file:
-        file.write(html)
-
-    for link, _ in links['files'].items():
-        src_file = directory / link
-        dst_file = translate_path(src_file, src, dst)
-        copy(src_file, dst_file)
-
-    for link, txt in links['directories'].items():
-        path = directory / link
-        generate_website(path, src, dst, siblings=links['directories'], title=txt)
-
-
-#def generate_modules():
-#    pass
-#
-#
-#def generate_chapters():
-#    pass
+# -*- coding: utf-8 -*-
+"""
+Campus
+
+Created on Thu Sep 26 10:26:48 2019
+
+@author: Nicolas Pourcelot
+
+Balises spéciales :
+    [$MAIN]
+    [$NAV]
+    [$NEXT]
+    [$PREVIOUS]
+
+
+Algorithme :
+On part de la racine du dossier local.
+On lit tous les fichiers index.md -> index.html
+Tous les fichiers indexés sont copiés dans le dossier html,
+en respectant l'arborescence.
+
+Difficulté :
+tous les fichiers index.html doivent avoir une barre de navigation
+automatiquement incorporée.
+pour cela, il suffit de chercher les dossiers frères, et de garder uniquement
+ceux qui sont indexés.
+
+On peut commencer par générer un dictionnaire :
+{path_to_an_index_md_file: [(href_in_the_file, title)]}
+
+
+"""
+from collections import Counter
+from contextlib import contextmanager
+from itertools import islice
+from concurrent.futures import (Executor, Future, ProcessPoolExecutor,
+                                ThreadPoolExecutor)
+import os
+import posixpath
+from re import sub, search, Match
+from tempfile import SpooledTemporaryFile
+import time
+from typing import Tuple, Dict, Iterator, List, Optional
+
+from .fscache import DirectoryCache, directory_cache, normalize, reset_directory_cache
+from .cache import BuildCache
+# Re-exported (it used to be defined here).
+from .indexing import MARKDOWN_LINK  # noqa: F401  # pylint: disable=unused-import
+from .manifest import BuildManifest, data_hash, file_hash, link_targets
+from .param import NAV_MAX_SIBLINGS, NAV_WINDOW
+from .paths import INDEX_TEMPLATE_PATH, Path
+from .publish import publish_file, write_chunks_if_changed, write_if_changed
+from .template import CHUNK_SIZE, load_template, markdown_chunks, markdown_renderer
+
+SEARCH_PAGE = 'search.html'
+SEARCH_FORM = ('<form class="search" action="{root}"><input type="search" name="q" '
+               'placeholder="Search"></form>')
+
+PREVIEWS_DIR = 'previews'
+PREVIEWS_SCRIPT = '<script src="{script}" data-index="{index}" defer></script>'
+
+# Full navigation menu of the subpages of a directory with many subpages
+# (see `generate_nav()`), loaded on demand.
+NAV_FRAGMENT = 'index.nav.html'
+NAV_MORE = f'<li><a href=".." data-nav="../{NAV_FRAGMENT}">…</a></li>'
+NAV_SCRIPT = """<script>
+for (const link of document.querySelectorAll('a[data-nav]')) link.onclick = event => {
+    event.preventDefault();
+    const path = url => new URL(url, location.href).pathname.replace(/(index\\.html)?$/, '')
+                                                         .replace(/\\/$/, '');
+    fetch(link.dataset.nav).then(r => r.text()).then(html => {
+        const menu = link.closest('ol');
+        menu.insertAdjacentHTML('afterend', html);
+        menu.remove();
+        for (const a of document.querySelectorAll('nav a'))
+            if (path(a.getAttribute('href')) === path('.')) a.className = 'current';
+    });
+};
+</script>"""
+
+# Rendered pages larger than this (in characters) are spooled to disk while generated.
+SPOOL_SIZE = 2**22
+
+def assert_relative_to(path: Path, src: Path):
+    "Raise a `ValueError` if path is not relative to `src`."
+    try:
+        path.relative_to(src)
+    except ValueError:
+        raise ValueError(f'"{path}" should be a subdirectory of "{src}".')
+
+
+def translate_path(path: Path, src: Path, dst: Path) -> Path:
+    "Transform {src}/subpath into {dst}/subpath."
+    assert_relative_to(path, src)
+    return dst / path.relative_to(src)
+
+
+def relative_depth(path: Path, src: Path) -> int:
+    "Return the depth of the given path relatively to src."
+    assert_relative_to(path, src)
+    return len(path.parents) - len(src.parents)
+
+
+def extract_links(path: Path, html: str, cache: Optional[DirectoryCache] = None
+                  ) -> Tuple[Dict[str, Dict[str, str]], str]:
+    """Extract all links from html code, and add a <span> tag before them.
+
+    The class of the <span> tag will specify the type of link, and may be used
+    by the stylesheet later.
+
+    Links are classified using the directory `cache`
+    (default to the cache of current process).
+
+    Return a tuple with the following format:
+    ({'directories': {'name': 'path'}, 'files': {'name': 'path'},
+      'broken': {'name': 'path'}}, 'HTML code')
+    """
+    directories = {}
+    files = {}
+    broken = {}
+    if cache is None:
+        cache = directory_cache()
+
+    def classify(match: Match) -> str:
+        "Classify links (is it directory or a file ?)."
+        # This is an internet link, pass...
+        string = match.group(0)
+        if '://' in string:
+            return string
+        link, title = match.groups()
+        _link = path / link
+        kind = cache.kind(_link)
+        # Store links that point to directories.
+        if kind == 'd':
+            directories[link] = title
+            css_class = '"before directory"'
+        # Store links that point to files.
+        elif kind == 'f':
+            files[link] = title
+            css_class = f'"before file {_link.suffix[1:]}"'
+        # Neither directory nor file: this is a broken link !
+        else:
+            broken[link] = title
+            css_class = '"before broken-link"'
+        return f"<span class={css_class}></span>{string}"
+
+    html = sub(r'<a href="([^"]+)">([^<]+)</a>', classify, html)
+
+    return {'directories': directories, 'files': files, 'broken': broken}, html
+
+
+def find_title(html: str) -> Optional[str]:
+    "Return <h1> title content."
+    match = search('<h1>([^<]+)</h1>', html)
+    return match.group(1) if match else None
+
+
+def generate_nav(links: dict, directory: Path, parent=True, full=False) -> str:
+    """Generate the navigation menu content.
+
+    `links` dict format is {'href': 'title'}
+
+    If there are more than `NAV_MAX_SIBLINGS` links, only `NAV_WINDOW` links
+    before and after the current one are listed (unless `full` is True), and
+    the other ones are replaced by a link loading the full menu
+    (see `write_nav_fragment()`), so that the size of a menu doesn't grow
+    with the number of siblings."""
+    content = ['<ol>']
+    if parent:
+        content.append('<li><a href="..">..</a></li>')
+    directory = normalize(directory)
+    items = links.items()
+    start = end = 0
+    if not full and len(links) > NAV_MAX_SIBLINGS:
+        # Find current link without building paths, since every sibling does it.
+        current = next((i for i, link in enumerate(links)
+                        if posixpath.normpath(link) == directory.name), 0)
+        start, end = max(current - NAV_WINDOW, 0), current + NAV_WINDOW + 1
+        items = islice(items, start, end)  # type: ignore
+        if start > 0:
+            content.append(NAV_MORE)
+    for link, title in items:
+        href = f'../{link}'
+        # The `current` css class is used to indicate that the link is actually
+        # pointing to the current page.
+        # (Paths are compared without resolving symlinks, to avoid syscalls.)
+        css_class = 'current' if normalize(directory / href) == directory else ''
+        content.append(f'<li><a href="{href}" class="{css_class}">{title}</a></li>')
+    if end:
+        if end < len(links):
+            content.append(NAV_MORE)
+        content.extend(['</ol>', NAV_SCRIPT])
+    else:
+        content.append('</ol>')
+    return '\n'.join(content)
+
+
+def write_nav_fragment(directory: Path, links: dict, output_dir: Path,
+                       manifest: Optional[BuildManifest] = None) -> None:
+    """Write the full navigation menu of the subpages of `directory` in `output_dir`,
+    if they are more than `NAV_MAX_SIBLINGS` (see `generate_nav()`).
+
+    `links` dict format is {'href': 'title'}
+    """
+    if len(links) <= NAV_MAX_SIBLINGS:
+        return
+    path = output_dir / NAV_FRAGMENT
+    written = write_if_changed(path, generate_nav(links, directory, full=True).encode('utf8'))
+    if manifest is not None:
+        manifest.add_generated(path, written)
+
+
+def read_index_md_as_html(directory: Path) -> str:
+    "Read index.md file and return corresponding HTML."
+    return ''.join(iter_index_md_as_html(directory))
+
+
+def iter_index_md_as_html(directory: Path) -> Iterator[str]:
+    "Read index.md file and yield corresponding HTML, chunk by chunk."
+    # Convert Markdown to HTML
+    index_file = directory / 'index.md'
+    if not directory_cache().is_file(index_file):
+        print(f'WARNING: "{directory}" has no "index.md" file.')
+        return
+    render = markdown_renderer()
+    with open(index_file, encoding='utf8') as file:
+        for chunk in markdown_chunks(file, CHUNK_SIZE):
+            yield render(chunk)
+
+
+class SerialExecutor(Executor):
+    "Executor running every call immediately, in the current thread."
+
+    def submit(self, fn, *args, **kwargs):  # pylint: disable=arguments-differ
+        future: Future = Future()
+        try:
+            future.set_result(fn(*args, **kwargs))
+        except BaseException as error:  # pylint: disable=broad-except
+            future.set_exception(error)
+        return future
+
+
+def executors(jobs: int = 1) -> Tuple[Executor, Executor]:
+    """Return a process pool (to render pages) and a thread pool (to copy files).
+
+    If `jobs` is 1, everything is executed serially in the current thread.
+    If `jobs` is 0, use as many workers as CPUs.
+    """
+    if jobs == 1:
+        return SerialExecutor(), SerialExecutor()
+    jobs = jobs or os.cpu_count() or 1
+    return (ProcessPoolExecutor(max_workers=jobs, initializer=reset_directory_cache),
+            ThreadPoolExecutor(max_workers=jobs))
+
+
+@contextmanager
+def _executors(jobs: int, pool: Optional[Tuple[Executor, Executor]] = None
+               ) -> Iterator[Tuple[Executor, Executor]]:
+    "Yield `pool` if given, else new executors (see `executors()`), shut down afterwards."
+    if pool is not None:
+        yield pool
+        return
+    page_executor, file_executor = executors(jobs)
+    with page_executor, file_executor:
+        yield page_executor, file_executor
+
+
+def generate_website(directory: Path, src: Path, dst: Path, siblings: dict, title='',
+                     manifest: Optional[BuildManifest] = None, jobs: int = 1,
+                     stats: Optional[Counter] = None, cache: Optional[BuildCache] = None,
+                     directories: Optional[Dict[str, Counter]] = None,
+                     assets: Optional[Dict[str, str]] = None, search: bool = False,
+                     previews: bool = False, pool: Optional[Tuple[Executor, Executor]] = None):
+    """Recursively generate website :
+        - generate `index.html` files from the `index.md` files.
+        - copy index.html files and all tracked files to output directory.
+
+    If a build `manifest` is given, pages and files which did not change
+    since previous build are skipped.
+    If a build `cache` is given, pages and files are first searched in it,
+    and stored in it if not found.
+
+    The website is generated level by level, since a page must be read
+    to know its subdirectories (and their navigation menu).
+    Pages of the same level are rendered in parallel using `jobs` processes,
+    while files are copied using `jobs` threads (see `executors()`).
+    A directory linked from several pages is only generated the first time
+    it is found, so the output doesn't depend on `jobs`.
+    A `pool` of executors (see `executors()`) may be given instead, to share
+    workers between several builds: it is not shut down.
+
+    Files are only written if their content changed (see `write_chunks_if_changed()`).
+
+    If a `stats` counter is given, it is updated with the number of pages
+    rendered, reused, found in cache or written, the number of files
+    published or skipped (and published bytes), and with directory cache
+    statistics.
+    If a `directories` dict is given, it is filled with costs of each
+    directory (render time, published files, bytes and time), as
+    `{'relative/path': Counter}`.
+
+    If an `assets` dict is given, pages reference stylesheets by their
+    fingerprinted names (see `campus.assets.publish_styles()`).
+    If `search` is True, pages include a search form (see `campus.search`).
+    If `previews` is True, pages include the script displaying linked files
+    sizes and previews (see `campus.previews`).
+    """
+    assert all(isinstance(d, Path) for d in (directory, src, dst))
+    if stats is None:
+        stats = Counter()
+    if directories is None:
+        directories = {}
+    reset_directory_cache()
+    dircache = directory_cache()
+    # Each level is a list of (directory, siblings, default title, parent directory).
+    level: List[Tuple[Path, dict, str, Optional[Path]]] = [(directory, siblings, title, None)]
+    seen_directories = {directory}
+    seen_files = set()
+    copies = []
+    with _executors(jobs, pool) as (page_executor, file_executor):
+        while level:
+            pages = []
+            for directory, siblings, title, parent in level:
+                output_file, context, data = _page_context(directory, src, dst, siblings, title,
+                                                           assets, search, previews)
+                # (title, links, written) of a page reused from the manifest or the cache.
+                previous: Optional[Tuple[str, dict, bool]] = None
+                status = 'reused'
+                if manifest is not None:
+                    reused = manifest.get_page(directory, context, output_file, parent)
+                    if reused is not None:
+                        previous = (*reused, False)
+                cache_key = None
+                if previous is None and cache is not None:
+                    cache_key = cache.page_key(_source_hash(directory), data_hash(context))
+                    previous = cache.get_page(cache_key, directory, output_file)
+                    if previous is not None:
+                        status = 'cached'
+                        if manifest is not None:
+                            manifest.add_page(directory, context, output_file, *previous[:2],
+                                              parent=parent)
+                        cache_key = None
+                future: Future
+                if previous is None:
+                    status = 'rendered'
+                    future = page_executor.submit(_render_page, directory, output_file,
+                                                  title, data)
+                else:
+                    future = Future()
+                    future.set_result((*previous, Counter(), 0.))
+                pages.append((directory, parent, output_file, context, cache_key, status,
+                              future))
+
+            level = []
+            for directory, parent, output_file, context, cache_key, status, future in pages:
+                title, links, written, cache_stats, seconds = future.result()
+                stats[status] += 1
+                rel = directory.relative_to(src).as_posix()
+                directories[rel] = Counter({'render seconds': seconds})
+                if written:
+                    stats['written'] += 1
+                    if manifest is not None:
+                        manifest.mark_changed(output_file)
+                generated = (status == 'rendered')
+                if jobs != 1:
+                    # Pages were rendered in other processes, with their own cache.
+                    stats.update(cache_stats)
+                if generated and manifest is not None:
+                    manifest.add_page(directory, context, output_file, title, links, parent)
+                if generated and cache is not None and cache_key is not None:
+                    cache.put_page(cache_key, output_file, title, links, link_targets(links))
+                write_nav_fragment(directory, links['directories'], output_file.parent, manifest)
+                for link in links['broken']:
+                    print(f"WARNING: '{directory / link!s}' link seems to be broken !")
+                for link in links['files']:
+                    src_file = normalize(directory / link)
+                    if src_file not in seen_files:
+                        seen_files.add(src_file)
+                        dst_file = translate_path(src_file, src, dst)
+                        copies.append((rel, file_executor.submit(
+                            _publish_file, src_file, dst_file, manifest, cache)))
+                for link, txt in links['directories'].items():
+                    path = normalize(directory / link)
+                    if path not in seen_directories:
+                        seen_directories.add(path)
+                        level.append((path, links['directories'], txt, directory))
+        for rel, copy in copies:
+            # Raise copy errors, if any.
+            published, size, seconds = copy.result()
+            if published:
+                stats['files published'] += 1
+                stats['bytes published'] += size
+                directories[rel].update({'files published': 1, 'bytes published': size,
+                                         'publish seconds': seconds})
+            else:
+                stats['files skipped'] += 1
+    stats.update(dircache.stats)
+
+
+def _source_hash(directory: Path) -> str:
+    "Return the hash of `index.md` content (or an empty string if there is none)."
+    index_file = directory / 'index.md'
+    return file_hash(index_file) if directory_cache().is_file(index_file) else ''
+
+
+def stylesheets(depth: int, dst: Path, assets: Optional[Dict[str, str]] = None
+                ) -> Tuple[str, str]:
+    """Return the common stylesheet and the stylesheet of a page at given `depth`,
+    relatively to output directory `dst`.
+
+    If an `assets` dict is given, fingerprinted names are returned
+    (see `campus.assets.publish_styles()`).
+    """
+    css_name = f'css/{depth}.css'
+    if assets is None:
+        if not directory_cache().is_file(dst / css_name):
+            css_name = 'css/default.css'
+        return 'css/all.css', css_name
+    if css_name not in assets:
+        css_name = 'css/default.css'
+    return assets['css/all.css'], assets[css_name]
+
+
+def _page_context(directory: Path, src: Path, dst: Path, siblings: dict, title: str,
+                  assets: Optional[Dict[str, str]] = None,
+                  search: bool = False, previews: bool = False) -> Tuple[Path, dict, dict]:
+    """Return output file, context and template data for the page of `directory`.
+
+    The context identifies everything needed to generate the page,
+    except `index.md` content and the template.
+    """
+    # Add stylesheet
+    depth = relative_depth(directory, src=src)
+    root = Path(*(depth*['..']))
+    common_stylesheet, stylesheet = (root / css for css in stylesheets(depth, dst, assets))
+    nav = generate_nav(siblings, directory, parent=(directory != src))
+    output_file = translate_path(directory, src, dst) / 'index.html'
+    # The previews index depends on the directory, so it must be part of the
+    # context (which is also used to find the page in the build cache).
+    index = previews_index(directory.relative_to(src).as_posix()) if previews else ''
+    context = {'title': title, 'nav': data_hash(nav),
+               'stylesheet': stylesheet.as_posix(),
+               'common_stylesheet': common_stylesheet.as_posix(),
+               'search': search, 'previews': index}
+    data = {'common_stylesheet': common_stylesheet,
+            'stylesheet': stylesheet,
+            'nav': nav,
+            'search': SEARCH_FORM.format(root=(root / SEARCH_PAGE).as_posix()) if search else '',
+            'previews': '',
+            }
+    if previews:
+        data['previews'] = PREVIEWS_SCRIPT.format(
+            script=(root / PREVIEWS_DIR / 'previews.js').as_posix(),
+            index=(root / index).as_posix())
+    return output_file, context, data
+
+
+def previews_index(rel: str) -> str:
+    """Return the path of the previews index of the page of directory `rel`
+    (relative to output directory).
+    """
+    return f'{PREVIEWS_DIR}/pages/{data_hash(rel)[:16]}.json'
+
+
+def _publish_file(src_file: Path, dst_file: Path, manifest: Optional[BuildManifest],
+                  cache: Optional[BuildCache]) -> Tuple[bool, int, float]:
+    """Call `publish_file()`, and return also file size and publishing time.
+
+    Return a `(published, size, seconds)` tuple.
+    """
+    start = time.perf_counter()
+    published = publish_file(src_file, dst_file, manifest, cache)
+    size = src_file.stat().st_size if published else 0
+    return published, size, time.perf_counter() - start
+
+
+def _render_page(directory: Path, output_file: Path, title: str,
+                 data: dict) -> Tuple[str, dict, bool, Counter, float]:
+    """Call `_generate_page()`, and return also the directory cache statistics
+    and the rendering time.
+
+    (Used to collect statistics from worker processes.)
+    """
+    start = time.perf_counter()
+    cache = directory_cache()
+    before = cache.stats.copy()
+    title, links, written = _generate_page(directory, output_file, title, data)
+    return title, links, written, cache.stats - before, time.perf_counter() - start
+
+
+def page_chunks(directory: Path, title: str, links: Dict[str, Dict[str, str]]
+                ) -> Iterator[Tuple[str, str]]:
+    """Render `index.md` file of `directory`, and yield `(title, html)` for each chunk.
+
+    The page title is its first <h1> title (removed from html), or `title` if
+    there is none: the title yielded with the last chunk is the final one.
+    Links found are classified and added to `links` dict
+    (see `extract_links()`).
+    """
+    title_found = False
+    for chunk in iter_index_md_as_html(directory):
+        if not title_found:
+            # Extract page title (it will be reinjected later).
+            main_title = find_title(chunk)
+            if main_title is not None:
+                title = main_title
+                title_found = True
+        if title_found:
+            # Avoid the <h1> title to appear twice !
+            # (It will be automatically generated in <header>.)
+            chunk = chunk.replace(f'<h1>{title}</h1>', '')
+        chunk_links, chunk = extract_links(directory, chunk)
+        for kind, found in chunk_links.items():
+            links[kind].update(found)
+        yield title, chunk
+
+
+def parse_page(directory: Path, title: str = '') -> Tuple[str, dict]:
+    "Return the title and links of `directory` page, without generating it."
+    links: Dict[str, Dict[str, str]] = {'directories': {}, 'files': {}, 'broken': {}}
+    for title, _ in page_chunks(directory, title, links):
+        pass
+    return title, links
+
+
+def _generate_page(directory: Path, output_file: Path, title: str,
+                   data: dict) -> Tuple[str, dict, bool]:
+    """Generate `output_file` from `index.md` file of `directory`.
+
+    Return page title, links, and whether `output_file` was written
+    (it is left untouched if its content didn't change).
+    """
+    links: Dict[str, Dict[str, str]] = {'directories': {}, 'files': {}, 'broken': {}}
+    # The page is only known once all the chunks are rendered (its title is
+    # needed first), so they are kept in a temporary file if they grow too large.
+    with SpooledTemporaryFile(max_size=SPOOL_SIZE, mode='w+', encoding='utf8') as main:
+        for title, chunk in page_chunks(directory, title, links):
+            main.write(chunk)
+        main.seek(0)
+        data = dict(data, main=iter(lambda: main.read(CHUNK_SIZE), ''), title=title)
+        html = load_template(INDEX_TEMPLATE_PATH).stream(data)
+        written = write_chunks_if_changed(output_file, (part.encode('utf8') for part in html))
+    return title, links, written
+
+
+#def generate_modules():
+#    pass
+#
+#
+#def generate_chapters():
+#    pass
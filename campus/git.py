@@ -0,0 +1,98 @@
+# -*- coding: utf-8 -*-
+"""
+Git helpers, used by `campus push` and `campus make --since`.
+"""
+
+from pathlib import Path, PurePosixPath
+from subprocess import CalledProcessError, Popen, run
+import time
+from typing import Collection, Iterable, List, Optional, Set
+
+
+class BackgroundCommand:
+    "Run a command in background (`wait()` raises an error if it failed)."
+
+    def __init__(self, args: List[str], **kwargs):
+        self.start = time.perf_counter()
+        self.process = Popen(args, **kwargs)  # pylint: disable=consider-using-with
+
+    def wait(self) -> float:
+        "Wait for the command to complete, and return its duration (in seconds)."
+        returncode = self.process.wait()
+        if returncode:
+            raise CalledProcessError(returncode, self.process.args)
+        return time.perf_counter() - self.start
+
+
+def _git_paths(repo: Path, command: List[str], paths: Collection[str]) -> None:
+    "Run git `command` on `paths` (passed through stdin, so there's no length limit)."
+    run(['git', '--literal-pathspecs', *command, '--pathspec-from-file=-',
+         '--pathspec-file-nul'], input='\0'.join(sorted(paths)), text=True,
+        cwd=repo, check=True)
+
+
+def stage(repo: Path, changed: Collection[str], removed: Collection[str],
+          everything: bool = False) -> bool:
+    """Stage changed and removed paths (relative to `repo`) in git repository `repo`.
+
+    If `everything` is True, the whole working tree is staged instead.
+    Return True if anything is staged (i.e. a commit is needed).
+    """
+    if everything:
+        run(['git', 'add', '--all'], cwd=repo, check=True)
+    else:
+        if changed:
+            _git_paths(repo, ['add'], changed)
+        if removed:
+            _git_paths(repo, ['rm', '--cached', '--quiet', '--ignore-unmatch'], removed)
+    # Compare index with HEAD (working tree is not scanned).
+    return run(['git', 'diff', '--cached', '--quiet'], cwd=repo).returncode != 0
+
+
+def _git_output(repo: Path, command: List[str]) -> List[str]:
+    "Run git `command` in `repo`, and return its NUL separated output."
+    output = run(['git', *command], cwd=repo, check=True, capture_output=True,
+                 text=True).stdout
+    return [item for item in output.split('\0') if item]
+
+
+def revision(repo: Path, rev: str = 'HEAD') -> Optional[str]:
+    "Return the commit hash of revision `rev` in `repo`, or None if it is unknown."
+    result = run(['git', 'rev-parse', '--verify', '--quiet', f'{rev}^{{commit}}'], cwd=repo,
+                 capture_output=True, text=True)
+    return result.stdout.strip() if result.returncode == 0 else None
+
+
+def tracked_paths(repo: Path, rev: str) -> Set[str]:
+    "Return the files and directories of revision `rev`, relative to `repo`."
+    return set(_git_output(repo, ['ls-tree', '-r', '-t', '-z', '--name-only', rev]))
+
+
+def changed_paths(repo: Path, rev: str, exclude: Iterable[str] = ()) -> Set[str]:
+    """Return the paths (relative to `repo`) changed since revision `rev`,
+    committed or not, and the untracked files.
+
+    The directories of changed paths are included, since their content changed.
+    The paths inside `exclude` directories (relative to `repo`) are ignored,
+    even if they are not ignored by git.
+    """
+    pathspec = ['--', '.', *(f':(exclude){path}' for path in exclude)]
+    # Status and path alternate in `diff --name-status -z` output.
+    changed = set(_git_output(repo, ['diff', '--name-status', '-z', '--no-renames',
+                                     '--relative', rev, *pathspec])[1::2])
+    changed.update(_git_output(repo, ['ls-files', '--others', '--exclude-standard', '-z',
+                                      *pathspec]))
+    for path in list(changed):
+        changed.update(parent.as_posix() for parent in PurePosixPath(path).parents)
+    return changed
+
+
+def source_revision(repo: Path) -> Optional[dict]:
+    """Return the HEAD commit of `repo`, and whether its tracked files match it,
+    as a `{'commit': 'hash', 'clean': True}` dict (or None outside a git repository).
+    """
+    commit = revision(repo)
+    if commit is None:
+        return None
+    clean = run(['git', 'diff', '--quiet', 'HEAD', '--', '.'], cwd=repo).returncode == 0
+    return {'commit': commit, 'clean': clean}
@@ -0,0 +1,84 @@
+# -*- coding: utf-8 -*-
+"""
+Indexing engine used by `campus index` and `campus indexall`.
+
+The tree is walked only once (each directory is listed with `os.scandir()`),
+every existing `index.md` file is parsed once into a set of links, and all
+the new entries of an `index.md` file are appended in a single write.
+"""
+
+from fnmatch import fnmatch
+import os
+from pathlib import Path
+import re
+from typing import List, Set
+
+MARKDOWN_LINK = '\\s*\\[[^]]+\\]\\(\\<?([^<>)]+)\\>?\\)'
+
+# Match links at the beginning of a line (like `re.match(MARKDOWN_LINK, line)`).
+_LINE_LINK = re.compile('^' + MARKDOWN_LINK, re.MULTILINE)
+
+
+def indexed_links(index_md: Path) -> Set[str]:
+    "Return the set of links already found in `index_md` file."
+    try:
+        with open(index_md, encoding='utf8') as file:
+            return set(_LINE_LINK.findall(file.read()))
+    except FileNotFoundError:
+        return set()
+
+
+def index_entry(path: Path) -> str:
+    "Return the markdown entry of `path` in an index.md file."
+    name = str(path.stem).replace('_', ' ')
+    return f'\n[{name}](<{path}>)\n'
+
+
+def _matches(glob: str, parent: Path, names: List[str]) -> List[Path]:
+    "Return the paths (relative to `parent`) matching `glob`, sorted."
+    if '/' in glob or os.sep in glob or '**' in glob:
+        # Pattern spanning several directories: let pathlib handle it.
+        return sorted(path.relative_to(parent) for path in parent.glob(glob))
+    return [Path(name) for name in names if fnmatch(name, glob)]
+
+
+def index_directory(glob: str, parent: Path, recursive: bool = False,
+                    dry_run: bool = False) -> int:
+    """Generate `index.md` file in `parent` if needed and add all files matching `glob` to it.
+
+    If `recursive` is True, subdirectories are indexed first.
+    If `dry_run` is True, nothing is written, but messages are still displayed.
+
+    Hidden files or directories, ie. those starting with a dot (".mydir", ".myfile"),
+     are never indexed, though you may add them manually to a `index.md` file.
+
+    Return the number of new entries.
+    """
+    with os.scandir(parent) as entries:
+        listing = {entry.name: entry.is_dir() for entry in entries}
+    names = sorted(listing)
+    count = 0
+    if recursive:
+        # Index all subdirectories content.
+        for name in names:
+            # Skip hidden directories (directories whose name starts with a dot).
+            if listing[name] and name[0] != '.':
+                count += index_directory(glob, parent / name, recursive=True, dry_run=dry_run)
+    index_md = parent / 'index.md'
+    if 'index.md' not in listing:
+        if not dry_run:
+            with open(index_md, 'w', encoding='utf8') as file:
+                file.write(f"# {parent.name.replace('_', ' ')}\n\n")
+        print(f"'{index_md}' file {'would be ' if dry_run else ''}created.")
+    if not glob:
+        return count
+    already_indexed = indexed_links(index_md)
+    new = [path for path in _matches(glob, parent, names)
+           if path.name != 'index.md' and path.name[0] != '.'
+           and path.as_posix() not in already_indexed]
+    if new and not dry_run:
+        with open(index_md, 'a', encoding='utf8') as file:
+            file.write(''.join(index_entry(path) for path in new))
+    for path in new:
+        print(f"{str(path.stem).replace('_', ' ')} {'would be ' if dry_run else ''}indexed.")
+    return count + len(new)
@@ -0,0 +1,470 @@
+# -*- coding: utf-8 -*-
+"""
+Build manifest, used for incremental builds.
+
+The manifest is a JSON file, which records the dependencies of every generated
+page and every published file, so that a change only invalidates the outputs
+depending on it:
+    - a page depends on its `index.md` file (mtime, size and content hash),
+      on its parent page `index.md` (which gives its title and navigation
+      menu), on its stylesheets, on the style version (template and campus
+      version), and on the kind of its links targets (file, directory or
+      nothing),
+    - a published file depends on its source file.
+
+The reason why each output was generated again is recorded in
+`BuildManifest.reasons` (see `campus make --explain`).
+
+Sources known to be unchanged since previous build (e.g. from git history,
+see `campus make --since`) may be trusted without being checked at all
+(see `BuildManifest.trust()`). So the source git revision of each build is
+recorded in 'revision', with 'clean' set to False if tracked files didn't
+match it.
+
+Format:
+    {'version': 3,
+     'style': 'hash',
+     'revision': {'commit': 'hash', 'clean': True} (or None),
+     'pages': {'rel/path/to/dir': {'source': {'mtime': 0, 'size': 0, 'hash': ''},
+                                   'parent': 'rel/path/to/parent/dir' (or None),
+                                   'context': {'title': 'title', 'nav': 'hash',
+                                               'stylesheet': '../css/1.css',
+                                               'common_stylesheet': '../css/all.css',
+                                               'search': False,
+                                               'previews': 'previews/pages/key.json'
+                                                           (or '')},
+                                   'title': 'title',
+                                   'links': {...}, 'targets': {'link': 'd'}}},
+     'files': {'rel/path/to/output': {'source': 'rel/path/to/source',
+                                      'mtime': 0, 'size': 0, 'hash': ''}},
+     'compressed': {'rel/path/to/output.gz': {'mtime': 0, 'size': 0, 'hash': ''}},
+     'outputs': ['rel/path/to/output', ...],
+     'unpublished': {'all': False, 'changed': ['rel/path/to/output', ...],
+                     'removed': ['rel/path/to/output', ...]}}
+
+(A compressed output records the fingerprint of the uncompressed one.)
+
+Outputs written or removed by successive builds are recorded in 'unpublished'
+until the website is committed (see `campus push`). 'all' is True after
+a build without previous build data: then, every output must be committed.
+"""
+
+import json
+from hashlib import sha256
+import os
+from os import replace
+from pathlib import Path
+import posixpath
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+from .fscache import directory_cache
+from .version import __version__
+
+MANIFEST_VERSION = 3
+
+KINDS = {'d': 'directory', 'f': 'file', '': 'nothing'}
+
+
+def file_hash(path: Path) -> str:
+    "Return the SHA-256 hex digest of the file content."
+    digest = sha256()
+    with open(path, 'rb') as file:
+        for chunk in iter(lambda: file.read(1 << 20), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def data_hash(*items) -> str:
+    "Return a hex digest identifying the given (JSON serializable) items."
+    return sha256(json.dumps(items, sort_keys=True, default=str).encode('utf8')).hexdigest()
+
+
+def style_version(*paths: Path) -> str:
+    """Return a hash identifying the style, i.e. the template and stylesheets.
+
+    Each path may be a file or a directory (all its files are then used).
+    """
+    digest = sha256(__version__.encode('utf8'))
+    for path in paths:
+        files = sorted(p for p in path.rglob('*') if p.is_file()) if path.is_dir() else [path]
+        for file in files:
+            digest.update(str(file.relative_to(path.parent)).encode('utf8'))
+            digest.update(file_hash(file).encode('ascii'))
+    return digest.hexdigest()
+
+
+def link_targets(links: dict) -> Dict[str, str]:
+    """Return the kind of the target of each link, as a {link: kind} dict.
+
+    The kind is 'd' for a directory, 'f' for a file and '' for a broken link
+    (see `campus.fscache.DirectoryCache.kind()`).
+    """
+    targets: Dict[str, str] = {}
+    for kind, name in (('d', 'directories'), ('f', 'files'), ('', 'broken')):
+        targets.update(dict.fromkeys(links[name], kind))
+    return targets
+
+
+class BuildManifest:
+    """Store data about previous build, and collect data about current one.
+
+    `src` is the source directory, and `dst` the output directory.
+    """
+
+    def __init__(self, path: Path, src: Path, dst: Path, style: str = ''):
+        self.path = path
+        self.src = src
+        self.dst = dst
+        self.style = style
+        # Source git revision of current build (see module docstring).
+        self.revision: Optional[dict] = None
+        self.old = self._load()
+        self.pending = self._pending(self.old)
+        self.pages: Dict[str, dict] = {}
+        # Fingerprints are None for missing sources.
+        self.files: Dict[str, Optional[dict]] = {}
+        self.compressed: Dict[str, Optional[dict]] = {}
+        self.outputs: Set[str] = set()
+        # Outputs written or removed during current build.
+        self.changed: Set[str] = set()
+        self.removed: Set[str] = set()
+        # Why outputs were generated again, as {output: reason}.
+        self.reasons: Dict[str, str] = {}
+        self.full = False
+        # Sources (relative to `src`) assumed unchanged since previous build.
+        self.unchanged: Set[str] = set()
+
+    def _load(self) -> dict:
+        "Load previous build data, if still relevant."
+        try:
+            with open(self.path, encoding='utf8') as file:
+                data = json.load(file)
+        except (OSError, ValueError):
+            return {}
+        if data.get('version') != MANIFEST_VERSION:
+            return {}
+        return data
+
+    def reset(self) -> None:
+        "Forget previous build (used for a full rebuild)."
+        self.old = {}
+        self.full = True
+        self.unchanged = set()
+        self.pending['all'] = True
+
+    @staticmethod
+    def _pending(data: dict) -> dict:
+        "Return the outputs not committed yet before current build (see module docstring)."
+        pending = data.get('unpublished', {})
+        return {'all': pending.get('all', not data),
+                'changed': set(pending.get('changed', ())),
+                'removed': set(pending.get('removed', ()))}
+
+    def unpublished(self) -> Tuple[Set[str], Set[str], bool]:
+        """Return the outputs written and removed since the website was last committed,
+        by current and previous builds, and whether every output must be committed.
+        """
+        pending = self.pending
+        return ((pending['changed'] - self.removed) | self.changed,
+                (pending['removed'] - self.changed) | self.removed, pending['all'])
+
+    def mark_published(self) -> None:
+        "Register that every output is committed (the changes of current build too)."
+        self.pending = self._pending({'unpublished': {}})
+        self.changed = set()
+        self.removed = set()
+
+    def data(self) -> dict:
+        "Return current build data."
+        changed, removed, all_ = self.unpublished()
+        return {'version': MANIFEST_VERSION,
+                'style': self.style,
+                'revision': self.revision,
+                'pages': self.pages,
+                'files': self.files,
+                'compressed': self.compressed,
+                'outputs': sorted(self.outputs),
+                'unpublished': {'all': all_, 'changed': sorted(changed),
+                                'removed': sorted(removed)}}
+
+    def save(self) -> None:
+        "Save current build data."
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = self.path.with_suffix('.tmp')
+        with open(tmp, 'w', encoding='utf8') as file:
+            # Much faster than `json.dump()`, which doesn't use the C encoder.
+            file.write(json.dumps(self.data()))
+        replace(tmp, self.path)
+
+    def restart(self, style: str, failed: bool = False) -> None:
+        """Prepare a new build, without reloading the manifest from disk.
+
+        Current build becomes the previous one, unless it `failed`: then, the
+        previous build is the last saved one, and the outputs of the failed
+        build are removed by the new one if they are not generated anymore.
+        """
+        data = self.data()
+        self.pending = self._pending(data)
+        if not failed:
+            self.old = data
+        else:
+            self.old = self._load()
+            if self.old:
+                self.old['outputs'] = sorted(self.outputs.union(self.old['outputs']))
+        self.style = style
+        self.pages = {}
+        self.files = {}
+        self.compressed = {}
+        self.outputs = set()
+        self.changed = set()
+        self.removed = set()
+        self.reasons = {}
+        self.full = False
+        self.unchanged = set()
+
+    def trust(self, unchanged: Iterable[str]) -> None:
+        """Assume that the sources in `unchanged` (paths relative to `src`) didn't
+        change since previous build.
+
+        They are not checked at all: a page whose `index.md` is unchanged is only
+        checked against its context and its output, the kind of unchanged links
+        targets isn't tested, and a file published from an unchanged source
+        is skipped (even if its output is missing).
+        """
+        self.unchanged = set(unchanged)
+
+    def _trusted(self, path: Path) -> bool:
+        return bool(self.unchanged) and self._rel(path, self.src) in self.unchanged
+
+    def sources(self, previous: bool = False) -> Iterable[Path]:
+        """Return all the source files and directories used by current build
+        (and by previous build too if `previous` is True, since a failed build
+        may not have reached all of them).
+
+        Directories are included, since creating or removing a file changes
+        its directory mtime (and may fix or break a link).
+        """
+        builds: List[dict] = [{'pages': self.pages, 'files': self.files}]
+        if previous:
+            builds.append(self.old)
+        for data in builds:
+            for rel in data.get('pages', {}):
+                yield self.src / rel
+                yield self.src / rel / 'index.md'
+            for fingerprint in data.get('files', {}).values():
+                if fingerprint is not None:
+                    yield self.src / fingerprint['source']
+
+    def _rel(self, path: Path, root: Path) -> str:
+        return path.relative_to(root).as_posix()
+
+    def add_output(self, path: Path) -> None:
+        "Register a generated file (`path` must be inside output directory)."
+        self.outputs.add(self._rel(path, self.dst))
+
+    def mark_changed(self, path: Path) -> None:
+        "Register a generated file as written during current build."
+        self.changed.add(self._rel(path, self.dst))
+
+    def add_generated(self, path: Path, written: bool) -> None:
+        "Register a file generated during the build (other than a page), and if it was written."
+        self.add_output(path)
+        if written:
+            self.mark_changed(path)
+            self.reasons[self._rel(path, self.dst)] = 'content changed'
+
+    @staticmethod
+    def fingerprint(path: Path, previous: Optional[dict] = None) -> Optional[dict]:
+        """Return mtime, size and hash of the file, or None if it doesn't exist.
+
+        If `path` mtime and size did not change, the previous hash is reused.
+        """
+        try:
+            stat = path.stat()
+        except OSError:
+            return None
+        data: dict = {'mtime': stat.st_mtime_ns, 'size': stat.st_size}
+        if previous and all(previous.get(key) == data[key] for key in data):
+            data['hash'] = previous['hash']
+        else:
+            data['hash'] = file_hash(path)
+        return data
+
+    @staticmethod
+    def _same_content(new: Optional[dict], old: Optional[dict]) -> bool:
+        if new is None or old is None:
+            return new is old
+        return new['hash'] == old['hash']
+
+    def _new(self, kind: str) -> str:
+        return 'full build' if self.full else f'new {kind}'
+
+    def file_changed(self, src_file: Path, dst_file: Path) -> bool:
+        "Register file `src_file` published as `dst_file`, and test if it must be copied."
+        rel = self._rel(dst_file, self.dst)
+        # A file published again after the build (see `Site.update()`) is compared
+        # with its current version, not the one of previous build.
+        if rel in self.files:
+            previous = self.files[rel]
+        else:
+            previous = self.old.get('files', {}).get(rel)
+        if (previous is not None and previous['source'] == self._rel(src_file, self.src)
+                and previous['source'] in self.unchanged):
+            self.files[rel] = previous
+            self.outputs.add(rel)
+            return False
+        fingerprint = self.fingerprint(src_file, previous)
+        if fingerprint is not None:
+            fingerprint['source'] = self._rel(src_file, self.src)
+        self.files[rel] = fingerprint
+        self.outputs.add(rel)
+        if previous is None:
+            self.reasons[rel] = self._new('file')
+        elif not self._same_content(fingerprint, previous):
+            self.reasons[rel] = 'source changed'
+        elif not dst_file.is_file():
+            self.reasons[rel] = 'output missing'
+        else:
+            return False
+        return True
+
+    def compressed_changed(self, path: Path, compressed: Path) -> bool:
+        "Register `compressed` as compressed copy of `path`, and test if it must be written."
+        rel = self._rel(compressed, self.dst)
+        previous = self.old.get('compressed', {}).get(rel)
+        fingerprint = self.fingerprint(path, previous)
+        self.compressed[rel] = fingerprint
+        self.outputs.add(rel)
+        if previous is None:
+            self.reasons[rel] = self._new('file')
+        elif not self._same_content(fingerprint, previous):
+            self.reasons[rel] = 'source changed'
+        elif not compressed.is_file():
+            self.reasons[rel] = 'output missing'
+        else:
+            return False
+        return True
+
+    def source_changed(self, dst_file: Path) -> bool:
+        "Test if the source of `dst_file` changed since previous build (see `file_changed()`)."
+        rel = self._rel(dst_file, self.dst)
+        previous = self.old.get('files', {}).get(rel)
+        return previous is not None and not self._same_content(self.files.get(rel), previous)
+
+    def source_hash(self, dst_file: Path) -> Optional[str]:
+        "Return the content hash of the source of `dst_file` (see `file_changed()`)."
+        fingerprint = self.files.get(self._rel(dst_file, self.dst))
+        return fingerprint['hash'] if fingerprint else None
+
+    def get_page(self, directory: Path, context: dict, output: Path,
+                 parent: Optional[Path] = None) -> Optional[Tuple[str, dict]]:
+        """Return `(title, links)` if the page generated previously is still valid.
+
+        `context` identifies everything needed to generate the page, except
+        `index.md` content: its title and navigation menu (given by
+        `parent` page), and its stylesheet.
+
+        If the page is still valid, it is registered for current build,
+        else the reason is stored in `reasons`, and None is returned.
+        """
+        rel = self._rel(directory, self.src)
+        previous = self.old.get('pages', {}).get(rel)
+        source = None
+        if previous is not None:
+            source = (previous['source'] if self._trusted(directory / 'index.md')
+                      else self.fingerprint(directory / 'index.md', previous['source']))
+        reason = self._page_changed(directory, context, output, parent, previous, source)
+        if reason:
+            self.reasons[self._rel(output, self.dst)] = reason
+            return None
+        assert previous is not None
+        self.pages[rel] = dict(previous, source=source, parent=self._parent(parent))
+        self.add_output(output)
+        return previous['title'], previous['links']
+
+    def _parent(self, parent: Optional[Path]) -> Optional[str]:
+        return None if parent is None else self._rel(parent, self.src)
+
+    def _page_changed(self, directory: Path, context: dict, output: Path,
+                      parent: Optional[Path], previous: Optional[dict],
+                      source: Optional[dict]) -> str:
+        "Return why the page must be generated again (or an empty string)."
+        if previous is None:
+            return self._new('page')
+        if self.old.get('style') != self.style:
+            return 'template changed'
+        if not self._same_content(source, previous['source']):
+            return 'index.md changed'
+        index_md = (Path(self._parent(parent) or '.') / 'index.md').as_posix()
+        for name, reason in (('title', f"title changed (see '{index_md}')"),
+                             ('nav', f"navigation menu changed (see '{index_md}')"),
+                             ('stylesheet', 'stylesheet changed'),
+                             ('common_stylesheet', 'stylesheet changed'),
+                             ('search', 'search form changed'),
+                             ('previews', 'previews script changed')):
+            if previous['context'].get(name) != context[name]:
+                return reason
+        if not output.is_file():
+            return 'output missing'
+        # Links targets may have been created or removed since last build.
+        cache = directory_cache()
+        rel = self._rel(directory, self.src)
+        for link, kind in previous['targets'].items():
+            if (self.unchanged
+                    and posixpath.normpath(posixpath.join(rel, link)) in self.unchanged):
+                continue
+            new_kind = cache.kind(directory / link)
+            if new_kind != kind:
+                return f"link target changed: '{link}' ({KINDS[kind]} -> {KINDS[new_kind]})"
+        return ''
+
+    def add_page(self, directory: Path, context: dict, output: Path, title: str, links: dict,
+                 parent: Optional[Path] = None) -> None:
+        "Register a newly generated page."
+        self.pages[self._rel(directory, self.src)] = {
+            'source': self.fingerprint(directory / 'index.md'),
+            'parent': self._parent(parent), 'context': context,
+            'title': title, 'links': links, 'targets': link_targets(links)}
+        self.add_output(output)
+
+    def explain(self) -> str:
+        "Return why each output was generated again, one output per line."
+        lines = []
+        for rel, reason in sorted(self.reasons.items()):
+            if rel not in self.changed:
+                reason += ' (output already up to date)'
+            lines.append(f'{rel}: {reason}')
+        return '\n'.join(lines)
+
+    def _existing_outputs(self) -> Set[str]:
+        "Return all the files found in output directory (except git data)."
+        existing: Set[str] = set()
+        for root, dirs, files in os.walk(self.dst):
+            if Path(root) == self.dst and '.git' in dirs:
+                dirs.remove('.git')
+            existing.update(self._rel(Path(root) / name, self.dst) for name in files)
+        return existing
+
+    def remove_stale(self) -> List[Path]:
+        """Remove outputs of previous build which were not generated again.
+
+        If there is no previous build data (first or full build), all the files
+        of the output directory which were not generated are removed,
+        except git data.
+        """
+        previous: Iterable[str] = (self.old.get('outputs', ()) if self.old
+                                   else self._existing_outputs())
+        stale = set(previous) - self.outputs
+        removed = []
+        for rel in sorted(stale):
+            path = self.dst / rel
+            if path.is_file():
+                path.unlink()
+                removed.append(path)
+                self.removed.add(rel)
+            # Remove empty parent directories.
+            parent = path.parent
+            while parent != self.dst and parent.is_dir() and not any(parent.iterdir()):
+                parent.rmdir()
+                parent = parent.parent
+        return removed
@@ -9,3 +9,36 @@ Created on Thu Oct 14 08:32:17 2021
 STYLES_PATH = '{CAMPUS}/data/styles'
 STYLE_NAME = 'default'
 OUTPUTDIR_NAME = '.www'
+# Build state (manifest...), used for incremental builds.
+BUILDDIR_NAME = '.campus-config/build'
+# Strategy used to publish linked files and styles in output directory:
+# 'auto', 'reflink', 'hardlink', 'symlink' or 'copy' (see `campus.publish`).
+PUBLISH_STRATEGY = 'auto'
+# Copies of linked files larger than this (in bytes) are resumed by the next
+# build if interrupted, and copies may be verified by comparing their hash
+# with the source hash (see `campus.transfer`).
+RESUME_MIN_SIZE = 2**26
+VERIFY_COPIES = False
+# Content-addressed build cache directory, which may be shared between
+# several repositories or machines ('' to disable it), and its maximal size
+# in bytes (see `campus.cache`).
+CACHE_DIR = ''
+CACHE_MAX_SIZE = 5 * 2**30
+# Publish stylesheets and pictures under content-hashed names, so that
+# they may be cached forever (see `campus.assets`).
+FINGERPRINT_ASSETS = False
+# Write compressed copies (`.gz`) of outputs with these suffixes
+# (see `campus.compress`).
+COMPRESS_OUTPUT = False
+COMPRESS_SUFFIXES = ('.html', '.css', '.svg')
+# Generate a search index and a search page (see `campus.search`).
+SEARCH_INDEX = False
+# The navigation menu of a page with more than NAV_MAX_SIBLINGS siblings only
+# lists NAV_WINDOW siblings before and after it, and loads the full menu
+# on demand (see `campus.generate_website.generate_nav()`).
+NAV_MAX_SIBLINGS = 50
+NAV_WINDOW = 10
+# Display linked files sizes, pages count and previews (at most PREVIEW_SIZE
+# pixels wide and high), see `campus.previews`.
+FILE_PREVIEWS = False
+PREVIEW_SIZE = 240
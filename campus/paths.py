@@ -4,16 +4,39 @@
 Created on Thu Oct 14 17:08:23 2021
 
 @author: nicolas
+
+Paths relative to the current directory (`OUTPUT_PATH`, `BUILD_PATH`,
+`MANIFEST_PATH` and `CACHE_PATH`) are resolved when they are used,
+not when `campus` is imported.
 """
 
 from pathlib import Path
+from typing import Dict, Optional
 
-from .param import OUTPUTDIR_NAME, STYLES_PATH, STYLE_NAME
+from .param import OUTPUTDIR_NAME, STYLES_PATH, STYLE_NAME, BUILDDIR_NAME, CACHE_DIR
 
-OUTPUT_PATH = Path(OUTPUTDIR_NAME).resolve()
 PACKAGE_PATH = Path(__file__).parent.resolve()
 # Replace '{CAMPUS}' in STYLE_PATH with campus library path.
 STYLE_PATH = Path(STYLES_PATH.format(CAMPUS=PACKAGE_PATH)) / STYLE_NAME
 INDEX_TEMPLATE_PATH = PACKAGE_PATH / 'data/templates/index.html'
 
-del OUTPUTDIR_NAME, STYLES_PATH, STYLE_NAME
+del STYLES_PATH, STYLE_NAME
+
+
+def root_paths(root: Path) -> Dict[str, Optional[Path]]:
+    """Return the paths of campus root directory `root`, as a dict
+    (`{'OUTPUT_PATH': ..., 'BUILD_PATH': ..., 'MANIFEST_PATH': ..., 'CACHE_PATH': ...}`).
+    """
+    build_path = (root / BUILDDIR_NAME).resolve()
+    return {'OUTPUT_PATH': (root / OUTPUTDIR_NAME).resolve(),
+            'BUILD_PATH': build_path,
+            'MANIFEST_PATH': build_path / 'manifest.json',
+            'CACHE_PATH': (root / Path(CACHE_DIR).expanduser()).resolve() if CACHE_DIR else None}
+
+
+def __getattr__(name: str):
+    "Resolve paths relative to the current directory (see module docstring)."
+    try:
+        return root_paths(Path.cwd())[name]
+    except KeyError:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}") from None
@@ -0,0 +1,259 @@
+# -*- coding: utf-8 -*-
+"""
+Linked files sizes, pages count and previews.
+
+Students may see what a linked file is before downloading it: after each file
+link, pages display its size, its pages count (for PDF files), and a preview
+when the link is hovered (for PDF files and pictures).
+
+Files information is computed after the build, using local tools only:
+    - pages count is read from the PDF file (or given by `pdfinfo`, if available),
+    - PDF previews are rendered by `pdftoppm` (from poppler), if available,
+    - pictures previews are rendered by Pillow, if installed.
+
+Information and previews are cached by content hash (in `BUILD_PATH/previews/`),
+so they are only computed once for each version of a file, in parallel.
+
+Output (see `campus.generate_website.PREVIEWS_DIR`):
+    - `previews/{hash}.png`: previews, named after the file content hash,
+    - `previews/pages/{key}.json`: information about the files linked
+      from a page, as `{link: {'size': 0, 'pages': 0, 'preview': 'url'}}`,
+    - `previews/previews.js`: the script displaying it (included by pages).
+
+Linked files information is loaded by pages, rather than written in them,
+so that a page isn't generated again each time a file it links to changes.
+"""
+
+from collections import Counter
+from concurrent.futures import Executor
+from contextlib import nullcontext
+import json
+import os
+import posixpath
+import re
+import shutil
+import subprocess
+from pathlib import Path
+from tempfile import TemporaryDirectory
+from typing import Dict, List, Optional, Set
+
+from .compress import _executor
+from .generate_website import PREVIEWS_DIR, previews_index
+from .manifest import BuildManifest
+from .param import PREVIEW_SIZE
+from .publish import write_if_changed
+
+# Number of hex digits of the content hash used in previews names.
+HASH_LENGTH = 16
+
+PICTURES = ('.png', '.jpg', '.jpeg', '.gif', '.webp', '.bmp')
+
+_PDF_PAGES = re.compile(rb'/Type\s*/Pages\b[^>]{0,200}?/Count\s+(\d+)'
+                        rb'|/Count\s+(\d+)[^>]{0,200}?/Type\s*/Pages\b')
+_PDF_PAGE = re.compile(rb'/Type\s*/Page\b(?!s)')
+# PDF files are scanned by chunks, which overlap so that no match is cut.
+PDF_CHUNK_SIZE = 2**20
+_PDF_OVERLAP = 512
+
+PREVIEWS_SCRIPT = '''
+const script = document.currentScript;
+const style = document.createElement('style');
+style.textContent = `.file-info {position: relative}
+.file-info img {display: none; position: absolute; left: 0; top: 1.5em; z-index: 1;
+                max-width: %(size)dpx; background: white; box-shadow: 0 0 .5em grey}
+a:hover + .file-info img, .file-info:hover img {display: block}`;
+document.head.append(style);
+const size = n => {
+    const units = ['B', 'kB', 'MB', 'GB'];
+    let i = 0;
+    while (n >= 1000 && i < units.length - 1) { n /= 1000; i++; }
+    return (i ? n.toFixed(1) : n) + ' ' + units[i];
+};
+fetch(script.dataset.index).then(r => r.ok ? r.json() : {}).catch(() => ({})).then(files => {
+    for (const link of document.querySelectorAll('main a[href]')) {
+        let info;
+        try { info = files[decodeURI(link.getAttribute('href'))]; } catch (e) { continue; }
+        if (!info) continue;
+        const span = document.createElement('small');
+        span.className = 'file-info';
+        span.textContent = ' (' + [info.pages && info.pages + ' pages', size(info.size)]
+                                  .filter(Boolean).join(', ') + ')';
+        if (info.preview) {
+            const img = document.createElement('img');
+            img.loading = 'lazy';
+            img.alt = '';
+            img.src = info.preview;
+            span.append(img);
+        }
+        link.after(span);
+    }
+});
+'''
+
+
+def pdf_pages(path: Path) -> Optional[int]:
+    "Return the pages count of PDF file `path` (or None if unknown)."
+    if shutil.which('pdfinfo'):
+        result = subprocess.run(['pdfinfo', str(path)], capture_output=True, text=True,
+                                check=False)
+        match = re.search(r'^Pages:\s+(\d+)', result.stdout, re.MULTILINE)
+        if match:
+            return int(match.group(1))
+    # The root pages tree node gives the pages count (unless it is in
+    # a compressed object stream).
+    counts: List[int] = []
+    pages = 0
+    data = b''
+    with open(path, 'rb') as file:
+        for chunk in iter(lambda: file.read(PDF_CHUNK_SIZE), b''):
+            data += chunk
+            # Matches starting in the overlap are found in the next chunk.
+            end = len(data) - _PDF_OVERLAP
+            if end > 0:
+                counts.extend(int(match.group(1) or match.group(2))
+                              for match in _PDF_PAGES.finditer(data) if match.start() < end)
+                pages += sum(match.start() < end for match in _PDF_PAGE.finditer(data))
+                data = data[end:]
+    counts.extend(int(a or b) for a, b in _PDF_PAGES.findall(data))
+    pages += len(_PDF_PAGE.findall(data))
+    if counts:
+        return max(counts)
+    return pages or None
+
+
+def render_preview(path: Path, png: Path, size: int = PREVIEW_SIZE) -> bool:
+    """Render a preview of `path` (PDF first page, or picture) as `png` file,
+    at most `size` pixels wide and high.
+
+    Return False if no preview can be rendered (missing tool, unsupported format...).
+    """
+    suffix = path.suffix.lower()
+    if suffix == '.pdf':
+        if not shutil.which('pdftoppm'):
+            return False
+        result = subprocess.run(['pdftoppm', '-png', '-singlefile', '-f', '1', '-l', '1',
+                                 '-scale-to', str(size), str(path), str(png.with_suffix(''))],
+                                capture_output=True, check=False)
+        return result.returncode == 0 and png.is_file()
+    if suffix in PICTURES:
+        try:
+            from PIL import Image  # type: ignore  # pylint: disable=import-outside-toplevel
+        except ImportError:
+            return False
+        try:
+            with Image.open(path) as image:
+                image.thumbnail((size, size))
+                image.save(png, 'PNG')
+        except OSError:
+            return False
+        return True
+    return False
+
+
+def file_info(path: Path, entry: Path) -> dict:
+    """Compute information about file `path`, and store it in cache `entry`
+    (`entry.json`, and `entry.png` for the preview).
+
+    Return the information, as a `{'size': 0, 'pages': 0, 'preview': True}` dict.
+    """
+    info: dict = {'size': path.stat().st_size}
+    if path.suffix.lower() == '.pdf':
+        pages = pdf_pages(path)
+        if pages:
+            info['pages'] = pages
+    entry.parent.mkdir(parents=True, exist_ok=True)
+    with TemporaryDirectory(dir=entry.parent) as tmp:
+        png = Path(tmp) / 'preview.png'
+        info['preview'] = render_preview(path, png)
+        if info['preview']:
+            os.replace(png, entry.with_suffix('.png'))
+    tmp_json = entry.with_name(f'.{entry.name}.{os.getpid()}.tmp')
+    tmp_json.write_text(json.dumps(info), encoding='utf8')
+    os.replace(tmp_json, entry.with_suffix('.json'))
+    return info
+
+
+def _cached_info(entry: Path) -> Optional[dict]:
+    try:
+        with open(entry.with_suffix('.json'), encoding='utf8') as file:
+            return json.load(file)
+    except (OSError, ValueError):
+        return None
+
+
+def update_previews(manifest: BuildManifest, cache: Path, jobs: int = 1,
+                    executor: Optional[Executor] = None) -> Counter:
+    """Write linked files information and previews in output directory.
+
+    Information missing in `cache` directory is computed using `jobs`
+    processes (or `executor`, which is then not shut down).
+    Cache entries of files which are not linked anymore are removed.
+    Return statistics (files computed or found in cache, previews written).
+    """
+    dst = manifest.dst
+    stats: Counter = Counter()
+    # {page: {link: content hash}}
+    pages: Dict[str, Dict[str, str]] = {}
+    sources: Dict[str, Path] = {}
+    for rel, page in sorted(manifest.pages.items()):
+        links = pages[rel] = {}
+        for link in page['links']['files']:
+            url = posixpath.normpath(posixpath.join(rel, link))
+            fingerprint = manifest.files.get(url)
+            if fingerprint is not None:
+                links[link] = fingerprint['hash']
+                sources[fingerprint['hash']] = manifest.src / fingerprint['source']
+
+    def entry(digest: str) -> Path:
+        return cache / digest[:2] / digest
+
+    infos = {}
+    with (_executor(jobs) if executor is None else nullcontext(executor)) as executor:
+        futures = {}
+        for digest, path in sources.items():
+            info = _cached_info(entry(digest))
+            if info is None:
+                futures[digest] = executor.submit(file_info, path, entry(digest))
+            else:
+                infos[digest] = info
+                stats['previews cached'] += 1
+        for digest, future in futures.items():
+            infos[digest] = future.result()
+            stats['previews computed'] += 1
+
+    previews: Dict[str, str] = {}
+    for digest, info in infos.items():
+        if info['preview']:
+            name = f'{PREVIEWS_DIR}/{digest[:HASH_LENGTH]}.png'
+            path = dst / name
+            if path.is_file():
+                manifest.add_output(path)
+            else:
+                path.parent.mkdir(parents=True, exist_ok=True)
+                shutil.copyfile(entry(digest).with_suffix('.png'), path)
+                manifest.add_generated(path, True)
+                stats['previews written'] += 1
+            previews[digest] = name
+    for rel, links in pages.items():
+        data = {}
+        for link, digest in sorted(links.items()):
+            data[link] = {key: value for key, value in infos[digest].items() if key != 'preview'}
+            if digest in previews:
+                data[link]['preview'] = posixpath.relpath(previews[digest], rel)
+        _write(manifest, dst / previews_index(rel), json.dumps(data, separators=(',', ':'),
+                                                               ensure_ascii=False))
+    _write(manifest, dst / PREVIEWS_DIR / 'previews.js',
+           PREVIEWS_SCRIPT % {'size': PREVIEW_SIZE})
+    _prune(cache, set(sources))
+    return stats
+
+
+def _write(manifest: BuildManifest, path: Path, text: str) -> None:
+    manifest.add_generated(path, write_if_changed(path, text.encode('utf8')))
+
+
+def _prune(cache: Path, used: Set[str]) -> None:
+    "Remove cache entries of files which are not linked anymore."
+    for path in cache.glob('*/*'):
+        if path.stem not in used and path.is_file() and not path.name.startswith('.'):
+            path.unlink()
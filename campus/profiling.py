@@ -0,0 +1,75 @@
+# -*- coding: utf-8 -*-
+"""
+Build instrumentation: phases timings, counters and per-directory costs.
+
+Used by `campus make --profile` (or `--profile-json FILE`).
+"""
+
+from collections import Counter
+from contextlib import contextmanager
+import time
+from typing import Dict, Iterator, List, Tuple
+
+
+class Timings:
+    "Record the duration of successive (or concurrent) phases."
+
+    def __init__(self):
+        self.phases: Dict[str, float] = {}
+
+    def add(self, name: str, duration: float) -> None:
+        "Add `duration` (in seconds) to phase `name`."
+        self.phases[name] = self.phases.get(name, 0) + duration
+
+    @contextmanager
+    def phase(self, name: str) -> Iterator[None]:
+        "Context manager timing phase `name`."
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add(name, time.perf_counter() - start)
+
+    def report(self) -> str:
+        "Return a human readable summary."
+        width = max((len(name) for name in self.phases), default=0)
+        return '\n'.join(f'{name:<{width}} {duration:8.2f}s'
+                         for name, duration in self.phases.items())
+
+
+class BuildProfile:
+    """Collect build statistics.
+
+    - `timings`: phases timings,
+    - `counters`: global counters (see `campus.generate_website.generate_website()`),
+    - `directories`: costs of each directory, as `{'relative/path': Counter}`.
+    """
+
+    def __init__(self):
+        self.timings = Timings()
+        self.counters: Counter = Counter()
+        self.directories: Dict[str, Counter] = {}
+
+    def slowest(self, count: int = 10) -> List[Tuple[str, Counter]]:
+        "Return the `count` most expensive directories (render and publish time)."
+        def cost(item: Tuple[str, Counter]) -> float:
+            return item[1]['render seconds'] + item[1]['publish seconds']
+        return sorted(self.directories.items(), key=cost, reverse=True)[:count]
+
+    def report(self, count: int = 10) -> str:
+        "Return a human readable summary."
+        lines = ['Phases:', self.timings.report(), '', 'Counters:']
+        width = max((len(name) for name in self.counters), default=0)
+        lines.extend(f'{name:<{width}} {value:>10}' for name, value in sorted(self.counters.items()))
+        lines.extend(['', f'Slowest directories ({count} max):',
+                      f"{'render':>8} {'publish':>8} {'files':>6} {'bytes':>12}  directory"])
+        for rel, costs in self.slowest(count):
+            lines.append(f"{costs['render seconds']:8.3f} {costs['publish seconds']:8.3f} "
+                         f"{costs['files published']:6} {costs['bytes published']:12}  {rel}")
+        return '\n'.join(lines)
+
+    def to_json(self) -> dict:
+        "Return all the data as a JSON serializable dict."
+        return {'phases': self.timings.phases,
+                'counters': dict(self.counters),
+                'directories': {rel: dict(costs) for rel, costs in self.directories.items()}}
@@ -0,0 +1,240 @@
+# -*- coding: utf-8 -*-
+"""
+Publish files in output directory.
+
+Several strategies are available:
+    - 'reflink': copy-on-write clone of the file (only supported on some
+      filesystems, like Btrfs or XFS): no data is copied, and modifying
+      either file doesn't affect the other one.
+    - 'hardlink': the published file is the source file itself.
+      No data is copied, but modifying the source file in place
+      (like pdflatex does) modifies the published file too, so the previous
+      version is lost (the new one is published anyway).
+    - 'symlink': the published file is a (relative) symbolic link to the source
+      file. Only useful to preview the website locally, since git stores
+      symbolic links themselves, not the targets.
+    - 'copy': the file is copied (atomically, and in a resumable way for
+      large files, see `campus.transfer`).
+    - 'auto': the cheapest safe one ('reflink', then 'copy').
+
+If a strategy fails (for example, hard links can't cross filesystems),
+the next one in `FALLBACKS` is used instead.
+
+Every strategy writes a temporary file, then renames it: an existing
+published file is never written into (it may be a hard link to the source),
+and it is kept if publishing fails.
+"""
+
+import errno
+from filecmp import cmp
+import os
+from pathlib import Path
+from typing import BinaryIO, Dict, Iterable, Optional, Set, Tuple, TYPE_CHECKING
+
+from .manifest import BuildManifest, file_hash
+from .param import PUBLISH_STRATEGY
+from .transfer import copy_file
+
+if TYPE_CHECKING:
+    from .cache import BuildCache
+
+try:
+    from fcntl import ioctl
+except ImportError:  # Windows
+    ioctl = None  # type: ignore
+
+# See linux/fs.h.
+FICLONE = 0x40049409
+
+FALLBACKS: Dict[str, Tuple[str, ...]] = {
+    'auto': ('reflink', 'copy'),
+    'reflink': ('reflink', 'copy'),
+    'hardlink': ('hardlink', 'copy'),
+    'symlink': ('symlink', 'copy'),
+    'copy': ('copy',),
+}
+
+# Strategies which failed for a given (source device, destination device) pair.
+# This avoids trying again and again a doomed syscall for every file.
+_unsupported: Set[Tuple[str, int, int]] = set()
+
+
+def _tmp_path(dst_file: Path) -> Path:
+    "Return a temporary path for `dst_file` (a leftover of an interrupted build is removed)."
+    tmp = dst_file.with_name(f'.{dst_file.name}.{os.getpid()}.tmp')
+    if os.path.lexists(tmp):
+        tmp.unlink()
+    return tmp
+
+
+def _replace(tmp: Path, dst_file: Path) -> None:
+    "Rename `tmp` as `dst_file`."
+    try:
+        os.replace(tmp, dst_file)
+    finally:
+        # Renaming does nothing if both are links to the same file.
+        if os.path.lexists(tmp):
+            tmp.unlink()
+
+
+def reflink(src_file: Path, dst_file: Path) -> None:
+    "Clone `src_file` as `dst_file` (copy-on-write), or raise an OSError."
+    if ioctl is None:
+        raise OSError(errno.ENOTSUP, 'reflink not supported on this platform')
+    tmp = _tmp_path(dst_file)
+    with open(src_file, 'rb') as src, open(tmp, 'wb') as dst:
+        try:
+            ioctl(dst.fileno(), FICLONE, src.fileno())
+        except OSError:
+            dst.close()
+            tmp.unlink()
+            raise
+    _replace(tmp, dst_file)
+
+
+def hardlink(src_file: Path, dst_file: Path) -> None:
+    "Make `dst_file` a hard link to `src_file`."
+    tmp = _tmp_path(dst_file)
+    os.link(src_file, tmp)
+    _replace(tmp, dst_file)
+
+
+def symlink(src_file: Path, dst_file: Path) -> None:
+    "Make `dst_file` a relative symbolic link to `src_file`."
+    tmp = _tmp_path(dst_file)
+    os.symlink(os.path.relpath(src_file.resolve(), dst_file.parent.resolve()), tmp)
+    _replace(tmp, dst_file)
+
+
+STRATEGIES = {'reflink': reflink, 'hardlink': hardlink, 'symlink': symlink, 'copy': copy_file}
+
+
+def publish(src_file: Path, dst_file: Path, strategy: str = PUBLISH_STRATEGY) -> str:
+    """Publish `src_file` as `dst_file`, using given strategy.
+
+    Any existing `dst_file` is replaced atomically (see module docstring).
+    Return the strategy effectively used.
+    """
+    dst_file.parent.mkdir(parents=True, exist_ok=True)
+    devices = (src_file.stat().st_dev, dst_file.parent.stat().st_dev)
+    for name in FALLBACKS[strategy]:
+        if (name, *devices) in _unsupported:
+            continue
+        try:
+            STRATEGIES[name](src_file, dst_file)
+            return name
+        except OSError:
+            if name == 'copy':
+                raise
+            _unsupported.add((name, *devices))
+    raise RuntimeError(f'No strategy left to publish "{src_file}".')
+
+
+def same_content(src_file: Path, dst_file: Path) -> bool:
+    "Test if `dst_file` exists and has the same content as `src_file`."
+    try:
+        return os.path.samefile(src_file, dst_file) or cmp(src_file, dst_file, shallow=False)
+    except OSError:
+        return False
+
+
+def write_if_changed(path: Path, content: bytes) -> bool:
+    """Write `content` in `path`, unless the file already has this content.
+
+    The file is written atomically (a temporary file is renamed), so
+    an interrupted build never leaves a truncated file.
+    Return True if the file was written.
+    """
+    try:
+        if path.stat().st_size == len(content) and path.read_bytes() == content:
+            return False
+    except OSError:
+        pass
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_name(f'.{path.name}.{os.getpid()}.tmp')
+    tmp.write_bytes(content)
+    os.replace(tmp, path)
+    return True
+
+
+def write_chunks_if_changed(path: Path, chunks: Iterable[bytes]) -> bool:
+    """Like `write_if_changed()`, but content is given as an iterable of chunks.
+
+    Chunks are compared with the existing file as they come, and a temporary
+    file is only written from the first difference on, so memory use doesn't
+    depend on file size.
+    Return True if the file was written.
+    """
+    try:
+        old: Optional[BinaryIO] = open(path, 'rb')
+    except OSError:
+        old = None
+    tmp = path.with_name(f'.{path.name}.{os.getpid()}.tmp')
+    new: Optional[BinaryIO] = None
+    # Size of the common beginning of old and new content.
+    same = 0
+    try:
+        for chunk in chunks:
+            if new is None:
+                if old is not None and old.read(len(chunk)) == chunk:
+                    same += len(chunk)
+                    continue
+                new = _start_tmp(tmp, old, same)
+            new.write(chunk)
+        if new is None:
+            if old is not None and not old.read(1):
+                return False
+            new = _start_tmp(tmp, old, same)
+        new.close()
+        os.replace(tmp, path)
+        return True
+    except BaseException:
+        if new is not None:
+            new.close()
+            tmp.unlink()
+        raise
+    finally:
+        if old is not None:
+            old.close()
+
+
+def _start_tmp(tmp: Path, old: Optional[BinaryIO], size: int) -> BinaryIO:
+    "Create `tmp` file, starting with the first `size` bytes of `old` file."
+    tmp.parent.mkdir(parents=True, exist_ok=True)
+    new = open(tmp, 'wb')
+    if old is not None:
+        old.seek(0)
+        while size > 0:
+            data = old.read(min(size, 2**16))
+            new.write(data)
+            size -= len(data)
+    return new
+
+
+def publish_file(src_file: Path, dst_file: Path,
+                 manifest: Optional[BuildManifest] = None,
+                 cache: Optional['BuildCache'] = None) -> bool:
+    """Publish `src_file` as `dst_file`, unless it is already up to date.
+
+    If a build `manifest` is given, it is used to know if source changed
+    since last build; else, files contents are compared.
+    If a build `cache` is given, the file is published through it.
+
+    Return True if the file was published.
+    """
+    if manifest is not None and not manifest.file_changed(src_file, dst_file):
+        return False
+    if same_content(src_file, dst_file):
+        # The output may be a hard link to a source modified in place:
+        # it is up to date, but it changed since last build.
+        if manifest is not None and manifest.source_changed(dst_file):
+            manifest.mark_changed(dst_file)
+        return False
+    if cache is None:
+        publish(src_file, dst_file)
+    else:
+        digest = manifest.source_hash(dst_file) if manifest is not None else None
+        cache.publish_asset(src_file, dst_file, digest or file_hash(src_file))
+    if manifest is not None:
+        manifest.mark_changed(dst_file)
+    return True
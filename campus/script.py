@@ -8,16 +8,30 @@ Created on Wed Oct 13 17:14:48 2021
 """
 
 from argparse import ArgumentParser
+from collections import Counter
 from subprocess import run as _run
 from os.path import isdir, isfile
 from shutil import rmtree, copytree
 from pathlib import Path
-import re
 import sys
-from typing import Optional
-
-from .paths import OUTPUT_PATH, STYLE_PATH
-from .generate_website import generate_website, MARKDOWN_LINK
+from typing import List, Optional, Set, Tuple, TYPE_CHECKING
+
+from . import paths
+from .paths import STYLE_PATH, INDEX_TEMPLATE_PATH
+from .param import (CACHE_MAX_SIZE, COMPRESS_OUTPUT, FILE_PREVIEWS, FINGERPRINT_ASSETS,
+                    SEARCH_INDEX, VERIFY_COPIES)
+from .git import BackgroundCommand, revision, source_revision, stage
+from .indexing import index_directory
+from .profiling import BuildProfile, Timings
+
+# Modules needed to build the website (and the markdown renderer) are only
+# imported by the commands using them, so that light commands (`init`, `index`,
+# `indexall`, `--help`) start fast.
+# pylint: disable=import-outside-toplevel
+if TYPE_CHECKING:
+    from concurrent.futures import Executor
+    from .cache import BuildCache
+    from .site import Site
 
 def run(*args, dry_run=False, **kw):
     'subprocess.run() called with `check=True`.'
@@ -38,13 +52,79 @@ def main(args: Optional[list] = None) -> None:
 
     # create the parser for the "make" command
     parser_make = add_parser('make', help='generate website (locally)')
+    parser_make.add_argument('--full', action='store_true',
+                             help='Regenerate the whole website, even unchanged pages.')
+    parser_make.add_argument('-j', '--jobs', type=int, default=1, metavar='N',
+                             help='Number of parallel jobs (0 means one per CPU).')
+    parser_make.add_argument('--profile', action='store_true',
+                             help='Print build timings and statistics.')
+    parser_make.add_argument('--profile-json', metavar='FILE',
+                             help='Write build timings and statistics in FILE (JSON).')
+    parser_make.add_argument('--cprofile', metavar='FILE',
+                             help='Write a cProfile dump of the main process in FILE.')
+    parser_make.add_argument('--explain', action='store_true',
+                             help='Print why each page or file was generated again.')
+    parser_make.add_argument('--fingerprint', action='store_true',
+                             help='Publish stylesheets and pictures under content-hashed names.')
+    parser_make.add_argument('--compress', action='store_true',
+                             help='Write compressed copies (.gz) of HTML, CSS and SVG files.')
+    parser_make.add_argument('--search', action='store_true',
+                             help='Generate a search index and a search page.')
+    parser_make.add_argument('--previews', action='store_true',
+                             help='Display linked files sizes, pages count and previews.')
+    parser_make.add_argument('--progress', action='store_true',
+                             help='Display the progress of files copies.')
+    parser_make.add_argument('--verify', action='store_true',
+                             help='Verify files copies (compare their hash with the source).')
+    parser_make.add_argument('--since', metavar='REV',
+                             help='Only check sources changed since git revision REV '
+                                  '(previous build must have been made from REV).')
     parser_make.set_defaults(func=make)
 
+    # create the parser for the "make-all" command
+    parser_make_all = add_parser('make-all', help='generate several websites in one process')
+    parser_make_all.add_argument('roots', metavar='ROOT', nargs='*',
+                                 help='Campus root directory.')
+    parser_make_all.add_argument('--from', dest='roots_file', metavar='FILE',
+                                 help='Read campus root directories from FILE (one per line).')
+    parser_make_all.add_argument('--full', action='store_true',
+                                 help='Regenerate the whole websites, even unchanged pages.')
+    parser_make_all.add_argument('-j', '--jobs', type=int, default=1, metavar='N',
+                                 help='Number of parallel jobs (0 means one per CPU).')
+    parser_make_all.add_argument('--fingerprint', action='store_true',
+                                 help='Publish stylesheets and pictures under content-hashed '
+                                      'names.')
+    parser_make_all.add_argument('--compress', action='store_true',
+                                 help='Write compressed copies (.gz) of HTML, CSS and SVG files.')
+    parser_make_all.add_argument('--search', action='store_true',
+                                 help='Generate a search index and a search page.')
+    parser_make_all.add_argument('--previews', action='store_true',
+                                 help='Display linked files sizes, pages count and previews.')
+    parser_make_all.set_defaults(func=make_all)
+
     # create the parser for the "push" command
     parser_push = add_parser('push', help='generate and upload website')
     parser_push.add_argument('-m', '--message', type=str, help='push -m help')
+    parser_push.add_argument('-j', '--jobs', type=int, default=1, metavar='N',
+                             help='Number of parallel jobs (0 means one per CPU).')
     parser_push.set_defaults(func=push)
 
+    # create the parser for the "watch" command
+    parser_watch = add_parser('watch', help='serve website locally, and update it live')
+    parser_watch.add_argument('-p', '--port', type=int, default=8000,
+                              help='Port of the local HTTP server.')
+    parser_watch.add_argument('-j', '--jobs', type=int, default=1, metavar='N',
+                              help='Number of parallel jobs (0 means one per CPU).')
+    parser_watch.set_defaults(func=watch)
+
+    # create the parser for the "check" command
+    parser_check = add_parser('check', help='check links, without building website')
+    parser_check.add_argument('--json', action='store_true', dest='as_json',
+                              help='Print the report as JSON.')
+    parser_check.add_argument('-j', '--jobs', type=int, default=1, metavar='N',
+                              help='Number of parallel jobs (0 means one per CPU).')
+    parser_check.set_defaults(func=check)
+
     #create the parser for the "index" command
     parser_index = add_parser('index', help='add file to index.md')
     parser_index.add_argument('glob', metavar='FILENAME', type=str,
@@ -54,6 +134,8 @@ def main(args: Optional[list] = None) -> None:
                               help='index --recursive help')
     parser_index.add_argument('-f', '--create', action='store_true',
                               help='Create index.md file if not found.')
+    parser_index.add_argument('-n', '--dry-run', action='store_true',
+                              help='Only report what would be indexed.')
     parser_index.set_defaults(func=index)
 
     #create the parser for the "indexall" command
@@ -61,6 +143,8 @@ def main(args: Optional[list] = None) -> None:
                                  help='Index every file and directory recursively.')
     parser_indexall.add_argument('-f', '--create', action='store_true',
                                  help='Create index.md file if not found.')
+    parser_indexall.add_argument('-n', '--dry-run', action='store_true',
+                                 help='Only report what would be indexed.')
     parser_indexall.set_defaults(func=indexall)
 
     parsed_args = parser.parse_args(args)
@@ -75,10 +159,11 @@ def main(args: Optional[list] = None) -> None:
 
 def init(force: bool = False) -> None:
     "Implement `campus init` command."
+    output = paths.OUTPUT_PATH
     # Copy styles data (ccs and pictures) in a .config folder.
     if force:
         rmtree('.campus-config', ignore_errors=True)
-        rmtree(OUTPUT_PATH, ignore_errors=True)
+        rmtree(output, ignore_errors=True)
     if isdir('.campus-config'):
         print('Nothing done, since repository seems already configured.\n'
               'Use `campus init --force` if you want to override existing configuration.')
@@ -91,22 +176,24 @@ def init(force: bool = False) -> None:
     gitignore_ok = False
     if isfile('.gitignore'):
         with open('.gitignore') as file:
-            gitignore_ok = any(line.strip() == f'{OUTPUT_PATH.name}/' for line in file)
+            gitignore_ok = any(line.strip() == f'{output.name}/' for line in file)
     if not gitignore_ok:
         with open('.gitignore', 'a') as file:
-            file.write(f'\n{OUTPUT_PATH.name}/\n')
+            file.write(f'\n{output.name}/\n')
+            # Don't track build data (used for incremental builds).
+            file.write(f'{paths.BUILD_PATH.relative_to(Path.cwd()).as_posix()}/\n')
 
     index(create=True)
 
     # Create the output folder, where the website will be generated.
-    if not OUTPUT_PATH.is_dir():
-        OUTPUT_PATH.mkdir()
+    if not output.is_dir():
+        output.mkdir()
     else:
-        print(f"Warning: {OUTPUT_PATH} folder already exist !")
+        print(f"Warning: {output} folder already exist !")
 
     # Initialize the output folder as a git repository (if needed).
-    if not isdir(OUTPUT_PATH / '.git'):
-        run(['git', 'init'], cwd=OUTPUT_PATH)
+    if not isdir(output / '.git'):
+        run(['git', 'init'], cwd=output)
 
 
 def _test_init() -> None:
@@ -118,60 +205,16 @@ def _test_init() -> None:
         sys.exit(1)
 
 
-def _add_to_index(path: Path, index_md: Path) -> None:
-    "Add `path` to index.md file."
-
-    with open(index_md, 'a', encoding='utf8') as file:
-        name = str(path.stem).replace('_', ' ')
-        file.write(f'\n[{name}](<{path}>)\n')
-        print(f"{name} indexed.")
-
-
-def _index(glob: str, parent: Path, recursive: bool = False) -> bool:
+def index(glob: str = '', recursive: bool = False, create: bool = False,
+          dry_run: bool = False) -> None:
     """Implement `campus index` command.
 
     Generate `index.md` file if needed and add all files matching `glob` to it.
 
     Hidden files or directories, ie. those starting with a dot (".mydir", ".myfile"),
      are never indexed, though you may add them manually to a `index.md` file.
-    """
-    # Create an empty index.md file
-    something_indexed = False
-    if recursive:
-        # Index all subdirectories content.
-        for child in sorted(parent.glob('*')):
-            # Skip hidden directories (directories whose name starts with a dot).
-            if child.is_dir() and child.name[0] != '.':
-                something_indexed |= _index(glob, child, recursive=True)
-    index_md = (parent / 'index.md')
-    if not index_md.is_file():
-        with open(index_md, 'w', encoding='utf8') as file:
-            file.write(f"# {parent.name.replace('_', ' ')}\n\n")
-        print(f"'{index_md}' file created.")
-    if not glob:
-        return False
-    already_indexed = set()
-    with open(index_md, encoding='utf8') as file:
-        for line in file:
-            match = re.match(MARKDOWN_LINK, line)
-            if match:
-                already_indexed.add(match.group(1))
-    for child in sorted(parent.glob(glob)):
-        child = Path(child).relative_to(parent)
-        name = child.name
-        if (name != 'index.md' and name[0] != '.' and name not in already_indexed):
-            _add_to_index(child, index_md)
-            something_indexed = True
-    return something_indexed
-
-
-def index(glob: str = '', recursive: bool = False, create: bool = False) -> None:
-    """Implement `campus index` command.
-
-    Generate `index.md` file if needed and add all files matching `glob` to it.
 
-    Hidden files or directories, ie. those starting with a dot (".mydir", ".myfile"),
-     are never indexed, though you may add them manually to a `index.md` file.
+    With `dry_run`, only report what would be indexed.
     """
     if not Path('index.md').is_file() and not create:
         print("WARNING: trying to use `campus index` in a directory "
@@ -180,41 +223,412 @@ def index(glob: str = '', recursive: bool = False, create: bool = False) -> None
         sys.exit(1)
     if not glob and not create:
         print("WARNING: campus index argument missing !")
-    if not _index(glob, parent=Path.cwd(), recursive=recursive):
+    if not index_directory(glob, parent=Path.cwd(), recursive=recursive, dry_run=dry_run):
         print(f"It seems there's nothing new to index.")
 
 
-def indexall(create: bool = False) -> None:
+def indexall(create: bool = False, dry_run: bool = False) -> None:
     "Implement `campus indexall` command."
-    index(glob='*', recursive=True, create=create)
+    index(glob='*', recursive=True, create=create, dry_run=dry_run)
+
 
+def _style() -> str:
+    """Return current style version (see `campus.manifest.style_version()`).
 
-def make() -> None:
-    "Implement `campus make` command."
+    Stylesheets and pictures are published like any other file, so only
+    the template is needed to know if pages must be generated again.
+    """
+    from .manifest import style_version
+    return style_version(INDEX_TEMPLATE_PATH)
+
+
+def _site() -> 'Site':
+    "Return the site of current directory, with the manifest of previous build."
+    from .manifest import BuildManifest
+    from .site import Site
+    src = Path.cwd()
+    output = paths.OUTPUT_PATH
+    return Site(src, output, BuildManifest(paths.MANIFEST_PATH, src=src, dst=output,
+                                           style=_style()))
+
+
+def _build(site: 'Site', full: bool = False, jobs: int = 1,
+           profile: Optional[BuildProfile] = None,
+           fingerprint: bool = FINGERPRINT_ASSETS,
+           compress: bool = COMPRESS_OUTPUT,
+           search: bool = SEARCH_INDEX,
+           previews: bool = FILE_PREVIEWS,
+           cache: Optional['BuildCache'] = None,
+           pool: Optional[Tuple['Executor', 'Executor']] = None,
+           progress: bool = False, verify: bool = VERIFY_COPIES,
+           since: Optional[str] = None) -> BuildProfile:
+    """Generate website, skipping pages and files which didn't change unless `full` is True.
+
+    If `fingerprint` is True, styles are published under content-hashed names
+    (see `campus.assets`).
+    If `compress` is True, compressed copies of text outputs are written
+    (see `campus.compress`).
+    If `search` is True, a search index and a search page are generated
+    (see `campus.search`).
+    If `previews` is True, linked files sizes, pages count and previews are
+    displayed (see `campus.previews`).
+    If `progress` is True, copied bytes are displayed, and if `verify` is True,
+    copies are verified (see `campus.transfer`).
+    If `since` is a git revision, only the sources changed since then are
+    checked (see `_trust_unchanged()`).
+
+    A build `cache` and a `pool` of executors may be shared between several
+    builds (see `make_all()`): then, the cache is not pruned, and the pool
+    is not shut down.
+
+    Return build profile (statistics and timings).
+    """
+    from .assets import publish_styles
+    from .cache import BuildCache
+    from .transfer import Progress, transfers
+    if profile is None:
+        profile = BuildProfile()
+    phase = profile.timings.phase
+    manifest = site.manifest
+    assert manifest is not None
+    # The output directory is never erased: files are only written if their
+    # content changed, and stale files are removed afterwards.
+    if full:
+        manifest.reset()
+    with phase('git changes'):
+        manifest.revision = source_revision(site.src)
+        if since and not full:
+            _trust_unchanged(site, since)
+    assert site.dst is not None
+    site.dst.mkdir(exist_ok=True)
+    with phase('styles'):
+        assets = publish_styles(site.src / '.campus-config', site.dst, manifest, fingerprint)
+    prune = (cache is None)
+    if cache is None:
+        cache_path = paths.root_paths(site.src)['CACHE_PATH']
+        if cache_path is not None:
+            cache = BuildCache(cache_path, CACHE_MAX_SIZE, style=manifest.style)
+    with phase('pages and files'), transfers(Progress() if progress else None, verify):
+        site.build(jobs=jobs, stats=profile.counters, cache=cache,
+                   directories=profile.directories, assets=assets, search=search,
+                   previews=previews, pool=pool)
+    if search:
+        from .search import update_search_index
+        with phase('search index'):
+            profile.counters.update(update_search_index(
+                manifest, manifest.path.parent / 'search.json', assets))
+    if previews:
+        from .previews import update_previews
+        with phase('previews'):
+            profile.counters.update(update_previews(
+                manifest, manifest.path.parent / 'previews', jobs=jobs,
+                executor=None if pool is None else pool[0]))
+    if compress:
+        from .compress import compress_outputs
+        with phase('compression'):
+            profile.counters.update(compress_outputs(
+                manifest, jobs=jobs, executor=None if pool is None else pool[0]))
+    with phase('stale files removal'):
+        for path in manifest.remove_stale():
+            print(f"'{path}' removed.")
+        profile.counters['stale files removed'] += len(manifest.removed)
+    with phase('manifest'):
+        manifest.save()
+    if cache is not None and prune:
+        with phase('cache pruning'):
+            cache.prune()
+    return profile
+
+
+def _trust_unchanged(site: 'Site', since: str) -> None:
+    """Tell the build manifest which sources didn't change since git revision `since`
+    (see `campus.manifest.BuildManifest.trust()`).
+
+    Only the pages and files concerned by the paths git reports as changed
+    (and by untracked or ignored files) are checked.
+    Every source is checked if the previous build wasn't made from a clean
+    checkout of revision `since` (see `campus.git.source_revision()`), if
+    the template changed, or if the styles (`.campus-config`) changed.
+    Generated directories (output, build data and cache) are never sources,
+    even if `.gitignore` doesn't list them.
+    """
+    from .git import changed_paths, tracked_paths
+    manifest = site.manifest
+    assert manifest is not None
+    rev = revision(site.src, since)
+    if rev is None:
+        print(f"WARNING: unknown git revision '{since}', every source will be checked.")
+        return
+    if manifest.old.get('revision') != {'commit': rev, 'clean': True}:
+        print(f"Previous build wasn't made from a clean checkout of '{since}', "
+              "every source will be checked.")
+        return
+    if manifest.old.get('style') != manifest.style:
+        print("Template changed, every source will be checked.")
+        return
+    generated = []
+    root = site.src.resolve()
+    for path in paths.root_paths(site.src).values():
+        if path is not None:
+            try:
+                generated.append(path.relative_to(root).as_posix())
+            except ValueError:
+                # Outside of campus root directory.
+                pass
+    changed = changed_paths(site.src, rev, exclude=generated)
+    if any(path == '.campus-config' or path.startswith('.campus-config/') for path in changed):
+        print("Styles changed, every source will be checked.")
+        return
+    manifest.trust(tracked_paths(site.src, rev) - changed)
+    print(f"{len(changed)} path(s) changed since {rev[:12]}.")
+
+
+def _print_stats(stats: Counter) -> None:
+    "Print build statistics."
+    print(f"{stats['rendered']} page(s) generated, {stats['reused']} unchanged, "
+          f"{stats['cached']} found in cache "
+          f"(filesystem cache: {stats['hits']} hits, {stats['scandir']} directories listed).")
+
+
+def make(full: bool = False, jobs: int = 1, profile: bool = False,
+         profile_json: Optional[str] = None, cprofile: Optional[str] = None,
+         explain: bool = False, fingerprint: bool = False, compress: bool = False,
+         search: bool = False, previews: bool = False, progress: bool = False,
+         verify: bool = False, since: Optional[str] = None) -> None:
+    """Implement `campus make` command.
+
+    Only pages and files which changed since last build are generated again,
+    unless `full` is True.
+    If `since` is the git revision of the previous build, only the sources
+    changed since then are checked.
+
+    Pages are rendered and files copied using `jobs` parallel workers.
+
+    If `profile` is True, print a timings and statistics report.
+    If `profile_json` is set, the same data are written in this file, as JSON.
+    If `cprofile` is set, a `cProfile` dump of the main process is written
+    in this file (see `pstats` module to read it).
+    If `explain` is True, print why each page or file was generated again.
+    If `fingerprint` is True, styles are published under content-hashed names
+    If `compress` is True, compressed copies of HTML, CSS and SVG files are written.
+    If `search` is True, a search index and a search page are generated.
+    If `previews` is True, linked files sizes, pages count and previews are displayed.
+    If `progress` is True, the progress of files copies is displayed.
+    If `verify` is True, files copies are verified.
+    (Those options may also be enabled in `campus/param.py`, except `progress`.)
+    """
+    from .manifest import BuildManifest
+    from .site import Site
     _test_init()
-    (OUTPUT_PATH / '.git').replace('.campus-config/tmp_output_git')
-    rmtree(OUTPUT_PATH)
-    OUTPUT_PATH.mkdir()
-    Path('.campus-config/tmp_output_git').replace(OUTPUT_PATH / '.git')
-    copytree(Path('.campus-config/css'), OUTPUT_PATH / 'css')
-    copytree(Path('.campus-config/pic'), OUTPUT_PATH / 'pic')
-    generate_website(Path.cwd(), src=Path.cwd(), dst=OUTPUT_PATH, siblings={})
+    build_profile = BuildProfile()
+    profiler = None
+    if cprofile:
+        import cProfile
+        profiler = cProfile.Profile()
+        profiler.enable()
+    with build_profile.timings.phase('style version'):
+        style = _style()
+    with build_profile.timings.phase('manifest loading'):
+        output = paths.OUTPUT_PATH
+        manifest = BuildManifest(paths.MANIFEST_PATH, src=Path.cwd(), dst=output, style=style)
+        site = Site(Path.cwd(), output, manifest)
+    _build(site, full=full, jobs=jobs, profile=build_profile,
+           fingerprint=fingerprint or FINGERPRINT_ASSETS, compress=compress or COMPRESS_OUTPUT,
+           search=search or SEARCH_INDEX, previews=previews or FILE_PREVIEWS,
+           progress=progress, verify=verify or VERIFY_COPIES, since=since)
+    if cprofile and profiler is not None:
+        profiler.disable()
+        profiler.dump_stats(cprofile)
+    if explain and manifest.reasons:
+        print(manifest.explain())
+    _print_stats(build_profile.counters)
+    if profile:
+        print(build_profile.report())
+    if profile_json:
+        import json
+        with open(profile_json, 'w', encoding='utf8') as file:
+            json.dump(build_profile.to_json(), file, indent=2)
     print("campus make executed.")
 
 
-def push(message: str = '') -> None:
-    "Implement `campus push` command."
+def _roots(roots: List[str], roots_file: Optional[str] = None) -> List[Path]:
+    """Return campus roots directories, given on the command line or listed in `roots_file`.
+
+    In `roots_file`, there is one directory per line (relative to the file),
+    and empty lines or lines starting with '#' are ignored.
+    """
+    paths = [Path(root) for root in roots]
+    if roots_file:
+        base = Path(roots_file).parent
+        with open(roots_file, encoding='utf8') as file:
+            paths.extend(base / line.strip() for line in file
+                         if line.strip() and not line.lstrip().startswith('#'))
+    return list(dict.fromkeys(path.resolve() for path in paths))
+
+
+def make_all(roots: List[str], roots_file: Optional[str] = None, full: bool = False,
+             jobs: int = 1, fingerprint: bool = False, compress: bool = False,
+             search: bool = False, previews: bool = False) -> None:
+    """Implement `campus make-all` command.
+
+    Build the websites of several campus roots (see `_roots()`) in one process,
+    like `campus make` would do in each of them.
+
+    The renderer, the template, the build cache and the `jobs` workers are
+    shared by all sites, so that batch builds only cost the work really done.
+    A site which can't be built is reported, and the other ones are built
+    anyway (then, exit status is 1).
+    """
+    from .cache import BuildCache
+    from .generate_website import executors
+    from .manifest import BuildManifest
+    from .site import Site
+    directories = _roots(roots, roots_file)
+    if not directories:
+        print("WARNING: no campus root directory given.")
+        sys.exit(1)
+    style = _style()
+    cache = None
+    cache_path = paths.CACHE_PATH
+    if cache_path is not None:
+        cache = BuildCache(cache_path, CACHE_MAX_SIZE, style=style)
+    summary = []
+    failed = 0
+    page_executor, file_executor = executors(jobs)
+    with page_executor, file_executor:
+        for root in directories:
+            print(f"Building '{root}'...")
+            if not (root / '.campus-config').is_dir():
+                summary.append(f"{root}: not an initialized campus root directory.")
+                failed += 1
+                continue
+            root_dirs = paths.root_paths(root)
+            output, manifest_path = root_dirs['OUTPUT_PATH'], root_dirs['MANIFEST_PATH']
+            assert output is not None and manifest_path is not None
+            profile = BuildProfile()
+            try:
+                with profile.timings.phase('manifest loading'):
+                    site = Site(root, output,
+                                BuildManifest(manifest_path, src=root, dst=output, style=style))
+                _build(site, full=full, jobs=jobs, profile=profile,
+                       fingerprint=fingerprint or FINGERPRINT_ASSETS,
+                       compress=compress or COMPRESS_OUTPUT, search=search or SEARCH_INDEX,
+                       previews=previews or FILE_PREVIEWS,
+                       cache=cache, pool=(page_executor, file_executor))
+            except Exception as error:  # pylint: disable=broad-except
+                summary.append(f"{root}: build failed ({error!r}).")
+                failed += 1
+                continue
+            stats = profile.counters
+            summary.append(f"{root}: {stats['rendered']} page(s) generated, "
+                           f"{stats['reused']} unchanged, {stats['cached']} found in cache, "
+                           f"{stats['files published']} file(s) published "
+                           f"({sum(profile.timings.phases.values()):.2f}s).")
+    if cache is not None:
+        cache.prune()
+    print('\n'.join(summary))
+    print(f"campus make-all executed: {len(directories) - failed} site(s) built, {failed} failed.")
+    if failed:
+        sys.exit(1)
+
+
+def watch(port: int = 8000, jobs: int = 1) -> None:
+    """Implement `campus watch` command.
+
+    Serve the website locally, and update it every time a source changes.
+    The site (and its build manifest) is kept in memory between builds, so
+    that only the pages and files concerned by a change are updated (see
+    `campus.site.Site.update()`), unless a build is needed.
+    """
+    from .watch import watch as watch_sources
+    _test_init()
+    site = _site()
+    manifest = site.manifest
+    assert manifest is not None
+    config = Path('.campus-config')
+    failed = False
+
+    def build(changed: Optional[Set[Path]]) -> None:
+        nonlocal failed
+        # After a failure, the site and its manifest are only partially updated.
+        retry, failed = failed, True
+        # Compressed copies of the pages are only written by a build.
+        if (changed is not None and not retry and not COMPRESS_OUTPUT
+                and site.update(changed)):
+            manifest.save()
+        else:
+            if manifest.pages or retry:
+                manifest.restart(_style(), failed=retry)
+            _build(site, jobs=jobs)
+        failed = False
+
+    def sources() -> List[Path]:
+        # The root page is watched even if the first build failed before reaching it.
+        return [*dict.fromkeys([site.src, site.src / 'index.md',
+                                *manifest.sources(previous=failed)]),
+                config / 'css', config / 'pic']
+
+    watch_sources(build, sources, paths.OUTPUT_PATH, port=port)
+
+
+def check(as_json: bool = False, jobs: int = 1) -> None:
+    """Implement `campus check` command.
+
+    Report broken links, unindexed files and orphaned directories,
+    and exit with status 1 if any problem is found.
+    """
+    import json
+    from .check import check as check_links, report as check_report
+    problems = check_links(Path.cwd(), jobs=jobs)
+    if as_json:
+        print(json.dumps(problems, indent=2))
+    else:
+        print(check_report(problems))
+    if any(problems.values()):
+        sys.exit(1)
+
+
+def push(message: str = '', jobs: int = 1) -> None:
+    """Implement `campus push` command.
+
+    Source repository is pushed while the website is generated.
+    Then, only the outputs written or removed since the website was last
+    committed (by this build, or by previous `campus make`) are staged
+    in the output repository, which is committed and pushed.
+
+    The build only checks the sources changed since the source revision
+    of previous build (see `_trust_unchanged()`).
+    """
     _test_init()
-    # Commit changes in root directory (source), then push.
-    commit_cmd = ['git', 'commit', '-a']
+    output = paths.OUTPUT_PATH
+    timings = Timings()
+    commit_cmd = ['git', 'commit']
     if message:
         commit_cmd.extend(['-m', message])
-    run(commit_cmd)
-    run(['git', 'push'])
+    # Commit changes in root directory (source), then push in background.
+    with timings.phase('source commit'):
+        run(commit_cmd + ['-a'])
+    source_push = BackgroundCommand(['git', 'push'])
 
     # Execute `campus make` command.
-    make()
+    with timings.phase('build'):
+        site = _site()
+        manifest = site.manifest
+        assert manifest is not None
+        previous = manifest.old.get('revision')
+        _print_stats(_build(site, jobs=jobs, since=previous and previous['commit']).counters)
 
     # Commit changes in output directory (website).
-    run(commit_cmd, cwd=OUTPUT_PATH)
-    run(['git', 'push'], cwd=OUTPUT_PATH)
+    with timings.phase('website commit'):
+        # After a build without previous build data, every output may be new.
+        changed, removed, everything = manifest.unpublished()
+        if stage(output, changed, removed, everything=everything):
+            run(commit_cmd, cwd=output)
+        manifest.mark_published()
+        manifest.save()
+    # Don't publish website if source push failed.
+    with timings.phase('source push (waiting)'):
+        timings.add('source push (in background)', source_push.wait())
+    with timings.phase('website push'):
+        run(['git', 'push'], cwd=output)
+    print(timings.report())
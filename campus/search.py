@@ -0,0 +1,192 @@
+# -*- coding: utf-8 -*-
+"""
+Site-wide search index, used by the static search page (`search.html`).
+
+Indexed documents are the pages (found by their title) and the files linked
+from them (found by their link title). Since all those titles are stored in
+the build manifest, the index is built without reading any page.
+
+The index is an inverted index, split in small JSON shards, so that a search
+only downloads the shards of the searched words:
+    - `search/{hex}.json` maps the terms starting with the same two characters
+      to the (sorted) ids of the documents containing them
+      (`{hex}` is the hexadecimal UTF-8 encoding of those characters),
+    - `search/docs/{n}.json` maps documents ids to their `[url, title]`
+      (`DOCS_PER_SHARD` documents per shard).
+
+Documents ids are kept from one build to another (in `BUILD_PATH/search.json`),
+so that only the shards concerned by a changed document are written again.
+"""
+
+from collections import Counter
+import json
+import os
+import posixpath
+import re
+from pathlib import Path
+from typing import Dict, List, Optional, Set, Tuple
+import unicodedata
+
+from .generate_website import SEARCH_PAGE, stylesheets
+from .manifest import BuildManifest
+from .paths import INDEX_TEMPLATE_PATH
+from .publish import write_if_changed
+from .template import load_template
+
+SEARCH_DIR = 'search'
+DOCS_PER_SHARD = 256
+
+_WORD = re.compile(r'[^\W_]+')
+
+SEARCH_SCRIPT = '''
+<form class="search-page"><input type="search" name="q" autofocus></form>
+<ol id="search-results"></ol>
+<script>
+const DOCS_PER_SHARD = %(docs_per_shard)d;
+const normalize = s => s.normalize('NFKD').replace(/\\p{M}/gu, '').toLowerCase();
+const words = s => (normalize(s).match(/[\\p{L}\\p{N}]+/gu) || []).filter(w => w.length > 1);
+const hex = s => Array.from(new TextEncoder().encode(Array.from(s).slice(0, 2).join('')),
+                            b => b.toString(16).padStart(2, '0')).join('');
+const load = url => fetch(url).then(r => r.ok ? r.json() : {}).catch(() => ({}));
+const escape = s => s.replace(/[&<>"]/g, c => '&#' + c.charCodeAt(0) + ';');
+
+async function search(query) {
+    let ids = null;
+    for (const word of words(query)) {
+        const shard = await load(`%(dir)s/${hex(word)}.json`);
+        const found = new Set();
+        for (const [term, postings] of Object.entries(shard))
+            if (term.startsWith(word)) postings.forEach(id => found.add(id));
+        ids = (ids === null) ? found : new Set([...ids].filter(id => found.has(id)));
+    }
+    ids = [...(ids || [])].sort((a, b) => a - b).slice(0, 200);
+    const shards = {};
+    for (const id of ids) {
+        const n = Math.floor(id / DOCS_PER_SHARD);
+        shards[n] = shards[n] || load(`%(dir)s/docs/${n}.json`);
+    }
+    return Promise.all(ids.map(async id => (await shards[Math.floor(id / DOCS_PER_SHARD)])[id]));
+}
+
+const query = new URLSearchParams(location.search).get('q') || '';
+document.querySelector('.search-page input').value = query;
+search(query).then(results => {
+    document.getElementById('search-results').innerHTML = results.filter(Boolean).map(
+        ([url, title]) => `<li><a href="${escape(url || './')}">${escape(title)}</a> `
+                          + `<small>${escape(url)}</small></li>`).join('');
+});
+</script>
+'''
+
+
+def terms(text: str) -> Set[str]:
+    "Return the normalized words of `text` (lower case, without accents)."
+    text = ''.join(char for char in unicodedata.normalize('NFKD', text)
+                   if not unicodedata.combining(char))
+    return {word for word in _WORD.findall(text.lower()) if len(word) > 1}
+
+
+def shard_name(term: str) -> str:
+    "Return the name of the shard containing `term`."
+    return term[:2].encode('utf8').hex()
+
+
+def documents(manifest: BuildManifest) -> Dict[str, str]:
+    "Return the documents of current build, as a {url: title} dict."
+    docs: Dict[str, str] = {}
+    for rel, page in sorted(manifest.pages.items()):
+        if rel != '.':
+            docs[f'{rel}/'] = page['title']
+        else:
+            docs[''] = page['title']
+    for rel, page in sorted(manifest.pages.items()):
+        for link, title in page['links']['files'].items():
+            url = posixpath.normpath(posixpath.join(rel, link))
+            if not url.startswith('..'):
+                docs.setdefault(url, title)
+    return {url: title for url, title in docs.items() if terms(title)}
+
+
+def _load_state(path: Path) -> Dict[str, list]:
+    try:
+        with open(path, encoding='utf8') as file:
+            return json.load(file)
+    except (OSError, ValueError):
+        return {}
+
+
+def update_search_index(manifest: BuildManifest, state_path: Path,
+                        assets: Optional[Dict[str, str]] = None) -> Counter:
+    """Update the search index and the search page in output directory.
+
+    `state_path` stores the documents ids between builds.
+    Only the shards concerned by changed documents (or missing ones) are written.
+    Return statistics (written shards and documents count).
+    """
+    dst = manifest.dst
+    old = {} if manifest.full else _load_state(state_path)
+    new_docs = documents(manifest)
+    # Keep ids of existing documents.
+    ids = {url: old[url][0] for url in new_docs if url in old}
+    next_id = max((id_ for id_, _ in old.values()), default=-1) + 1
+    for url in new_docs:
+        if url not in ids:
+            ids[url] = next_id
+            next_id += 1
+    changed_terms: Set[str] = set()
+    changed_ids: Set[int] = set()
+    for url in set(old) | set(new_docs):
+        old_id, old_title = old.get(url, (None, ''))
+        if url not in new_docs or new_docs[url] != old_title:
+            changed_terms |= terms(old_title) | terms(new_docs.get(url, ''))
+            changed_ids.update(id_ for id_ in (old_id, ids.get(url)) if id_ is not None)
+
+    index: Dict[str, Dict[str, List[int]]] = {}
+    for url, title in new_docs.items():
+        for term in terms(title):
+            index.setdefault(shard_name(term), {}).setdefault(term, []).append(ids[url])
+    docs: Dict[int, Dict[int, Tuple[str, str]]] = {}
+    for url, title in new_docs.items():
+        docs.setdefault(ids[url] // DOCS_PER_SHARD, {})[ids[url]] = (url, title)
+
+    stats: Counter = Counter({'search documents': len(new_docs)})
+    changed_shards = {shard_name(term) for term in changed_terms}
+    for name, postings in index.items():
+        data = {term: sorted(ids_) for term, ids_ in sorted(postings.items())}
+        stats['search shards written'] += _write_shard(
+            manifest, dst / SEARCH_DIR / f'{name}.json', data, name in changed_shards)
+    changed_docs = {id_ // DOCS_PER_SHARD for id_ in changed_ids}
+    for number, shard in docs.items():
+        stats['search shards written'] += _write_shard(
+            manifest, dst / SEARCH_DIR / 'docs' / f'{number}.json', shard,
+            number in changed_docs)
+    manifest.add_generated(dst / SEARCH_PAGE, write_search_page(dst, assets))
+
+    state_path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = state_path.with_suffix('.tmp')
+    with open(tmp, 'w', encoding='utf8') as file:
+        json.dump({url: [ids[url], title] for url, title in new_docs.items()}, file)
+    os.replace(tmp, state_path)
+    return stats
+
+
+def _write_shard(manifest: BuildManifest, path: Path, data: dict, changed: bool) -> bool:
+    "Write a shard of the index if it `changed` (or is missing), and return True if written."
+    if not changed and path.is_file():
+        manifest.add_output(path)
+        return False
+    written = write_if_changed(path, json.dumps(data, separators=(',', ':'),
+                                                ensure_ascii=False).encode('utf8'))
+    manifest.add_generated(path, written)
+    return written
+
+
+def write_search_page(dst: Path, assets: Optional[Dict[str, str]] = None) -> bool:
+    "Write the search page in output directory `dst`, and return True if it was written."
+    common_stylesheet, stylesheet = stylesheets(0, dst, assets)
+    main = SEARCH_SCRIPT % {'dir': SEARCH_DIR, 'docs_per_shard': DOCS_PER_SHARD}
+    html = load_template(INDEX_TEMPLATE_PATH).render({
+        'title': 'Search', 'nav': '<ol>\n<li><a href=".">..</a></li>\n</ol>',
+        'search': '', 'previews': '',
+        'common_stylesheet': common_stylesheet, 'stylesheet': stylesheet, 'main': main})
+    return write_if_changed(dst / SEARCH_PAGE, html.encode('utf8'))
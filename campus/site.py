@@ -0,0 +1,291 @@
+# -*- coding: utf-8 -*-
+"""
+In-memory site model.
+
+A `Site` is the tree of the pages reachable from the root `index.md` file.
+It may be loaded without generating anything (`Site.load()`), or filled by
+a build (`Site.build()`), then queried, and partially updated
+(`Site.render_page()`, `Site.update()`), so that a long-running process
+(like `campus watch`) or a tool embedding campus only parses pages once:
+
+    >>> site = Site(src, dst, manifest)
+    >>> site.build(jobs=4)
+    >>> page = site.page('chapter_1')
+    >>> [link.href for link in page.files]
+"""
+
+from collections import Counter
+from concurrent.futures import Executor
+import os
+from pathlib import Path
+from typing import Dict, Iterable, Iterator, List, Optional, Set, Tuple
+
+from .cache import BuildCache
+from .fscache import directory_cache, normalize, reset_directory_cache
+from .generate_website import (executors, generate_website, parse_page, translate_path,
+                               _generate_page, _page_context)
+from .manifest import BuildManifest
+from .publish import publish_file
+
+# Links kinds (see `campus.fscache.DirectoryCache.kind()`).
+DIRECTORY, FILE, BROKEN = 'd', 'f', ''
+_GROUPS = ((DIRECTORY, 'directories'), (FILE, 'files'), (BROKEN, 'broken'))
+
+
+class Link:
+    "A link of a page: its `href`, its `title` and the `kind` of its target."
+
+    __slots__ = ('href', 'title', 'kind')
+
+    def __init__(self, href: str, title: str, kind: str):
+        self.href = href
+        self.title = title
+        self.kind = kind
+
+    def __repr__(self) -> str:
+        return f'Link({self.href!r}, {self.title!r}, {self.kind!r})'
+
+    def __eq__(self, other) -> bool:
+        return (isinstance(other, Link)
+                and (self.href, self.title, self.kind) == (other.href, other.title, other.kind))
+
+
+class Page:
+    """The page of a directory.
+
+    `parent` is the directory of the page linking to this one first
+    (which gives its default title and navigation menu), or None for the root page.
+    """
+
+    __slots__ = ('directory', 'title', 'links', 'parent')
+
+    def __init__(self, directory: Path, title: str, links: List[Link],
+                 parent: Optional[Path] = None):
+        self.directory = directory
+        self.title = title
+        self.links = links
+        self.parent = parent
+
+    @classmethod
+    def from_links(cls, directory: Path, title: str, links: Dict[str, Dict[str, str]],
+                   parent: Optional[Path] = None) -> 'Page':
+        "Create a page from a links dict (see `campus.generate_website.extract_links()`)."
+        return cls(directory, title, [Link(href, link_title, kind) for kind, group in _GROUPS
+                                      for href, link_title in links[group].items()], parent)
+
+    def links_dict(self) -> Dict[str, Dict[str, str]]:
+        "Return links as a dict (see `campus.generate_website.extract_links()`)."
+        groups = dict(_GROUPS)
+        links: Dict[str, Dict[str, str]] = {group: {} for group in groups.values()}
+        for link in self.links:
+            links[groups[link.kind]][link.href] = link.title
+        return links
+
+    def _kind(self, kind: str) -> List[Link]:
+        return [link for link in self.links if link.kind == kind]
+
+    @property
+    def directories(self) -> List[Link]:
+        "Links to directories (i.e. subpages)."
+        return self._kind(DIRECTORY)
+
+    @property
+    def files(self) -> List[Link]:
+        "Links to files."
+        return self._kind(FILE)
+
+    @property
+    def broken(self) -> List[Link]:
+        "Broken links."
+        return self._kind(BROKEN)
+
+    def target(self, link: Link) -> Path:
+        "Return the path of the target of `link`."
+        return normalize(self.directory / link.href)
+
+    def __repr__(self) -> str:
+        return f'Page({str(self.directory)!r}, {self.title!r}, {len(self.links)} links)'
+
+
+class Site:
+    """The pages of the course in `src` directory, generated in `dst` directory.
+
+    A build `manifest` is needed to build the site (see `build()`).
+    Pages are stored in `pages` dict (`{directory: Page}`), in the order
+    they are found from the root page.
+    """
+
+    def __init__(self, src: Path, dst: Optional[Path] = None,
+                 manifest: Optional[BuildManifest] = None):
+        self.src = src
+        self.dst = dst
+        self.manifest = manifest
+        self.pages: Dict[Path, Page] = {}
+        # Options of the last build, reused by `render_page()`.
+        self.assets: Optional[Dict[str, str]] = None
+        self.search = False
+        self.previews = False
+
+    def __iter__(self) -> Iterator[Page]:
+        return iter(self.pages.values())
+
+    def __len__(self) -> int:
+        return len(self.pages)
+
+    def __contains__(self, path: Path) -> bool:
+        return normalize(self.src / path) in self.pages
+
+    def page(self, path) -> Page:
+        "Return the page of directory `path` (absolute, or relative to `src`)."
+        return self.pages[normalize(self.src / path)]
+
+    def files(self) -> Iterator[Path]:
+        "Yield every linked file (once)."
+        seen = set()
+        for page in self:
+            for link in page.files:
+                path = page.target(link)
+                if path not in seen:
+                    seen.add(path)
+                    yield path
+
+    def load(self, jobs: int = 1) -> 'Site':
+        """Parse all the pages reachable from the root page, without generating anything.
+
+        Pages of the same level are parsed using `jobs` processes.
+        Return the site itself.
+        """
+        reset_directory_cache()
+        self.pages = {}
+        # Each level is a list of (directory, default title, parent directory).
+        level: List[Tuple[Path, str, Optional[Path]]] = [(self.src, '', None)]
+        seen = {self.src}
+        page_executor, file_executor = executors(jobs)
+        with page_executor, file_executor:
+            while level:
+                futures = [page_executor.submit(parse_page, directory, title)
+                           for directory, title, _ in level]
+                parsed = [(directory, parent, *future.result())
+                          for (directory, _, parent), future in zip(level, futures)]
+                level = []
+                for directory, parent, title, links in parsed:
+                    page = Page.from_links(directory, title, links, parent)
+                    self.pages[directory] = page
+                    for link in page.directories:
+                        path = page.target(link)
+                        if path not in seen:
+                            seen.add(path)
+                            level.append((path, link.title, directory))
+        return self
+
+    def build(self, jobs: int = 1, stats: Optional[Counter] = None,
+              cache: Optional[BuildCache] = None,
+              directories: Optional[Dict[str, Counter]] = None,
+              assets: Optional[Dict[str, str]] = None, search: bool = False,
+              previews: bool = False, pool: Optional[Tuple[Executor, Executor]] = None) -> 'Site':
+        """Generate the pages and publish the files which changed since last build,
+        then update the pages from the build manifest.
+
+        See `campus.generate_website.generate_website()` for the arguments.
+        Return the site itself.
+        """
+        assert self.dst is not None and self.manifest is not None
+        self.assets = assets
+        self.search = search
+        self.previews = previews
+        generate_website(self.src, src=self.src, dst=self.dst, siblings={},
+                         manifest=self.manifest, jobs=jobs, stats=stats, cache=cache,
+                         directories=directories, assets=assets, search=search,
+                         previews=previews, pool=pool)
+        self.pages = {}
+        for rel, data in self.manifest.pages.items():
+            directory = normalize(self.src / rel)
+            parent = None if data['parent'] is None else normalize(self.src / data['parent'])
+            self.pages[directory] = Page.from_links(directory, data['title'], data['links'],
+                                                    parent)
+        return self
+
+    def render_page(self, path) -> bool:
+        """Generate again the page of directory `path` only (after its `index.md` changed).
+
+        Its title and links are updated (and registered in the build manifest).
+        Subpages are not updated: a new subpage or a new title in the
+        navigation menu requires a build.
+        Return True if the page output was written.
+        """
+        assert self.dst is not None
+        page = self.page(path)
+        siblings: Dict[str, str] = {}
+        title = ''
+        if page.parent is not None:
+            parent = self.pages[page.parent]
+            siblings = {link.href: link.title for link in parent.directories}
+            title = next((link.title for link in parent.directories
+                          if parent.target(link) == page.directory), '')
+        reset_directory_cache()
+        output_file, context, data = _page_context(page.directory, self.src, self.dst, siblings,
+                                                   title, self.assets, self.search,
+                                                   self.previews)
+        page_title, links, written = _generate_page(page.directory, output_file, title, data)
+        self.pages[page.directory] = Page.from_links(page.directory, page_title, links,
+                                                     page.parent)
+        if self.manifest is not None:
+            self.manifest.add_page(page.directory, context, output_file, page_title, links,
+                                   page.parent)
+            if written:
+                self.manifest.mark_changed(output_file)
+        return written
+
+    def update(self, changed: Iterable[Path]) -> bool:
+        """Update the website after some sources changed, without a build.
+
+        `changed` are sources given by `BuildManifest.sources()`: the pages whose
+        `index.md` changed, or which link to a file or directory created or
+        removed in a changed directory, are generated again, and the linked
+        files which changed are published again.
+
+        Return False if a build is needed instead: unknown or removed source,
+        or new subpages or titles (which change other pages navigation menus),
+        or new linked files when the search index or previews are generated.
+        """
+        assert self.dst is not None and self.manifest is not None
+        # {source: output}, relative to `src` and `dst`.
+        files = {data['source']: rel for rel, data in self.manifest.files.items()
+                 if data is not None}
+        pages: Set[Path] = set()
+        published: Dict[Path, Path] = {}
+        directories: Set[str] = set()
+        for path in changed:
+            rel = os.path.relpath(path, self.src).replace(os.sep, '/')
+            if path.name == 'index.md' and path.parent in self.pages and path.is_file():
+                pages.add(path.parent)
+            elif rel in files and path.is_file():
+                published[path] = self.dst / files[rel]
+            elif path in self.pages and path.is_dir():
+                directories.add(str(path))
+            else:
+                return False
+        if directories:
+            # A link target may have been created or removed.
+            reset_directory_cache()
+            cache = directory_cache()
+            for page in self:
+                for link in page.links:
+                    target = os.path.normpath(os.path.join(page.directory, link.href))
+                    if (os.path.dirname(target) in directories
+                            and cache.kind(Path(target)) != link.kind):
+                        pages.add(page.directory)
+                        break
+        for directory in pages:
+            old = self.pages[directory]
+            self.render_page(directory)
+            page = self.pages[directory]
+            if (page.title != old.title or page.directories != old.directories
+                    or (self.search or self.previews) and page.files != old.files):
+                return False
+            for link in page.files:
+                path = page.target(link)
+                published[path] = translate_path(path, self.src, self.dst)
+        for path, output in published.items():
+            publish_file(path, output, self.manifest)
+        return True
@@ -0,0 +1,122 @@
+# -*- coding: utf-8 -*-
+"""
+Compiled templates and Markdown renderer, shared by the whole build.
+
+A template is split once around its `[$KEY]` placeholders, so that each page
+is assembled in a single pass.
+
+Large Markdown files are rendered by chunks (see `markdown_chunks()`),
+so that a page never has to be held entirely in memory.
+"""
+
+from collections.abc import Iterator as _Iterator
+from functools import lru_cache
+import re
+from typing import Callable, Dict, Iterator, List, TextIO
+
+from mistune import create_markdown  # type: ignore
+
+from .paths import Path
+
+PLACEHOLDER = re.compile(r'\[\$([A-Z_]+)\]')
+
+# Markdown is rendered by chunks of about this size (in characters).
+CHUNK_SIZE = 2**16
+
+_FENCE = re.compile(r'\s*(`{3,}|~{3,})')
+# Raw HTML blocks may contain blank lines.
+_HTML_BLOCK = re.compile(r' {0,3}<')
+# Link reference definitions apply to the whole document.
+_REFERENCE = re.compile(r' {0,3}\[[^]]+\]:')
+# After a blank line, a line starting with a letter, a link or a title
+# can't belong to the previous block.
+_NEW_BLOCK = re.compile(r'[^\W\d_]|[\[!#]')
+
+
+class Template:
+    "A template, where `[$KEY]` placeholders are replaced by `data['key']` values."
+
+    def __init__(self, text: str):
+        # Literal strings are at even positions, keys at odd positions.
+        self.parts: List[str] = PLACEHOLDER.split(text)
+        self.keys = {key.lower() for key in self.parts[1::2]}
+
+    def render(self, data: Dict[str, object]) -> str:
+        """Return the template, where placeholders are replaced by data values.
+
+        Placeholders without corresponding data are left unchanged.
+        """
+        return ''.join(self.stream(data))
+
+    def stream(self, data: Dict[str, object]) -> Iterator[str]:
+        """Yield the rendered template, piece by piece.
+
+        A data value may be an iterator of strings (for a placeholder used only once),
+        which is then consumed lazily.
+        """
+        for i, part in enumerate(self.parts):
+            if i % 2 == 0:
+                yield part
+                continue
+            key = part.lower()
+            if key not in data:
+                yield f'[${part}]'
+            elif isinstance(data[key], _Iterator):
+                yield from data[key]  # type: ignore
+            else:
+                yield str(data[key])
+
+
+def load_template(path: Path) -> Template:
+    "Return the compiled template, reading it only if it changed."
+    return _load_template(path, path.stat().st_mtime_ns)
+
+
+@lru_cache(maxsize=8)
+def _load_template(path: Path, mtime: int) -> Template:  # pylint: disable=unused-argument
+    with open(path, encoding='utf8') as file:
+        return Template(file.read())
+
+
+@lru_cache(maxsize=None)
+def markdown_renderer() -> Callable[[str], str]:
+    "Return the Markdown renderer (created only once per process)."
+    return create_markdown(escape=False)
+
+
+def markdown_chunks(file: TextIO, size: int = CHUNK_SIZE) -> Iterator[str]:
+    """Split Markdown `file` into chunks of about `size` characters, which
+    may be rendered separately with the same result.
+
+    Chunks only start at a paragraph or a title following a blank line,
+    outside of fenced code blocks and before any raw HTML block.
+    A file containing link reference definitions is never split.
+    """
+    if any(_REFERENCE.match(line) for line in file):
+        file.seek(0)
+        yield file.read()
+        return
+    file.seek(0)
+    chunk: List[str] = []
+    length = 0
+    fence = None
+    splittable = True
+    blank = False
+    for line in file:
+        if fence is not None:
+            if fence.match(line):
+                fence = None
+        elif _FENCE.match(line):
+            marker = _FENCE.match(line).group(1)  # type: ignore
+            fence = re.compile(rf'\s*{marker[0]}{{{len(marker)},}}\s*$')
+        elif _HTML_BLOCK.match(line):
+            splittable = False
+        elif splittable and blank and length >= size and _NEW_BLOCK.match(line):
+            yield ''.join(chunk)
+            chunk = []
+            length = 0
+        chunk.append(line)
+        length += len(line)
+        blank = not line.strip(' \t\n')
+    if chunk:
+        yield ''.join(chunk)
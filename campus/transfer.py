@@ -0,0 +1,238 @@
+# -*- coding: utf-8 -*-
+"""
+Files copies (used by 'copy' publishing strategy, see `campus.publish`).
+
+- Data is copied by the kernel when possible (`os.copy_file_range()`, then
+  `os.sendfile()`), else read and written by chunks: memory use doesn't
+  depend on file size.
+- The copy is written in a temporary file, renamed when complete, so that
+  an interrupted build never leaves a truncated file.
+- Copies of large files (see `RESUME_MIN_SIZE` in `campus/param.py`) are
+  resumed by the next build: their temporary file (`.name.{signature}.part`)
+  is named after the size and modification time of the source, so it is
+  only reused if the source didn't change.
+- Copies may be verified (see `VERIFY_COPIES` in `campus/param.py`):
+  the copy hash is then compared with the source hash.
+- Copied bytes may be displayed (see `Progress` and `transfers()`).
+"""
+
+from contextlib import contextmanager
+import errno
+import os
+from pathlib import Path
+from shutil import copymode
+import sys
+from threading import Lock
+import time
+from typing import Callable, Dict, Iterator, Optional, Set, TextIO
+
+from .manifest import file_hash
+from .param import RESUME_MIN_SIZE, VERIFY_COPIES
+
+# Maximal size (in bytes) copied by one system call.
+CHUNK_SIZE = 2**23
+
+PART_SUFFIX = '.part'
+
+# Errors meaning that a copy method isn't supported for these files.
+_UNSUPPORTED_ERRORS = {errno.EXDEV, errno.ENOSYS, errno.EINVAL, errno.EBADF,
+                       getattr(errno, 'ENOTSUP', errno.EINVAL),
+                       getattr(errno, 'EOPNOTSUPP', errno.EINVAL)}
+
+
+def _copy_file_range(src: int, dst: int, offset: int, count: int) -> int:
+    return os.copy_file_range(src, dst, count, offset)  # type: ignore
+
+
+def _sendfile(src: int, dst: int, offset: int, count: int) -> int:
+    return os.sendfile(dst, src, offset, count)
+
+
+def _read_write(src: int, dst: int, offset: int, count: int) -> int:
+    os.lseek(src, offset, os.SEEK_SET)
+    return os.write(dst, os.read(src, count))
+
+
+# Copy methods, from the cheapest one: `method(src, dst, offset, count)` copies
+# at most `count` bytes of `src` from `offset`, at the position of `dst`,
+# and returns the number of copied bytes.
+METHODS: Dict[str, Callable[[int, int, int, int], int]] = {
+    name: method for name, method in (('copy_file_range', _copy_file_range),
+                                      ('sendfile', _sendfile), ('read', _read_write))
+    if name == 'read' or hasattr(os, name)}
+
+# Copy methods which failed for a given (source device, destination device) pair.
+_unsupported: Set[tuple] = set()
+
+
+class Progress:
+    """Byte-level progress of the copies, displayed on `stream`.
+
+    It may be updated from several threads. The display is refreshed
+    at most every `interval` seconds.
+    """
+
+    def __init__(self, stream: TextIO = sys.stderr, interval: float = 0.2):
+        self.stream = stream
+        self.interval = interval
+        self.files = 0
+        self.total = 0
+        self.done = 0
+        self._lock = Lock()
+        self._displayed = 0.
+
+    def start(self, size: int) -> None:
+        "Register a copy of `size` bytes."
+        with self._lock:
+            self.files += 1
+            self.total += size
+
+    def update(self, size: int) -> None:
+        "Register `size` copied bytes."
+        with self._lock:
+            self.done += size
+            if time.monotonic() - self._displayed >= self.interval:
+                self._display()
+
+    def _display(self) -> None:
+        percent = 100 * self.done / self.total if self.total else 100
+        self.stream.write(f'\rCopying files: {_size(self.done)} / {_size(self.total)} '
+                          f'({percent:.0f}%, {self.files} file(s))')
+        self.stream.flush()
+        self._displayed = time.monotonic()
+
+    def close(self) -> None:
+        "Display final state (if anything was copied)."
+        with self._lock:
+            if self.files:
+                self._display()
+                self.stream.write('\n')
+
+
+def _size(size: float) -> str:
+    "Return a human readable size."
+    for unit in ('B', 'KiB', 'MiB', 'GiB'):
+        if size < 1024 or unit == 'GiB':
+            break
+        size /= 1024
+    return f'{size:.1f} {unit}'
+
+
+# Settings of current copies (see `transfers()`).
+_progress: Optional[Progress] = None
+_verify = VERIFY_COPIES
+
+
+@contextmanager
+def transfers(progress: Optional[Progress] = None, verify: bool = VERIFY_COPIES
+              ) -> Iterator[None]:
+    """Context manager setting how files are copied inside it.
+
+    Copied bytes are reported to `progress` (if given), and copies
+    are verified if `verify` is True.
+    """
+    global _progress, _verify  # pylint: disable=global-statement
+    previous = _progress, _verify
+    _progress, _verify = progress, verify
+    try:
+        yield
+    finally:
+        if progress is not None:
+            progress.close()
+        _progress, _verify = previous
+
+
+def part_path(src_file: Path, dst_file: Path) -> Path:
+    "Return the path of the (resumable) temporary copy of `src_file` as `dst_file`."
+    stat = src_file.stat()
+    return dst_file.with_name(f'.{dst_file.name}.{stat.st_size:x}-{stat.st_mtime_ns:x}'
+                              f'{PART_SUFFIX}')
+
+
+def _remove_stale_parts(dst_file: Path, part: Path) -> None:
+    "Remove temporary copies of previous versions of `dst_file`."
+    prefix = f'.{dst_file.name}.'
+    try:
+        names = os.listdir(dst_file.parent)
+    except OSError:
+        return
+    for name in names:
+        if name.startswith(prefix) and name.endswith(PART_SUFFIX) and name != part.name:
+            try:
+                (dst_file.parent / name).unlink()
+            except OSError:
+                pass
+
+
+def copy_file(src_file: Path, dst_file: Path) -> Path:
+    """Copy `src_file` as `dst_file` (and its permission bits).
+
+    `dst_file` is replaced atomically. The copy of a large file is resumed
+    if a previous one was interrupted.
+    Return `dst_file`.
+    """
+    size = src_file.stat().st_size
+    resume = size >= RESUME_MIN_SIZE
+    if resume:
+        tmp = part_path(src_file, dst_file)
+        _remove_stale_parts(dst_file, tmp)
+    else:
+        tmp = dst_file.with_name(f'.{dst_file.name}.{os.getpid()}.tmp')
+    try:
+        _copy(src_file, tmp, size, resume)
+        if _verify and file_hash(tmp) != file_hash(src_file):
+            tmp.unlink()
+            raise OSError(errno.EIO, f'Copy of "{src_file}" is corrupted', str(dst_file))
+        copymode(src_file, tmp)
+        os.replace(tmp, dst_file)
+    except BaseException:
+        # A large copy is kept to be resumed later, unless it is corrupted.
+        if not resume and tmp.exists():
+            tmp.unlink()
+        raise
+    return dst_file
+
+
+def _copy(src_file: Path, tmp: Path, size: int, resume: bool = False) -> None:
+    """Copy `src_file` (of `size` bytes) in `tmp`.
+
+    If `resume` is True, the copy goes on from the end of `tmp` if it already
+    exists, else `tmp` is truncated (it may be a leftover of a killed build
+    whose pid was reused).
+    """
+    src = os.open(src_file, os.O_RDONLY | getattr(os, 'O_BINARY', 0))
+    try:
+        flags = os.O_WRONLY | os.O_CREAT | getattr(os, 'O_BINARY', 0)
+        if not resume:
+            flags |= os.O_TRUNC
+        dst = os.open(tmp, flags, 0o644)
+        try:
+            offset = os.lseek(dst, 0, os.SEEK_END)
+            if offset > size:
+                os.ftruncate(dst, 0)
+                offset = os.lseek(dst, 0, os.SEEK_SET)
+            progress = _progress
+            if progress is not None:
+                progress.start(size - offset)
+            devices = (os.fstat(src).st_dev, os.fstat(dst).st_dev)
+            methods = [(name, method) for name, method in METHODS.items()
+                       if (name, *devices) not in _unsupported]
+            while offset < size:
+                name, method = methods[0]
+                try:
+                    copied = method(src, dst, offset, min(CHUNK_SIZE, size - offset))
+                except OSError as error:
+                    if name == 'read' or error.errno not in _UNSUPPORTED_ERRORS:
+                        raise
+                    _unsupported.add((name, *devices))
+                    methods.pop(0)
+                    continue
+                if not copied:
+                    raise OSError(errno.EIO, f'"{src_file}" changed while copied')
+                offset += copied
+                if progress is not None:
+                    progress.update(copied)
+        finally:
+            os.close(dst)
+    finally:
+        os.close(src)
@@ -0,0 +1,145 @@
+# -*- coding: utf-8 -*-
+"""
+Live preview of the website.
+
+The output directory is served by a local HTTP server, and sources are polled
+for changes. After each update, the pages opened in a browser are reloaded
+using server-sent events (a small script is injected in served HTML pages,
+generated files are never modified).
+"""
+
+from functools import partial
+from http.server import SimpleHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from threading import Condition, Thread
+import time
+from typing import Callable, Dict, Iterable, Optional, Set, Tuple
+
+RELOAD_URL = '/__campus_reload__'
+RELOAD_SCRIPT = (f'<script>new EventSource("{RELOAD_URL}").onmessage = '
+                 'function () {location.reload();};</script>').encode('utf8')
+
+
+class BuildCounter:
+    "Count builds, and let threads wait for the next one."
+
+    def __init__(self):
+        self.count = 0
+        self._condition = Condition()
+
+    def increment(self) -> None:
+        "Signal a new build to waiting threads."
+        with self._condition:
+            self.count += 1
+            self._condition.notify_all()
+
+    def wait(self, count: int, timeout: float) -> int:
+        "Wait until builds count differs from `count`, and return it."
+        with self._condition:
+            self._condition.wait_for(lambda: self.count != count, timeout)
+            return self.count
+
+
+class LiveReloadHandler(SimpleHTTPRequestHandler):
+    "Serve static files, injecting a live-reload script in HTML pages."
+
+    def do_GET(self):
+        if self.path == RELOAD_URL:
+            self._send_events()
+            return
+        path = Path(self.translate_path(self.path))
+        if path.is_dir() and self.path.split('?')[0].endswith('/'):
+            path /= 'index.html'
+        if path.suffix == '.html' and path.is_file():
+            self._send_html(path)
+        else:
+            super().do_GET()
+
+    def _send_html(self, path: Path) -> None:
+        content = path.read_bytes().replace(b'</body>', RELOAD_SCRIPT + b'</body>', 1)
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/html; charset=utf-8')
+        self.send_header('Content-Length', str(len(content)))
+        self.send_header('Cache-Control', 'no-store')
+        self.end_headers()
+        self.wfile.write(content)
+
+    def _send_events(self) -> None:
+        builds: BuildCounter = self.server.builds  # type: ignore
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/event-stream')
+        self.send_header('Cache-Control', 'no-cache')
+        self.end_headers()
+        count = builds.count
+        try:
+            while True:
+                new_count = builds.wait(count, timeout=15)
+                if new_count != count:
+                    count = new_count
+                    self.wfile.write(b'data: reload\n\n')
+                else:
+                    # Keep connection alive, and detect closed pages.
+                    self.wfile.write(b': ping\n\n')
+                self.wfile.flush()
+        except (BrokenPipeError, ConnectionResetError):
+            pass
+
+    def log_message(self, format, *args):  # pylint: disable=redefined-builtin
+        "Don't log every request."
+
+
+def serve(directory: Path, port: int = 8000) -> ThreadingHTTPServer:
+    "Serve `directory` on localhost in a background thread, and return the server."
+    server = ThreadingHTTPServer(('localhost', port),
+                                 partial(LiveReloadHandler, directory=str(directory)))
+    server.builds = BuildCounter()  # type: ignore
+    Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def snapshot(paths: Iterable[Path]) -> Dict[Path, Optional[Tuple[int, int]]]:
+    "Return mtime and size of every path (None if it doesn't exist anymore)."
+    state: Dict[Path, Optional[Tuple[int, int]]] = {}
+    for path in paths:
+        try:
+            stat = path.stat()
+            state[path] = (stat.st_mtime_ns, stat.st_size)
+        except OSError:
+            state[path] = None
+    return state
+
+
+def watch(build: Callable[[Optional[Set[Path]]], None], sources: Callable[[], Iterable[Path]],
+          directory: Path, port: int = 8000, interval: float = 0.2) -> None:
+    """Serve `directory`, and call `build(changed)` every time a source changes.
+
+    `build(changed)` must update the website after `changed` sources changed
+    (None for the first build), and `sources()` return the paths of all its
+    sources, even after a failed build.
+    If a build fails, the error is reported, and the website is still served.
+    """
+    server = serve(directory, port)
+    print(f'Serving website on http://localhost:{server.server_port}/ (Ctrl+C to stop).')
+    changed: Optional[Set[Path]] = None
+    try:
+        while True:
+            start = time.perf_counter()
+            try:
+                build(changed)
+            except Exception as error:  # pylint: disable=broad-except
+                # Wait for the next change to try again.
+                print(f'Website {"build" if changed is None else "update"} failed: {error!r}')
+            else:
+                server.builds.increment()  # type: ignore
+                if changed is not None:
+                    print(f'Website updated in {time.perf_counter() - start:.2f}s.')
+            state = snapshot(sources())
+            new_state = state
+            while new_state == state:
+                time.sleep(interval)
+                new_state = snapshot(state)
+            changed = {path for path, value in new_state.items() if value != state[path]}
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.shutdown()
@@ -85,7 +85,9 @@ setup(
     #
     #   py_modules=["my_module"],
     #
-    packages=find_packages(where='.'),  # Required
+    # Tests and benchmarks are packages too, but they must not be installed.
+    packages=find_packages(where='.', exclude=['tests', 'tests.*',
+                                               'benchmarks', 'benchmarks.*']),  # Required
 
     # Specify which Python versions you support. In contrast to the
     # 'Programming Language' classifiers above, 'pip install' will check this
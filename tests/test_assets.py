@@ -0,0 +1,32 @@
+import json
+from pathlib import Path
+
+from campus.assets import HEADERS_FILE, publish_styles, rewrite_css
+
+
+def test_rewrite_css():
+    assets = {'pic/a.svg': 'pic/a.0123456789.svg'}
+    css = 'x {background: url(../pic/a.svg)} y {background: url("http://x.org/a.svg")}'
+    assert rewrite_css(css, 'css/all.css', assets) == \
+        'x {background: url(../pic/a.0123456789.svg)} y {background: url("http://x.org/a.svg")}'
+
+
+def test_publish_styles(tmp_path: Path):
+    config, dst = tmp_path / 'config', tmp_path / 'www'
+    (config / 'css').mkdir(parents=True)
+    (config / 'pic').mkdir()
+    (config / 'pic' / 'a.svg').write_text('<svg/>')
+    (config / 'css' / 'all.css').write_text("x {background: url('../pic/a.svg')}")
+    assert publish_styles(config, dst) is None
+    assert (dst / 'css' / 'all.css').is_file()
+
+    assets = publish_styles(config, dst, fingerprint=True)
+    assert json.loads((dst / 'assets.json').read_text()) == assets
+    css = (dst / assets['css/all.css']).read_text()
+    assert f"url('../{assets['pic/a.svg']}')" in css
+    assert f"/{assets['css/all.css']}\n  Cache-Control:" in (dst / HEADERS_FILE).read_text()
+    # Names are stable, and only change with content (of the stylesheet or of its pictures).
+    assert publish_styles(config, dst, fingerprint=True) == assets
+    (config / 'pic' / 'a.svg').write_text('<svg></svg>')
+    new = publish_styles(config, dst, fingerprint=True)
+    assert new['pic/a.svg'] != assets['pic/a.svg'] and new['css/all.css'] != assets['css/all.css']
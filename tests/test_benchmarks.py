@@ -0,0 +1,11 @@
+from pathlib import Path
+
+from benchmarks.synthetic import generate_course
+
+
+def test_generate_course(tmp_path: Path):
+    stats = generate_course(tmp_path / 'course', depth=2, fanout=3, files=2, file_size=100)
+    assert stats['directories'] == 1 + 3 + 9
+    assert stats['files'] == 2 * 13
+    assert len(list((tmp_path / 'course').rglob('index.md'))) == 13
+    assert (tmp_path / 'course' / 'doc_0.pdf').stat().st_size == 100
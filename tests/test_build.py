@@ -0,0 +1,190 @@
+from collections import Counter
+import json
+from pathlib import Path
+
+import pytest
+
+from campus.cache import BuildCache
+from campus.generate_website import generate_website
+from campus.manifest import BuildManifest
+from campus.profiling import BuildProfile
+
+
+@pytest.fixture
+def course(tmp_path: Path) -> Path:
+    "Create a small course tree in a temporary directory."
+    src = tmp_path / 'course'
+    (src / 'a').mkdir(parents=True)
+    (src / 'b' / 'c').mkdir(parents=True)
+    (src / 'index.md').write_text('# Root\n\n[Chap A](a)\n\n[Chap B](b)\n\n[doc](<doc.pdf>)\n')
+    (src / 'doc.pdf').write_text('pdf')
+    (src / 'a' / 'index.md').write_text('# A\n\n[f](<f.txt>)\n')
+    (src / 'a' / 'f.txt').write_text('hello')
+    (src / 'b' / 'index.md').write_text('[C](c)\n')
+    (src / 'b' / 'c' / 'index.md').write_text('# C\n')
+    return src
+
+
+def build(src: Path, dst: Path) -> BuildManifest:
+    manifest = BuildManifest(src.parent / 'manifest.json', src=src, dst=dst)
+    generate_website(src, src=src, dst=dst, siblings={}, manifest=manifest)
+    manifest.remove_stale()
+    manifest.save()
+    return manifest
+
+
+def test_incremental_build(course: Path, tmp_path: Path):
+    dst = tmp_path / 'www'
+    manifest = build(course, dst)
+    assert (dst / 'b' / 'c' / 'index.html').is_file()
+    assert (dst / 'a' / 'f.txt').read_text() == 'hello'
+    assert len(manifest.pages) == 4
+    mtimes = {path: path.stat().st_mtime_ns for path in dst.rglob('*') if path.is_file()}
+
+    # Nothing changed: nothing must be written again.
+    build(course, dst)
+    assert mtimes == {path: path.stat().st_mtime_ns for path in dst.rglob('*') if path.is_file()}
+
+    # Modify one page and remove one file.
+    (course / 'b' / 'c' / 'index.md').write_text('# New C\n')
+    (course / 'a' / 'f.txt').unlink()
+    build(course, dst)
+    assert 'New C' in (dst / 'b' / 'c' / 'index.html').read_text()
+    assert not (dst / 'a' / 'f.txt').exists()
+    assert 'broken-link' in (dst / 'a' / 'index.html').read_text()
+    assert (dst / 'index.html').stat().st_mtime_ns == mtimes[dst / 'index.html']
+
+
+def test_page_dependencies(course: Path, tmp_path: Path):
+    dst = tmp_path / 'www'
+    build(course, dst)
+    # Renaming a link changes the title of the linked page, and the
+    # navigation menu of its siblings, but nothing else.
+    (course / 'index.md').write_text('# Root\n\n[Chap A](a)\n\n[Chapter B](b)\n\n[doc](<doc.pdf>)\n')
+    (course / 'b' / 'c' / 'new.txt').write_text('new')
+    manifest = build(course, dst)
+    assert manifest.reasons == {'index.html': 'index.md changed',
+                                'a/index.html': "navigation menu changed (see 'index.md')",
+                                'b/index.html': "title changed (see 'index.md')"}
+    assert manifest.pages['b/c']['parent'] == 'b'
+    (course / 'b' / 'c' / 'index.md').write_text('# C\n\n[new](<new.txt>)\n')
+    (course / 'a' / 'f.txt').unlink()
+    manifest = build(course, dst)
+    assert manifest.reasons == {'a/index.html': "link target changed: 'f.txt' (file -> nothing)",
+                                'b/c/index.html': 'index.md changed',
+                                'b/c/new.txt': 'new file'}
+    assert manifest.explain().splitlines()[-1] == 'b/c/new.txt: new file'
+
+
+def test_parallel_build(course: Path, tmp_path: Path):
+    serial, parallel = tmp_path / 'serial', tmp_path / 'parallel'
+    generate_website(course, src=course, dst=serial, siblings={})
+    generate_website(course, src=course, dst=parallel, siblings={}, jobs=2)
+    files = sorted(path.relative_to(serial) for path in serial.rglob('*') if path.is_file())
+    assert files == sorted(path.relative_to(parallel)
+                           for path in parallel.rglob('*') if path.is_file())
+    for path in files:
+        assert (serial / path).read_bytes() == (parallel / path).read_bytes()
+
+
+def test_build_cache(course: Path, tmp_path: Path):
+    cache = BuildCache(tmp_path / 'cache', max_size=10**6)
+    first, second = tmp_path / 'first', tmp_path / 'second'
+    stats: Counter = Counter()
+    generate_website(course, src=course, dst=first, siblings={}, cache=cache, stats=stats)
+    assert stats['rendered'] == 4
+    # A fresh build (e.g. on another machine) finds every page in the cache.
+    stats.clear()
+    generate_website(course, src=course, dst=second, siblings={}, cache=cache, stats=stats)
+    assert stats['cached'] == 4 and stats['rendered'] == 0
+    for path in first.rglob('*'):
+        if path.is_file():
+            assert path.read_bytes() == (second / path.relative_to(first)).read_bytes()
+    # Least recently used entries are removed when the cache is too big.
+    cache.max_size = 0
+    assert cache.prune()
+    assert not any(path.is_file() for path in cache.path.rglob('*'))
+
+
+def test_sync_output(course: Path, tmp_path: Path):
+    dst = tmp_path / 'www'
+    (dst / '.git').mkdir(parents=True)
+    (dst / '.git' / 'HEAD').write_text('ref: refs/heads/master')
+    (dst / 'old.pdf').write_text('stale')
+    # Full build (no previous build data).
+    manifest = build(course, dst)
+    assert not (dst / 'old.pdf').exists()
+    assert (dst / '.git' / 'HEAD').is_file()
+    assert 'index.html' in manifest.changed
+    mtimes = {path: path.stat().st_mtime_ns for path in dst.rglob('*') if path.is_file()}
+    # A new full build must not rewrite unchanged files.
+    (tmp_path / 'manifest.json').unlink()
+    manifest = build(course, dst)
+    assert not manifest.changed
+    assert mtimes == {path: path.stat().st_mtime_ns for path in dst.rglob('*') if path.is_file()}
+
+
+def test_restart_after_failure(course: Path, tmp_path: Path):
+    dst = tmp_path / 'www'
+    build(course, dst)
+    # A build fails (before stale files removal) after links were changed.
+    (course / 'a' / 'g.txt').write_text('new')
+    (course / 'a' / 'index.md').write_text('# A\n\n[g](<g.txt>)\n')
+    manifest = BuildManifest(tmp_path / 'manifest.json', src=course, dst=dst)
+    generate_website(course, src=course, dst=dst, siblings={}, manifest=manifest)
+    # The outputs of the last saved build and of the failed one are removed
+    # if they are not generated anymore.
+    (course / 'a' / 'index.md').write_text('# A\n')
+    manifest.restart('', failed=True)
+    generate_website(course, src=course, dst=dst, siblings={}, manifest=manifest)
+    manifest.remove_stale()
+    assert not (dst / 'a' / 'f.txt').exists()
+    assert not (dst / 'a' / 'g.txt').exists()
+    assert {'a/f.txt', 'a/g.txt'} <= manifest.removed
+
+
+def test_build_profile(course: Path, tmp_path: Path):
+    profile = BuildProfile()
+    generate_website(course, src=course, dst=tmp_path / 'www', siblings={},
+                     stats=profile.counters, directories=profile.directories)
+    assert sorted(profile.directories) == ['.', 'a', 'b', 'b/c']
+    assert profile.counters['files published'] == 2
+    assert profile.directories['a']['bytes published'] == len('hello')
+    assert json.loads(json.dumps(profile.to_json()))['counters']['rendered'] == 4
+    assert 'b/c' in profile.report()
+
+
+def test_large_page(course: Path, tmp_path: Path, monkeypatch):
+    monkeypatch.setattr('campus.generate_website.CHUNK_SIZE', 50)
+    monkeypatch.setattr('campus.generate_website.SPOOL_SIZE', 100)
+    text = ''.join(f'\n[Doc {i}](<doc.pdf>)\n\n[Chap {i}](a)\n' for i in range(200))
+    (course / 'index.md').write_text('# Root\n' + text + '\n# Root\n')
+    dst = tmp_path / 'www'
+    build(course, dst)
+    html = (dst / 'index.html').read_text()
+    assert html.count('<span class="before file pdf"></span>') == 200
+    # Title is only in the header.
+    assert html.count('<h1>Root</h1>') == 1
+
+
+def test_large_nav(tmp_path: Path):
+    src, dst = tmp_path / 'course', tmp_path / 'www'
+    src.mkdir()
+    weeks = [f'week{i:02}' for i in range(60)]
+    (src / 'index.md').write_text('\n\n'.join(f'[Week {i}]({week})'
+                                              for i, week in enumerate(weeks)))
+    for week in weeks:
+        (src / week).mkdir()
+        (src / week / 'index.md').write_text(f'# {week}\n')
+    manifest = build(src, dst)
+    nav = (dst / 'week30' / 'index.html').read_text().split('<nav>')[1].split('</nav>')[0]
+    # Only the 10 siblings before and after the current page are listed.
+    assert nav.count('<li>') == 1 + 2 + 21
+    assert 'href="../week20"' in nav and 'href="../week19"' not in nav
+    assert '<a href="../week30" class="current">' in nav
+    assert nav.count('data-nav="../index.nav.html"') == 2
+    fragment = (dst / 'index.nav.html').read_text()
+    assert fragment.count('<li>') == 1 + 60 and 'current' not in fragment
+    assert 'index.nav.html' in manifest.outputs
+    first = (dst / 'week00' / 'index.html').read_text()
+    assert first.count('data-nav=') == 1 and 'href="../week10"' in first
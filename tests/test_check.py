@@ -0,0 +1,25 @@
+from pathlib import Path
+
+import pytest
+
+from campus.check import check, report
+
+
+@pytest.mark.parametrize('jobs', [1, 2])
+def test_check(tmp_path: Path, jobs: int):
+    (tmp_path / 'a').mkdir()
+    (tmp_path / 'old' / 'sub').mkdir(parents=True)
+    (tmp_path / '.hidden').mkdir()
+    (tmp_path / 'docs' / 'sub').mkdir(parents=True)
+    (tmp_path / 'index.md').write_text('# Root\n\n[A](a)\n\n[missing](<nope.pdf>)\n')
+    (tmp_path / 'a' / 'index.md').write_text('[f](<f.txt>)\n\n[up](<../doc.pdf>)\n\n'
+                                             '[s](<../docs/sub/s.pdf>)\n')
+    for path in ('a/f.txt', 'a/g.txt', 'doc.pdf', 'old/sub/x.txt', '.hidden/y.txt',
+                 'docs/sub/s.pdf', 'docs/sub/t.pdf'):
+        (tmp_path / path).write_text('data')
+    problems = check(tmp_path, jobs=jobs)
+    # Directories of linked files are not orphaned, but their files are checked.
+    assert problems == {'broken': [{'page': 'index.md', 'link': 'nope.pdf'}],
+                        'unindexed': ['a/g.txt', 'docs/sub/t.pdf'],
+                        'orphaned': ['old/']}
+    assert report(problems).splitlines()[-1] == '4 problem(s) found.'
@@ -0,0 +1,38 @@
+import gzip
+from pathlib import Path
+
+from campus.compress import compress_outputs
+from campus.manifest import BuildManifest
+
+
+def outputs(tmp_path: Path) -> BuildManifest:
+    manifest = BuildManifest(tmp_path / 'manifest.json', src=tmp_path, dst=tmp_path / 'www')
+    for name, content in (('index.html', b'<p>hello</p>' * 100), ('doc.pdf', b'%PDF')):
+        path = tmp_path / 'www' / name
+        path.parent.mkdir(exist_ok=True)
+        if not path.is_file():
+            path.write_bytes(content)
+        manifest.add_output(path)
+    return manifest
+
+
+def test_compress_outputs(tmp_path: Path):
+    manifest = outputs(tmp_path)
+    stats = compress_outputs(manifest, jobs=2)
+    assert stats['files compressed'] == 1
+    www = tmp_path / 'www'
+    assert gzip.decompress((www / 'index.html.gz').read_bytes()) == (www / 'index.html').read_bytes()
+    assert not (www / 'doc.pdf.gz').exists()
+    manifest.save()
+
+    # Up to date compressed copies are skipped.
+    manifest = outputs(tmp_path)
+    assert compress_outputs(manifest)['compression skipped'] == 1
+    assert 'index.html.gz' in manifest.outputs and not manifest.changed
+    manifest.save()
+
+    (www / 'index.html').write_bytes(b'<p>new</p>')
+    manifest = outputs(tmp_path)
+    assert compress_outputs(manifest)['files compressed'] == 1
+    assert manifest.reasons == {'index.html.gz': 'source changed'}
+    assert gzip.decompress((www / 'index.html.gz').read_bytes()) == b'<p>new</p>'
@@ -0,0 +1,15 @@
+from pathlib import Path
+
+from campus.fscache import DirectoryCache
+
+
+def test_directory_cache(tmp_path: Path):
+    (tmp_path / 'sub').mkdir()
+    (tmp_path / 'sub' / 'doc.pdf').write_text('pdf')
+    cache = DirectoryCache()
+    assert cache.is_dir(tmp_path / 'sub')
+    assert cache.is_file(tmp_path / 'sub' / 'doc.pdf')
+    assert cache.is_file(tmp_path / 'sub' / '..' / 'sub' / 'doc.pdf')
+    assert cache.kind(tmp_path / 'missing.pdf') == ''
+    assert cache.kind(tmp_path / 'missing' / 'doc.pdf') == ''
+    assert cache.stats == {'scandir': 3, 'hits': 2}
@@ -0,0 +1,25 @@
+from pathlib import Path
+
+from campus.indexing import index_directory, indexed_links
+
+
+def test_index_directory(tmp_path: Path, capsys):
+    (tmp_path / 'chap_1').mkdir()
+    (tmp_path / '.hidden').mkdir()
+    (tmp_path / 'chap_1' / 'exo_1.pdf').write_text('pdf')
+    (tmp_path / 'index.md').write_text('# Root\n\n[Old](<notes.txt>)\n')
+    (tmp_path / 'notes.txt').write_text('notes')
+
+    # Dry run: nothing is written.
+    assert index_directory('*', tmp_path, recursive=True, dry_run=True) == 2
+    assert not (tmp_path / 'chap_1' / 'index.md').exists()
+    assert 'exo 1 would be indexed.' in capsys.readouterr().out
+
+    assert index_directory('*', tmp_path, recursive=True) == 2
+    assert (tmp_path / 'chap_1' / 'index.md').read_text() == \
+        '# chap 1\n\n\n[exo 1](<exo_1.pdf>)\n'
+    assert indexed_links(tmp_path / 'index.md') == {'notes.txt', 'chap_1'}
+    assert not (tmp_path / '.hidden' / 'index.md').exists()
+    # Nothing new to index.
+    assert index_directory('*', tmp_path, recursive=True) == 0
+    assert index_directory('*.pdf', tmp_path / 'chap_1') == 0
@@ -0,0 +1,45 @@
+from pathlib import Path
+from shutil import copytree
+
+import pytest
+
+from campus import script
+from campus.paths import STYLE_PATH
+
+
+def campus_root(path: Path, title: str) -> Path:
+    "Create a campus root (without git repositories)."
+    (path / 'chap').mkdir(parents=True)
+    copytree(STYLE_PATH, path / '.campus-config')
+    (path / 'index.md').write_text(f'# {title}\n\n[Chapter](chap)\n')
+    (path / 'chap' / 'index.md').write_text('# Chapter\n\n[doc](<doc.pdf>)\n')
+    (path / 'chap' / 'doc.pdf').write_text('pdf')
+    return path
+
+
+@pytest.mark.parametrize('jobs', [1, 2])
+def test_make_all(tmp_path: Path, capsys, jobs: int):
+    roots = [campus_root(tmp_path / name, name.upper()) for name in ('a', 'b')]
+    (tmp_path / 'sites.txt').write_text('# Courses\nb\n\n')
+    script.make_all([str(roots[0])], roots_file=str(tmp_path / 'sites.txt'), jobs=jobs)
+    for root in roots:
+        assert f'<h1>{root.name.upper()}</h1>' in (root / '.www' / 'index.html').read_text()
+        assert (root / '.www' / 'chap' / 'doc.pdf').read_text() == 'pdf'
+        assert (root / '.campus-config' / 'build' / 'manifest.json').is_file()
+    out = capsys.readouterr().out
+    assert '2 site(s) built, 0 failed' in out
+    # Only the changed page is generated again.
+    (roots[1] / 'chap' / 'index.md').write_text('# Chapter 1\n\n[doc](<doc.pdf>)\n')
+    script.make_all([str(root) for root in roots], jobs=jobs)
+    out = capsys.readouterr().out
+    assert f'{roots[0]}: 0 page(s) generated, 2 unchanged' in out
+    assert f'{roots[1]}: 1 page(s) generated, 1 unchanged' in out
+
+
+def test_make_all_failure(tmp_path: Path, capsys):
+    root = campus_root(tmp_path / 'a', 'A')
+    (tmp_path / 'b').mkdir()
+    with pytest.raises(SystemExit):
+        script.make_all([str(root), str(tmp_path / 'b')])
+    assert (root / '.www' / 'index.html').is_file()
+    assert 'not an initialized campus root' in capsys.readouterr().out
@@ -0,0 +1,86 @@
+import json
+from pathlib import Path
+from typing import Optional
+
+from campus import previews
+from campus.cache import BuildCache
+from campus.generate_website import generate_website, previews_index
+from campus.manifest import BuildManifest
+from campus.previews import pdf_pages, update_previews
+
+PDF = (b'%PDF-1.4\n1 0 obj << /Type /Catalog /Pages 2 0 R >> endobj\n'
+       b'2 0 obj << /Kids [3 0 R 4 0 R 5 0 R] /Count 3 /Type /Pages >> endobj\n')
+
+
+def build(src: Path, dst: Path, cache: Optional[BuildCache] = None) -> BuildManifest:
+    manifest = BuildManifest(src.parent / 'manifest.json', src=src, dst=dst)
+    generate_website(src, src=src, dst=dst, siblings={}, manifest=manifest, previews=True,
+                     cache=cache)
+    return manifest
+
+
+def test_pdf_pages(tmp_path: Path, monkeypatch):
+    monkeypatch.setattr('shutil.which', lambda name: None)
+    (tmp_path / 'doc.pdf').write_bytes(PDF)
+    assert pdf_pages(tmp_path / 'doc.pdf') == 3
+    (tmp_path / 'doc.pdf').write_bytes(b'%PDF-1.4\n<< /Type /Page >> << /Type/Page >>')
+    assert pdf_pages(tmp_path / 'doc.pdf') == 2
+    # Large files are scanned by chunks: matches across chunks are found once.
+    monkeypatch.setattr('campus.previews.PDF_CHUNK_SIZE', 7)
+    (tmp_path / 'doc.pdf').write_bytes(b'%PDF-1.4\n' + b'<< /Type /Page >> ' * 100)
+    assert pdf_pages(tmp_path / 'doc.pdf') == 100
+    (tmp_path / 'doc.pdf').write_bytes(PDF + b'%' * 1000)
+    assert pdf_pages(tmp_path / 'doc.pdf') == 3
+
+
+def test_previews(tmp_path: Path, monkeypatch):
+    def render_preview(path: Path, png: Path) -> bool:
+        if path.suffix != '.pdf':
+            return False
+        png.write_bytes(b'png')
+        return True
+    monkeypatch.setattr(previews, 'render_preview', render_preview)
+    monkeypatch.setattr('shutil.which', lambda name: None)
+    src, dst, cache = tmp_path / 'course', tmp_path / 'www', tmp_path / 'previews'
+    (src / 'chap').mkdir(parents=True)
+    (src / 'index.md').write_text('# Course\n\n[Chapter](chap)\n')
+    (src / 'chap' / 'index.md').write_text('[Lesson](<lesson.pdf>)\n\n[Notes](<notes.txt>)\n')
+    (src / 'chap' / 'lesson.pdf').write_bytes(PDF)
+    (src / 'chap' / 'notes.txt').write_text('notes')
+    manifest = build(src, dst)
+    assert update_previews(manifest, cache)['previews computed'] == 2
+    html = (dst / 'chap' / 'index.html').read_text()
+    assert f'data-index="../{previews_index("chap")}"' in html
+    assert 'src="../previews/previews.js"' in html
+    info = json.loads((dst / previews_index('chap')).read_text())
+    assert info['notes.txt'] == {'size': 5}
+    assert info['lesson.pdf']['pages'] == 3
+    assert (dst / 'chap' / info['lesson.pdf']['preview']).read_bytes() == b'png'
+
+    # Information is computed once for each version of a file.
+    stats = update_previews(build(src, dst), cache)
+    assert stats['previews cached'] == 2 and not stats['previews computed']
+    (src / 'chap' / 'notes.txt').write_text('new notes')
+    (src / 'chap' / 'index.md').write_text('[Notes](<notes.txt>)\n')
+    stats = update_previews(build(src, dst), cache)
+    assert stats['previews computed'] == 1
+    # Cache entries of files which aren't linked anymore are removed.
+    assert len(list(cache.glob('*/*.json'))) == 1
+
+
+def test_previews_cached_pages(tmp_path: Path):
+    # Identical pages in different directories have their own previews index.
+    src, dst = tmp_path / 'course', tmp_path / 'www'
+    for name in ('a', 'b'):
+        (src / name / 'td').mkdir(parents=True)
+        (src / name / 'index.md').write_text('[TD](td)\n')
+        (src / name / 'td' / 'index.md').write_text('[Notes](<notes.txt>)\n')
+        (src / name / 'td' / 'notes.txt').write_text('notes')
+    (src / 'index.md').write_text('[A](a)\n\n[B](b)\n')
+    cache = BuildCache(tmp_path / 'cache', max_size=10**6)
+    build(src, tmp_path / 'first', cache)
+    # Pages are now found in the build cache.
+    build(src, dst, cache)
+    for name in ('a', 'b'):
+        html = (dst / name / 'td' / 'index.html').read_text()
+        assert f'data-index="../../{previews_index(f"{name}/td")}"' in html
@@ -0,0 +1,82 @@
+import errno
+import os
+from pathlib import Path
+
+import pytest
+
+from campus import publish as publish_module, transfer
+from campus.manifest import BuildManifest
+from campus.publish import publish, publish_file, write_chunks_if_changed, FALLBACKS
+
+
+@pytest.mark.parametrize('strategy', sorted(FALLBACKS))
+def test_publish(tmp_path: Path, strategy: str):
+    src_file = tmp_path / 'src' / 'video.mp4'
+    src_file.parent.mkdir()
+    src_file.write_bytes(b'data')
+    dst_file = tmp_path / 'dst' / 'sub' / 'video.mp4'
+    # Publishing twice must replace the existing file.
+    for _ in range(2):
+        used = publish(src_file, dst_file, strategy)
+        assert used in FALLBACKS[strategy]
+        assert dst_file.read_bytes() == b'data'
+    if used == 'hardlink':
+        assert dst_file.stat().st_ino == src_file.stat().st_ino
+    assert dst_file.is_symlink() == (used == 'symlink')
+    assert os.listdir(dst_file.parent) == ['video.mp4']
+
+
+def test_publish_atomic(tmp_path: Path, monkeypatch):
+    src_file = tmp_path / 'video.mp4'
+    src_file.write_bytes(b'data')
+    dst_file = tmp_path / 'dst' / 'video.mp4'
+    dst_file.parent.mkdir()
+    # A leftover of an interrupted build doesn't prevent linking.
+    dst_file.with_name(f'.video.mp4.{os.getpid()}.tmp').write_bytes(b'junk')
+    if publish(src_file, dst_file, 'hardlink') == 'hardlink':
+        assert os.listdir(dst_file.parent) == ['video.mp4']
+
+    # An interrupted copy leaves the previous output.
+    publish(src_file, dst_file, 'copy')
+
+    def interrupted(*args):
+        raise OSError(errno.ENOSPC, 'No space left on device')
+    monkeypatch.setattr(transfer, '_copy', interrupted)
+    src_file.write_bytes(b'new data')
+    with pytest.raises(OSError):
+        publish(src_file, dst_file, 'copy')
+    assert dst_file.read_bytes() == b'data'
+    assert os.listdir(dst_file.parent) == ['video.mp4']
+
+
+def test_publish_file_modified_in_place(tmp_path: Path, monkeypatch):
+    monkeypatch.setitem(publish_module.FALLBACKS, 'auto', ('hardlink', 'copy'))
+    src, dst = tmp_path / 'src', tmp_path / 'dst'
+    src.mkdir()
+    src_file, dst_file = src / 'doc.pdf', dst / 'doc.pdf'
+    src_file.write_bytes(b'pdf v1')
+    manifest = BuildManifest(tmp_path / 'manifest.json', src=src, dst=dst)
+    assert publish_file(src_file, dst_file, manifest)
+    manifest.save()
+    # Like pdflatex, rewrite the source in place: its hard link already has
+    # the new content, but it must still be reported as changed.
+    with open(src_file, 'r+b') as file:
+        file.write(b'pdf v2')
+    os.utime(src_file, ns=(0, 0))
+    manifest = BuildManifest(tmp_path / 'manifest.json', src=src, dst=dst)
+    publish_file(src_file, dst_file, manifest)
+    assert manifest.changed == {'doc.pdf'}
+    assert dst_file.read_bytes() == b'pdf v2'
+
+
+def test_write_chunks_if_changed(tmp_path: Path):
+    path = tmp_path / 'page.html'
+    assert write_chunks_if_changed(path, [b'abc', b'def'])
+    mtime = path.stat().st_mtime_ns
+    # Same content, chunked differently: file is left untouched.
+    assert not write_chunks_if_changed(path, [b'ab', b'cdef', b''])
+    assert path.stat().st_mtime_ns == mtime
+    for chunks in ([b'abc', b'deX'], [b'abc'], [b'abc', b'defg'], []):
+        assert write_chunks_if_changed(path, chunks)
+        assert path.read_bytes() == b''.join(chunks)
+    assert list(tmp_path.iterdir()) == [path]
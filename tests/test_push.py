@@ -0,0 +1,137 @@
+import json
+from pathlib import Path
+from subprocess import run
+
+import pytest
+
+from campus import script
+from campus.git import changed_paths, revision, tracked_paths
+
+
+def git(*args: str, cwd: Path) -> str:
+    return run(['git', *args], cwd=cwd, check=True, capture_output=True, text=True).stdout
+
+
+@pytest.fixture
+def campus_root(tmp_path: Path, monkeypatch) -> Path:
+    "Create an initialized campus root, whose repositories have local bare remotes."
+    root = tmp_path / 'course'
+    (root / 'chap').mkdir(parents=True)
+    monkeypatch.chdir(root)
+    for var in ('GIT_AUTHOR_NAME', 'GIT_COMMITTER_NAME'):
+        monkeypatch.setenv(var, 'Campus')
+    for var in ('GIT_AUTHOR_EMAIL', 'GIT_COMMITTER_EMAIL'):
+        monkeypatch.setenv(var, 'campus@example.com')
+    (root / 'chap' / 'index.md').write_text('# Chapter\n')
+    (root / 'chap' / 'doc.pdf').write_text('pdf')
+    script.init()
+    (root / 'index.md').write_text('# Course\n\n[Chapter](chap)\n\n[doc](<chap/doc.pdf>)\n')
+    for repo, remote in ((root, 'source.git'), (root / '.www', 'website.git')):
+        git('init', '--bare', str(tmp_path / remote), cwd=tmp_path)
+        git('remote', 'add', 'origin', str(tmp_path / remote), cwd=repo)
+        git('commit', '--allow-empty', '-m', 'Initial commit', cwd=repo)
+        git('push', '-u', 'origin', 'HEAD', cwd=repo)
+    git('add', '--all', cwd=root)
+    return root
+
+
+def test_push(campus_root: Path, tmp_path: Path):
+    script.push(message='First publication')
+    website = tmp_path / 'website.git'
+    assert 'chap/doc.pdf' in git('ls-tree', '-r', '--name-only', 'HEAD', cwd=website)
+    assert 'First publication' in git('log', '-1', cwd=tmp_path / 'source.git')
+
+    # Only changed outputs are staged and published.
+    (campus_root / 'chap' / 'index.md').write_text('# Chapter 1\n')
+    script.push(message='Fix title')
+    changed = git('show', '--name-only', '--format=', 'HEAD', cwd=website).split()
+    assert changed == ['chap/index.html']
+    assert 'Fix title' in git('log', '-1', cwd=tmp_path / 'source.git')
+
+
+def test_make_then_push(campus_root: Path, tmp_path: Path):
+    script.push(message='First publication')
+    # Outputs written by `campus make` are published by next `campus push`.
+    (campus_root / 'chap' / 'index.md').write_text('# Chapter 1\n')
+    script.make()
+    script.push(message='Fix title')
+    changed = git('show', '--name-only', '--format=', 'HEAD', cwd=tmp_path / 'website.git')
+    assert changed.split() == ['chap/index.html']
+    assert git('status', '--porcelain', cwd=campus_root / '.www') == ''
+    # Then, they are not staged again.
+    index_md = campus_root / 'index.md'
+    index_md.write_text(index_md.read_text().replace('# Course', '# Course 1'))
+    script.push(message='Fix course title')
+    changed = git('show', '--name-only', '--format=', 'HEAD', cwd=tmp_path / 'website.git')
+    assert changed.split() == ['index.html']
+
+
+def test_changed_paths(campus_root: Path):
+    git('commit', '-m', 'Course', cwd=campus_root)
+    tracked = tracked_paths(campus_root, 'HEAD')
+    assert {'index.md', 'chap', 'chap/index.md', 'chap/doc.pdf'} <= tracked
+    assert changed_paths(campus_root, 'HEAD') == set()
+    (campus_root / 'chap' / 'index.md').write_text('# Chapter 1\n')
+    (campus_root / 'new.pdf').write_text('new')
+    (campus_root / 'chap' / 'doc.pdf').unlink()
+    assert changed_paths(campus_root, 'HEAD') == {'.', 'chap', 'chap/index.md',
+                                                  'chap/doc.pdf', 'new.pdf'}
+    assert changed_paths(campus_root, 'HEAD', exclude=['chap']) == {'.', 'new.pdf'}
+    assert revision(campus_root, 'unknown') is None
+
+
+def build_revision(root: Path) -> dict:
+    "Return the source revision of the last build."
+    with open(root / '.campus-config' / 'build' / 'manifest.json', encoding='utf8') as file:
+        return json.load(file)['revision']
+
+
+def test_push_since(campus_root: Path, tmp_path: Path):
+    script.push(message='First publication')
+    assert build_revision(campus_root) == {'commit': revision(campus_root), 'clean': True}
+
+    # Only sources changed since last build are checked.
+    (campus_root / 'chap' / 'index.md').write_text('# Chapter 1\n\n[notes](notes.txt)\n')
+    (campus_root / 'chap' / 'notes.txt').write_text('notes')
+    git('add', 'chap/notes.txt', cwd=campus_root)
+    site = script._site()
+    script._trust_unchanged(site, 'HEAD')
+    assert {'index.md', 'chap/doc.pdf'} <= site.manifest.unchanged
+    assert not {'chap', 'chap/index.md', 'chap/notes.txt'} & site.manifest.unchanged
+
+    script.push(message='Add notes')
+    website = tmp_path / 'website.git'
+    changed = git('show', '--name-only', '--format=', 'HEAD', cwd=website).split()
+    assert changed == ['chap/index.html', 'chap/notes.txt']
+
+    # Styles changes are not trusted.
+    (campus_root / '.campus-config' / 'css' / 'extra.css').write_text('p {}')
+    site = script._site()
+    script._trust_unchanged(site, 'HEAD')
+    assert not site.manifest.unchanged
+
+
+def test_since_old_gitignore(campus_root: Path):
+    # Build data wasn't ignored by git in former campus roots.
+    (campus_root / '.gitignore').write_text('.www/\n')
+    git('commit', '-q', '-am', 'Course', cwd=campus_root)
+    script.make()
+    assert '.campus-config/build/manifest.json' in git('status', '--porcelain', '-uall',
+                                                       cwd=campus_root)
+    site = script._site()
+    script._trust_unchanged(site, 'HEAD')
+    assert {'index.md', 'chap/index.md'} <= site.manifest.unchanged
+
+
+def test_since_other_build(campus_root: Path):
+    script.push(message='First publication')
+    published = revision(campus_root)
+    # Build a draft in another branch, then come back.
+    git('checkout', '-q', '-b', 'draft', cwd=campus_root)
+    (campus_root / 'chap' / 'index.md').write_text('# DRAFT\n')
+    git('commit', '-q', '-am', 'Draft', cwd=campus_root)
+    script.make()
+    git('checkout', '-q', '-', cwd=campus_root)
+    # Last build wasn't made from published revision: nothing is trusted.
+    script.make(since=published)
+    assert 'DRAFT' not in (campus_root / '.www' / 'chap' / 'index.html').read_text()
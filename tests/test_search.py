@@ -0,0 +1,41 @@
+import json
+from pathlib import Path
+
+from campus.generate_website import generate_website
+from campus.manifest import BuildManifest
+from campus.search import shard_name, terms, update_search_index
+
+
+def build(src: Path, dst: Path) -> BuildManifest:
+    manifest = BuildManifest(src.parent / 'manifest.json', src=src, dst=dst)
+    generate_website(src, src=src, dst=dst, siblings={}, manifest=manifest, search=True)
+    return manifest
+
+
+def test_terms():
+    assert terms('Équations du 2nd degré (a)') == {'equations', 'du', '2nd', 'degre'}
+    assert shard_name('équations') == 'c3a9' + b'q'.hex()
+
+
+def test_search_index(tmp_path: Path):
+    src, dst, state = tmp_path / 'course', tmp_path / 'www', tmp_path / 'search.json'
+    (src / 'algebra').mkdir(parents=True)
+    (src / 'index.md').write_text('# Maths\n\n[Algebra lessons](algebra)\n')
+    (src / 'algebra' / 'index.md').write_text('[Exercises](<ex.pdf>)\n')
+    (src / 'algebra' / 'ex.pdf').write_text('pdf')
+    manifest = build(src, dst)
+    stats = update_search_index(manifest, state)
+    assert stats['search documents'] == 3
+    assert 'action="../search.html"' in (dst / 'algebra' / 'index.html').read_text()
+    assert (dst / 'search.html').is_file()
+    docs = json.loads((dst / 'search' / 'docs' / '0.json').read_text())
+    postings = json.loads((dst / 'search' / f"{shard_name('ex')}.json").read_text())
+    assert docs[str(postings['exercises'][0])] == ['algebra/ex.pdf', 'Exercises']
+
+    # Only shards of changed documents are written again.
+    (src / 'algebra' / 'index.md').write_text('[Exams](<ex.pdf>)\n')
+    manifest = build(src, dst)
+    assert update_search_index(manifest, state)['search shards written'] == 2
+    postings = json.loads((dst / 'search' / f"{shard_name('ex')}.json").read_text())
+    assert list(postings) == ['exams']
+    assert 'search/616c.json' in manifest.outputs
@@ -0,0 +1,70 @@
+from pathlib import Path
+
+from campus.manifest import BuildManifest
+from campus.site import Link, Site
+
+
+def test_site(tmp_path: Path):
+    src, dst = tmp_path / 'course', tmp_path / 'www'
+    (src / 'a').mkdir(parents=True)
+    (src / 'index.md').write_text('# Root\n\n[Chap A](a)\n\n[doc](<doc.pdf>)\n\n[missing](x.pdf)\n')
+    (src / 'doc.pdf').write_text('pdf')
+    (src / 'a' / 'index.md').write_text('[up](<../doc.pdf>)\n')
+    manifest = BuildManifest(tmp_path / 'manifest.json', src=src, dst=dst)
+    site = Site(src, dst, manifest).build()
+    loaded = Site(src).load(jobs=2)
+    for built in (site, loaded):
+        assert [page.title for page in built] == ['Root', 'Chap A']
+        root = built.page('.')
+        assert root.links == [Link('a', 'Chap A', 'd'), Link('doc.pdf', 'doc', 'f'),
+                              Link('x.pdf', 'missing', '')]
+        assert built.page('a').parent == src
+        assert list(built.files()) == [src / 'doc.pdf']
+        assert 'a' in built and 'b' not in built
+
+    # Only the edited page is generated again.
+    (src / 'a' / 'index.md').write_text('# New A\n')
+    assert site.render_page('a')
+    assert site.page('a').title == 'New A' and not site.page('a').links
+    html = (dst / 'a' / 'index.html').read_text()
+    assert '<h1>New A</h1>' in html and '>Chap A</a>' in html
+    assert manifest.pages['a']['title'] == 'New A'
+
+
+def test_site_update(tmp_path: Path):
+    src, dst = tmp_path / 'course', tmp_path / 'www'
+    (src / 'a').mkdir(parents=True)
+    (src / 'index.md').write_text('# Root\n\n[Chap A](a)\n')
+    (src / 'a' / 'index.md').write_text('# A\n\n[doc](<doc.pdf>)\n\n[notes](notes.txt)\n')
+    (src / 'a' / 'doc.pdf').write_text('pdf')
+    manifest = BuildManifest(tmp_path / 'manifest.json', src=src, dst=dst)
+    site = Site(src, dst, manifest).build()
+    # Like in `campus watch`, updates follow a build with previous build data.
+    manifest.restart('')
+    site.build()
+
+    # Only the edited page is generated again, and the changed files published again.
+    (src / 'a' / 'index.md').write_text('# A\n\nText.\n\n[doc](<doc.pdf>)\n\n[notes](notes.txt)\n')
+    (src / 'a' / 'doc.pdf').write_text('pdf v2')
+    mtime = (dst / 'index.html').stat().st_mtime_ns
+    assert site.update({src / 'a' / 'index.md', src / 'a' / 'doc.pdf'})
+    assert 'Text.' in (dst / 'a' / 'index.html').read_text()
+    assert (dst / 'a' / 'doc.pdf').read_text() == 'pdf v2'
+    assert (dst / 'index.html').stat().st_mtime_ns == mtime
+    assert {'a/index.html', 'a/doc.pdf'} <= manifest.changed
+
+    # A file changed back to its content at build time is published again too.
+    (src / 'a' / 'doc.pdf').write_text('pdf')
+    assert site.update({src / 'a' / 'doc.pdf'})
+    assert (dst / 'a' / 'doc.pdf').read_text() == 'pdf'
+
+    # A file created in a page directory may fix a broken link.
+    (src / 'a' / 'notes.txt').write_text('notes')
+    assert site.update({src / 'a'})
+    assert Link('notes.txt', 'notes', 'f') in site.page('a').links
+    assert (dst / 'a' / 'notes.txt').read_text() == 'notes'
+
+    # A new title changes the navigation menus: a build is needed.
+    (src / 'a' / 'index.md').write_text('# New A\n')
+    assert not site.update({src / 'a' / 'index.md'})
+    assert not site.update({src / 'unknown.txt'})
@@ -0,0 +1,37 @@
+from pathlib import Path
+import subprocess
+import sys
+
+ROOT = Path(__file__).resolve().parent.parent
+LAUNCHER = ROOT / 'campus.py'
+# Modules which light commands (`init`, `index`, `indexall`, `--help`) must not import.
+RENDERER = ('mistune', 'campus.generate_website', 'campus.site', 'http.server')
+# Cold-start budget: cumulative import time of `campus.script` (seconds).
+STARTUP_BUDGET = 0.1
+
+
+def imported(*args: str, cwd: Path) -> dict:
+    "Run `campus` with `-X importtime`, and return the {module: cumulative time} imported."
+    result = subprocess.run([sys.executable, '-X', 'importtime', str(LAUNCHER), *args],
+                            cwd=cwd, capture_output=True, text=True, check=True)
+    modules = {}
+    for line in result.stderr.splitlines():
+        if line.startswith('import time:') and '|' in line and 'cumulative' not in line:
+            _, cumulative, name = line.split('|')
+            modules[name.strip()] = int(cumulative) / 1e6
+    return modules
+
+
+def test_light_commands_dont_import_renderer(tmp_path: Path):
+    (tmp_path / 'doc.pdf').write_text('pdf')
+    for args in (['--help'], ['indexall', '--dry-run', '--create'], ['index', '-f', '*.pdf']):
+        modules = imported(*args, cwd=tmp_path)
+        assert 'campus.script' in modules
+        assert not [name for name in RENDERER if name in modules], args
+    assert '(<doc.pdf>)' in (tmp_path / 'index.md').read_text()
+
+
+def test_startup_budget(tmp_path: Path):
+    # Best of 3 runs, to ignore noise.
+    duration = min(imported('--help', cwd=tmp_path)['campus.script'] for _ in range(3))
+    assert duration < STARTUP_BUDGET
@@ -0,0 +1,23 @@
+import io
+
+from campus.template import Template, markdown_chunks, markdown_renderer
+
+
+def test_template():
+    template = Template('<title>[$TITLE]</title><h1>[$TITLE]</h1>[$MAIN][$NEXT]')
+    assert template.keys == {'title', 'main', 'next'}
+    html = template.render({'title': 'Python', 'main': '<p>[$TITLE]</p>'})
+    # Placeholders are replaced in a single pass, and unknown ones are kept.
+    assert html == '<title>Python</title><h1>Python</h1><p>[$TITLE]</p>[$NEXT]'
+
+
+def test_markdown_chunks():
+    text = ''.join(f'[doc {i}](<doc_{i}.pdf>)\n\n- a\n\n- b\n\n```\ncode\n\ncode\n```\n\n'
+                   for i in range(50))
+    chunks = list(markdown_chunks(io.StringIO(text), size=100))
+    assert len(chunks) > 10 and ''.join(chunks) == text
+    render = markdown_renderer()
+    assert ''.join(render(chunk) for chunk in chunks) == render(text)
+    # Link reference definitions prevent any split.
+    text += '[ref]: http://example.org\n'
+    assert list(markdown_chunks(io.StringIO(text), size=100)) == [text]
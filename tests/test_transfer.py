@@ -0,0 +1,79 @@
+import errno
+import io
+import os
+from pathlib import Path
+
+import pytest
+
+from campus import transfer
+from campus.transfer import Progress, copy_file, part_path, transfers
+
+
+@pytest.fixture
+def source(tmp_path: Path) -> Path:
+    src_file = tmp_path / 'src' / 'video.mp4'
+    src_file.parent.mkdir()
+    src_file.write_bytes(os.urandom(100_000))
+    src_file.chmod(0o600)
+    (tmp_path / 'dst').mkdir()
+    return src_file
+
+
+@pytest.mark.parametrize('method', sorted(transfer.METHODS))
+def test_copy_file(source: Path, tmp_path: Path, monkeypatch, method: str):
+    monkeypatch.setattr(transfer, 'METHODS', {method: transfer.METHODS[method]})
+    monkeypatch.setattr(transfer, 'CHUNK_SIZE', 30_000)
+    dst_file = tmp_path / 'dst' / 'video.mp4'
+    copy_file(source, dst_file)
+    assert dst_file.read_bytes() == source.read_bytes()
+    assert dst_file.stat().st_mode == source.stat().st_mode
+    assert os.listdir(dst_file.parent) == ['video.mp4']
+
+
+def test_copy_fallback(source: Path, tmp_path: Path, monkeypatch):
+    def unsupported(*args):
+        raise OSError(errno.EXDEV, 'unsupported')
+    monkeypatch.setattr(transfer, 'METHODS', {'fast': unsupported, **transfer.METHODS})
+    dst_file = tmp_path / 'dst' / 'video.mp4'
+    copy_file(source, dst_file)
+    assert dst_file.read_bytes() == source.read_bytes()
+
+
+def test_leftover(source: Path, tmp_path: Path):
+    # The temporary file of a killed build (with the same pid) is overwritten.
+    dst_file = tmp_path / 'dst' / 'video.mp4'
+    dst_file.with_name(f'.video.mp4.{os.getpid()}.tmp').write_bytes(b'junk')
+    copy_file(source, dst_file)
+    assert dst_file.read_bytes() == source.read_bytes()
+    assert os.listdir(dst_file.parent) == ['video.mp4']
+
+
+def test_resume(source: Path, tmp_path: Path, monkeypatch):
+    monkeypatch.setattr(transfer, 'RESUME_MIN_SIZE', 1000)
+    dst_file = tmp_path / 'dst' / 'video.mp4'
+    data = source.read_bytes()
+    # An interrupted copy of this source, and one of a previous version.
+    part = part_path(source, dst_file)
+    part.write_bytes(data[:60_000])
+    stale = dst_file.with_name(f'.video.mp4.1-2{transfer.PART_SUFFIX}')
+    stale.write_bytes(b'old')
+    stream = io.StringIO()
+    with transfers(Progress(stream), verify=True):
+        copy_file(source, dst_file)
+    assert dst_file.read_bytes() == data
+    assert not part.exists() and not stale.exists()
+    # Only the missing bytes were copied.
+    assert '39.1 KiB / 39.1 KiB (100%, 1 file(s))' in stream.getvalue()
+
+
+def test_verify(source: Path, tmp_path: Path, monkeypatch):
+    monkeypatch.setattr(transfer, 'RESUME_MIN_SIZE', 1000)
+    dst_file = tmp_path / 'dst' / 'video.mp4'
+    part = part_path(source, dst_file)
+    part.write_bytes(b'corrupted')
+    with transfers(verify=True), pytest.raises(OSError):
+        copy_file(source, dst_file)
+    assert not dst_file.exists() and not part.exists()
+    # Next build copies the file again.
+    copy_file(source, dst_file)
+    assert dst_file.read_bytes() == source.read_bytes()
@@ -0,0 +1,52 @@
+from pathlib import Path
+from urllib.request import urlopen
+
+import pytest
+
+from campus.watch import serve, snapshot, watch, RELOAD_SCRIPT
+
+
+def test_serve(tmp_path: Path):
+    (tmp_path / 'index.html').write_text('<html><body>Hello</body></html>')
+    (tmp_path / 'style.css').write_text('</body>')
+    server = serve(tmp_path, port=0)
+    try:
+        url = f'http://localhost:{server.server_port}/'
+        with urlopen(url) as response:
+            assert RELOAD_SCRIPT in response.read()
+        with urlopen(url + 'style.css') as response:
+            assert response.read() == b'</body>'
+    finally:
+        server.shutdown()
+    # Generated files are never modified.
+    assert (tmp_path / 'index.html').read_text() == '<html><body>Hello</body></html>'
+
+
+def test_snapshot(tmp_path: Path):
+    path = tmp_path / 'index.md'
+    state = snapshot([path])
+    assert state == {path: None}
+    path.write_text('# Title')
+    assert snapshot([path]) != state
+
+
+@pytest.mark.parametrize('failures', [(1,), (2,), (1, 2)])
+def test_watch_errors(tmp_path: Path, monkeypatch, failures):
+    source = tmp_path / 'index.md'
+    source.write_text('#')
+    calls = []
+
+    def build(changed):
+        calls.append(changed)
+        if len(calls) in failures:
+            raise ValueError('broken page')
+
+    def sleep(interval):
+        # Edit the source between polls, and stop after three builds.
+        if len(calls) == 3:
+            raise KeyboardInterrupt
+        source.write_text(source.read_text() + '#')
+    monkeypatch.setattr('campus.watch.time.sleep', sleep)
+    # A failed build (even the first one) doesn't stop watching.
+    watch(build, lambda: [source], tmp_path, port=0)
+    assert calls == [None, {source}, {source}]